@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Media Backend Benchmark - ffmpeg subprocesses vs in-process PyAV
+Generates the same synthetic clips for every backend and times the fused
+decode, the encode and a whole FFmpeg-effects job with each.
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from src.core.process import (generate_washed_media, decode_frames_with_ffmpeg, create_video_from_frames,
+                              plan_fused_filters, get_video_info_ffprobe, MEDIA_BACKENDS)
+from src.core import av_backend
+
+INPUTS = {
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+}
+CLIP_SECONDS = 10
+
+EFFECTS = {
+    'brightness_enabled': True, 'contrast_enabled': True, 'hue_enabled': True,
+    'blur_enabled': True, 'noise_enabled': True, 'flip_enabled': True,
+}
+
+
+def make_input(work_dir, name, size):
+    """Write a synthetic H.264 + AAC clip and return its path."""
+    path = os.path.join(work_dir, f"input_{name}.mp4")
+    subprocess.run([
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f'testsrc2=size={size[0]}x{size[1]}:rate=30:duration={CLIP_SECONDS}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={CLIP_SECONDS}',
+        '-c:v', 'libx264', '-preset', 'fast', '-g', '60', '-c:a', 'aac', '-shortest', path
+    ], check=True)
+    return path
+
+
+def bench_decode_encode(video_path, work_dir, media_backend):
+    """Return (decode seconds, encode seconds, frames) for one backend."""
+    plan = plan_fused_filters(dict(EFFECTS), get_video_info_ffprobe(video_path), work_dir=work_dir)
+
+    start = time.perf_counter()
+    frame_store, fps = decode_frames_with_ffmpeg(video_path, plan, os.path.join(work_dir, 'frames'),
+                                                 'memory', media_backend)
+    decode_seconds = time.perf_counter() - start
+    if frame_store is None:
+        return None, None, 0
+
+    try:
+        start = time.perf_counter()
+        create_video_from_frames(frame_store, os.path.join(work_dir, f"encode_{media_backend}.mp4"), fps,
+                                 audio_source=video_path, media_backend=media_backend)
+        encode_seconds = time.perf_counter() - start
+        return decode_seconds, encode_seconds, len(frame_store)
+    finally:
+        frame_store.close()
+
+
+def bench_job(video_path, work_dir, media_backend):
+    """Return seconds for a whole FFmpeg-effects job."""
+    output_folder = os.path.join(work_dir, f"job_{media_backend}")
+    start = time.perf_counter()
+    generate_washed_media(video_path, output_folder, 'bench', 'video', dict(EFFECTS), fps=None,
+                          media_backend=media_backend)
+    seconds = time.perf_counter() - start
+    shutil.rmtree(output_folder, ignore_errors=True)
+    return seconds
+
+
+def main():
+    """Main benchmark function."""
+    print("Media Backend Benchmark")
+    print("=" * 60)
+    backends = [b for b in MEDIA_BACKENDS if b != 'pyav' or av_backend.is_available()]
+    if len(backends) < len(MEDIA_BACKENDS):
+        print("PyAV is not installed - only the subprocess backend is measured")
+    print(f"{'backend':<11} {'input':<7} {'decode s':>9} {'encode s':>9} {'frames':>7} {'job s':>8}")
+
+    work_dir = tempfile.mkdtemp(prefix="washer_bench_")
+    try:
+        for input_name, size in INPUTS.items():
+            video_path = make_input(work_dir, input_name, size)
+            for media_backend in backends:
+                decode_seconds, encode_seconds, frames = bench_decode_encode(video_path, work_dir, media_backend)
+                job_seconds = bench_job(video_path, work_dir, media_backend)
+                if decode_seconds is None:
+                    print(f"{media_backend:<11} {input_name:<7} {'failed':>9}")
+                    continue
+                print(f"{media_backend:<11} {input_name:<7} {decode_seconds:>9.2f} {encode_seconds:>9.2f} "
+                      f"{frames:>7} {job_seconds:>8.2f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Frame Effects Benchmark - time and memory allocated per frame
+Runs each frame-level effect on synthetic frames and reports the
+milliseconds and bytes allocated per frame (via tracemalloc).
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from src.core.process import apply_effects_to_frame, prepare_frame_effect_state
+from src.core.color_lut import apply_color_lut, get_color_lut
+
+RESOLUTIONS = {
+    '720p': (720, 1280),
+    '1080p': (1080, 1920),
+}
+
+EFFECTS = {
+    'bitplane': {'bitplane_enabled': True, 'bitplane_intensity_var': 0.5, 'bitplane_planes_var': 2},
+    'region': {'region_enabled': True, 'region_width_var': 200, 'region_height_var': 200},
+    'overlay': {'overlay_enabled': True, 'frame_overlay_interval': 1},
+    'shadow': {'shadow_enabled': True, 'shadow_h_lines_var': 5, 'shadow_v_lines_var': 5, 'shadow_line_width_var': 2},
+}
+EFFECTS['all'] = {k: v for effect in list(EFFECTS.values()) for k, v in effect.items()}
+
+
+def bench_effect(effect_vars, shape, frames=30):
+    """Return (ms per frame, peak bytes allocated per frame)."""
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, size=shape + (3,), dtype=np.uint8)
+    effect_vars = dict(effect_vars)
+
+    # Per-copy state is resolved once, as process_frames_with_effects does
+    state = prepare_frame_effect_state(effect_vars, frame.shape)
+
+    # Warm up so reusable scratch buffers are already allocated
+    for i in range(3):
+        apply_effects_to_frame(frame, effect_vars, i, state)
+
+    start = time.perf_counter()
+    for i in range(frames):
+        apply_effects_to_frame(frame, effect_vars, i, state)
+    ms_per_frame = (time.perf_counter() - start) * 1000 / frames
+
+    peak = 0
+    tracemalloc.start()
+    for i in range(frames):
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        apply_effects_to_frame(frame, effect_vars, i, state)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+
+    return ms_per_frame, peak
+
+
+def bench_color_lut(shape, frames=10):
+    """Return ms per frame for the in-process 3D LUT lookup (all color settings at once)."""
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, size=shape + (3,), dtype=np.uint8)
+    lut = get_color_lut(brightness=1.05, contrast=1.05, saturation=0.95, hue=8.0)
+
+    apply_color_lut(frame, lut, out=frame)
+    start = time.perf_counter()
+    for _ in range(frames):
+        apply_color_lut(frame, lut, out=frame)
+    return (time.perf_counter() - start) * 1000 / frames
+
+
+def main():
+    """Main benchmark function."""
+    print("Frame Effects Benchmark")
+    print("=" * 60)
+    print(f"{'effect':<10} {'size':<7} {'ms/frame':>10} {'alloc/frame':>14} {'frame size':>12}")
+
+    for res_name, shape in RESOLUTIONS.items():
+        frame_bytes = shape[0] * shape[1] * 3
+        for effect_name, effect_vars in EFFECTS.items():
+            ms, peak = bench_effect(effect_vars, shape)
+            print(f"{effect_name:<10} {res_name:<7} {ms:>10.2f} {peak / 1024:>12.0f}KB {frame_bytes / 1024:>10.0f}KB")
+
+    print()
+    print("Color 3D LUT (brightness + contrast + saturation + hue in one lookup)")
+    for res_name, shape in RESOLUTIONS.items():
+        print(f"{'color_lut':<10} {res_name:<7} {bench_color_lut(shape):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
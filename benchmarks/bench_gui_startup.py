@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+GUI Startup Benchmark - time to first paint with a lazy vs eager Effects tab
+Builds the main window several times and times construction plus the first
+full update (first paint), with the Effects tab left to its first activation
+(lazy, the default) or built before the first paint (eager, the old startup).
+Also times the first activation of the Effects tab. Needs a display.
+"""
+
+import os
+import sys
+import time
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import customtkinter as ctk
+from src.ui.gui import ReelsWasherApp
+
+RUNS = 5
+
+
+def open_effects_tab(app):
+    """Switch to the Effects tab as a click on its button would."""
+    app.tabview.set("Effects")
+    app.on_tab_changed()
+
+
+def time_startup(eager):
+    """Return (seconds to first paint, seconds to first show the Effects tab afterwards)."""
+    start = time.perf_counter()
+    app = ReelsWasherApp()
+    if eager:
+        open_effects_tab(app)
+        app.tabview.set("Main")
+    app.update()
+    first_paint = time.perf_counter() - start
+
+    start = time.perf_counter()
+    open_effects_tab(app)
+    app.update()
+    effects_tab = time.perf_counter() - start
+
+    app.destroy()
+    return first_paint, effects_tab
+
+
+def main():
+    """Main benchmark function."""
+    ctk.set_appearance_mode("System")
+    ctk.set_default_color_theme("blue")
+
+    print("GUI Startup Benchmark")
+    print("=" * 60)
+    print(f"median of {RUNS} runs")
+    print(f"{'effects tab':<12} {'first paint ms':>15} {'open effects ms':>16}")
+
+    time_startup(eager=False)  # Warm up imports, fonts and theme loading
+    for eager in (True, False):
+        results = [time_startup(eager) for _ in range(RUNS)]
+        first_paint = statistics.median(r[0] for r in results) * 1000
+        effects_tab = statistics.median(r[1] for r in results) * 1000
+        print(f"{'eager' if eager else 'lazy':<12} {first_paint:>15.0f} {effects_tab:>16.0f}")
+
+
+if __name__ == "__main__":
+    main()
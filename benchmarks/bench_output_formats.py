@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Output Format Benchmark - GIF vs animated WebP vs APNG
+Decodes the same synthetic clips once at the animated-output frame rate and
+times the encode of every animated image mode, with the resulting file size.
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from src.core.process import (decode_frames_with_ffmpeg, plan_fused_filters, get_video_info_ffprobe,
+                              create_gif_from_frames, create_animated_image_from_frames, get_output_extension,
+                              ANIMATED_OUTPUT_MODES)
+
+# Synthetic sources: a mostly static scene with a small moving area, and full motion
+INPUTS = {
+    'static': ('smptebars=size=1280x720:rate=30:duration={d}', 'testsrc=size=160x160:rate=30:duration={d}'),
+    'motion': ('testsrc2=size=1280x720:rate=30:duration={d}', None),
+}
+CLIP_SECONDS = 6
+OUTPUT_FPS = 10
+MAX_DIMENSION = 480
+QUALITY = 75
+
+
+def make_input(work_dir, name, sources):
+    """Write a synthetic H.264 clip and return its path."""
+    path = os.path.join(work_dir, f"input_{name}.mp4")
+    background, overlay = sources
+    cmd = ['ffmpeg', '-y', '-loglevel', 'error', '-f', 'lavfi', '-i', background.format(d=CLIP_SECONDS)]
+    if overlay:
+        cmd += ['-f', 'lavfi', '-i', overlay.format(d=CLIP_SECONDS),
+                '-filter_complex', "[0][1]overlay=x='t*100':y=200"]
+    cmd += ['-c:v', 'libx264', '-preset', 'fast', '-pix_fmt', 'yuv420p', path]
+    subprocess.run(cmd, check=True)
+    return path
+
+
+def bench_mode(frame_store, work_dir, input_name, output_mode):
+    """Return (encode seconds, file bytes) for one output mode, or (None, None) if it failed."""
+    output_path = os.path.join(work_dir, f"{input_name}_{output_mode}.{get_output_extension(output_mode)}")
+    start = time.perf_counter()
+    if output_mode == 'gif':
+        success = create_gif_from_frames(frame_store, output_path, OUTPUT_FPS, QUALITY)
+    else:
+        success = create_animated_image_from_frames(frame_store, output_path, output_mode, OUTPUT_FPS, QUALITY)
+    seconds = time.perf_counter() - start
+    if not success:
+        return None, None
+    return seconds, os.path.getsize(output_path)
+
+
+def main():
+    """Main benchmark function."""
+    print("Output Format Benchmark")
+    print("=" * 60)
+    print(f"{CLIP_SECONDS}s clips at {OUTPUT_FPS} fps, longest side {MAX_DIMENSION}px, quality {QUALITY}")
+    print(f"{'input':<8} {'mode':<14} {'encode s':>9} {'size KB':>9} {'vs gif':>7}")
+
+    work_dir = tempfile.mkdtemp(prefix="washer_bench_formats_")
+    try:
+        for input_name, sources in INPUTS.items():
+            video_path = make_input(work_dir, input_name, sources)
+            plan = plan_fused_filters({}, get_video_info_ffprobe(video_path), 0, None, OUTPUT_FPS, MAX_DIMENSION,
+                                      work_dir=work_dir)
+            frame_store, _ = decode_frames_with_ffmpeg(video_path, plan, os.path.join(work_dir, 'frames'), 'memory')
+            if frame_store is None:
+                print(f"{input_name:<8} decode failed")
+                continue
+            try:
+                gif_bytes = None
+                for output_mode in ANIMATED_OUTPUT_MODES:
+                    seconds, size = bench_mode(frame_store, work_dir, input_name, output_mode)
+                    if seconds is None:
+                        print(f"{input_name:<8} {output_mode:<14} {'failed':>9}")
+                        continue
+                    if output_mode == 'gif':
+                        gif_bytes = size
+                    ratio = f"{size / gif_bytes:.2f}" if gif_bytes else "-"
+                    print(f"{input_name:<8} {output_mode:<14} {seconds:>9.2f} {size / 1024:>9.0f} {ratio:>7}")
+            finally:
+                frame_store.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
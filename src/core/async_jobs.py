@@ -0,0 +1,539 @@
+"""
+Asyncio job API for embedding the washer in services.
+
+start_wash_job() runs the same fused pipeline as generate_washed_media - one
+decode with the FFmpeg effects folded in, the frame effects, one encode - but
+every ffmpeg and ffprobe process is driven with asyncio.create_subprocess_exec
+and the frame kernels run in chunks on a shared thread pool. Many jobs can
+run in one event loop without a thread each, and every job has its own
+cancellation instead of the process-wide stop flag.
+
+    job = start_wash_job("in.mp4", "out", "clip", "video", effect_vars, copies=3)
+    async for event in job.progress():
+        print(event['stage'], event['done'], event['total'])
+    result = await job
+"""
+
+import os
+import time
+import shutil
+import random
+import asyncio
+import itertools
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.core import process
+from src.core.frame_store import create_frame_store
+from src.core.resource_scheduler import estimate_job_cost
+from src.core.rate_control import (DEFAULT_CRF, size_target_bitrate, probe_audio_kbps, supports_two_pass,
+                                   frames_fingerprint, get_cached_stats, new_stats_prefix, store_stats, discard_stats)
+from src.core.ffmpeg_runner import (get_popen_group_kwargs, kill_process_tree, stage_timeout, STALL_SECONDS,
+                                    PROBE_TIMEOUT)
+
+
+# Frames handed to the thread pool per call; bounds how long cancellation waits
+FRAME_CHUNK = 16
+
+# Stages reported in progress events
+STAGES = ('queued', 'probe', 'decode', 'effects', 'encode', 'done', 'failed', 'cancelled')
+
+_job_ids = itertools.count(1)
+_frame_executor = None
+_frame_executor_lock = threading.Lock()
+
+
+def get_frame_executor():
+    """Return the thread pool shared by the frame kernels of all async jobs."""
+    global _frame_executor
+    with _frame_executor_lock:
+        if _frame_executor is None:
+            _frame_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1,
+                                                 thread_name_prefix="washer-frames")
+        return _frame_executor
+
+
+class WashJob:
+    """
+    Handle of a running async job.
+
+    Await it for the result dict (success, outputs, failures, seconds), iterate
+    progress() for events, and call cancel() to stop it. Cancelling kills the
+    job's ffmpeg processes and removes its partial outputs.
+    """
+
+    def __init__(self, video_path):
+        self.job_id = next(_job_ids)
+        self.video_path = video_path
+        self.stage = 'queued'
+        self.outputs = []
+        self.failures = []
+        self._events = asyncio.Queue()
+        self._task = None
+        # Set on cancellation so work handed to the thread pool stops as well
+        self._stop_event = threading.Event()
+
+    def __await__(self):
+        return self._task.__await__()
+
+    def done(self):
+        return self._task is not None and self._task.done()
+
+    def cancel(self):
+        """Request cancellation. Returns False if the job has already finished."""
+        if self._task.done():
+            return False
+        self._stop_event.set()
+        return self._task.cancel()
+
+    async def progress(self):
+        """Yield progress events until the job finishes (one consumer per job)."""
+        while True:
+            event = await self._events.get()
+            if event is None:
+                return
+            yield event
+
+    def _emit(self, stage, copy=None, done=None, total=None, message=None):
+        self.stage = stage
+        self._events.put_nowait({
+            'job_id': self.job_id,
+            'stage': stage,
+            'copy': copy,
+            'done': done,
+            'total': total,
+            'message': message,
+            'time': time.time(),
+        })
+
+
+async def _start_process(cmd, stdin=None, stdout=None):
+    return await asyncio.create_subprocess_exec(
+        *cmd, stdin=stdin or asyncio.subprocess.DEVNULL, stdout=stdout or asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE, creationflags=process.get_subprocess_creation_flags(), **get_popen_group_kwargs()
+    )
+
+
+async def _finish_process(proc, stderr_task, timeout=None):
+    """Wait for a process to exit (killing it after timeout). Returns (returncode, stderr)."""
+    try:
+        returncode = await asyncio.wait_for(proc.wait(), timeout)
+    except asyncio.TimeoutError:
+        kill_process_tree(proc)
+        await proc.wait()
+        raise RuntimeError(f"ffmpeg did not finish within {timeout:.0f}s")
+    stderr = (await stderr_task).decode(errors='replace')
+    return returncode, stderr
+
+
+async def _abandon_process(proc):
+    if proc is not None and proc.returncode is None:
+        kill_process_tree(proc)
+        await proc.wait()
+
+
+async def run_ffmpeg_async(cmd, media_duration=None, stall_timeout=STALL_SECONDS):
+    """
+    Run an ffmpeg command that writes to a file and wait for it, like ffmpeg_runner.run_ffmpeg.
+
+    Returns:
+        (returncode, stderr)
+    """
+    cmd = [cmd[0], '-progress', 'pipe:1', '-nostats'] + list(cmd[1:])
+    proc = await _start_process(cmd, stdout=asyncio.subprocess.PIPE)
+    stderr_task = asyncio.ensure_future(proc.stderr.read())
+    timeout = stage_timeout(media_duration)
+    deadline = time.monotonic() + timeout if timeout else None
+    try:
+        while True:
+            # Progress lines arrive about twice a second while FFmpeg works
+            line = await asyncio.wait_for(proc.stdout.readline(), stall_timeout)
+            if not line:
+                break
+            if deadline and time.monotonic() > deadline:
+                raise RuntimeError(f"ffmpeg exceeded {timeout:.0f}s timeout")
+        return await _finish_process(proc, stderr_task, stall_timeout)
+    except asyncio.TimeoutError:
+        raise RuntimeError(f"ffmpeg made no progress for {stall_timeout:.0f}s")
+    finally:
+        await _abandon_process(proc)
+        stderr_task.cancel()
+
+
+async def probe_video_async(video_path):
+    """Async get_video_info_ffprobe."""
+    proc = await _start_process(process.build_probe_command(video_path), stdout=asyncio.subprocess.PIPE)
+    try:
+        stdout, _ = await asyncio.wait_for(proc.communicate(), PROBE_TIMEOUT)
+    except asyncio.TimeoutError:
+        await _abandon_process(proc)
+        raise RuntimeError(f"ffprobe timed out after {PROBE_TIMEOUT}s")
+    return process.parse_probe_output(stdout.decode(errors='replace'))
+
+
+async def decode_frames_async(video_path, fused_plan, output_dir, backend='auto', threads=None):
+    """Async decode_frames_with_ffmpeg. Returns a frame store; raises on failure."""
+    width, height = fused_plan['width'], fused_plan['height']
+    frame_bytes = width * height * 3
+    duration = fused_plan.get('duration')
+    expected_frames = int(duration * fused_plan['fps']) + 1 if duration else None  # None = unknown length
+    frame_store = create_frame_store(expected_frames, width, height, output_dir, backend)
+
+    proc = await _start_process(process.build_decode_command(video_path, fused_plan, threads),
+                                stdout=asyncio.subprocess.PIPE)
+    stderr_task = asyncio.ensure_future(proc.stderr.read())
+    try:
+        while True:
+            try:
+                data = await asyncio.wait_for(proc.stdout.readexactly(frame_bytes), STALL_SECONDS)
+            except asyncio.IncompleteReadError:
+                break
+            # bytearray keeps the frame writable for the in-place kernels
+            frame_store.append(np.frombuffer(bytearray(data), dtype=np.uint8).reshape(height, width, 3))
+        returncode, stderr = await _finish_process(proc, stderr_task, STALL_SECONDS)
+        if len(frame_store) == 0:
+            raise RuntimeError(f"no frames decoded (exit code {returncode}): {stderr.strip()}")
+        return frame_store
+    except asyncio.TimeoutError:
+        frame_store.close()
+        raise RuntimeError(f"decoder made no progress for {STALL_SECONDS}s")
+    except BaseException:
+        frame_store.close()
+        raise
+    finally:
+        await _abandon_process(proc)
+        stderr_task.cancel()
+
+
+def _apply_effects_chunk(frame_store, effect_vars, state, start, stop):
+    for i in range(start, stop):
+        frame_store[i] = process.apply_effects_to_frame(frame_store[i], effect_vars, i, state)
+
+
+async def process_frames_async(frame_store, effect_vars, on_progress=None, executor=None,
+                               spatial_scale=1.0, temporal_scale=1.0):
+    """Apply the frame effects in place, FRAME_CHUNK frames per call on the shared thread pool."""
+    loop = asyncio.get_running_loop()
+    executor = executor or get_frame_executor()
+    total = len(frame_store)
+    state = process.prepare_frame_effect_state(effect_vars, (frame_store.height, frame_store.width),
+                                               spatial_scale, temporal_scale)
+    for start in range(0, total, FRAME_CHUNK):
+        stop = min(total, start + FRAME_CHUNK)
+        await loop.run_in_executor(executor, _apply_effects_chunk, frame_store, effect_vars, state, start, stop)
+        if on_progress:
+            on_progress(stop, total)
+
+
+async def _pipe_frames_async(cmd, frame_store, frame_indices, frame_count, video_duration, threads, on_progress):
+    """Run an encode command and write the frames to its stdin. Raises on failure."""
+    proc = await _start_process(process.with_thread_budget(cmd, threads), stdin=asyncio.subprocess.PIPE)
+    stderr_task = asyncio.ensure_future(proc.stderr.read())
+    try:
+        try:
+            for written, frame in enumerate(frame_store.iter_frames(frame_indices), 1):
+                # Flat byte view: the pipe transport measures writes with len()
+                proc.stdin.write(memoryview(np.ascontiguousarray(frame)).cast('B'))
+                await asyncio.wait_for(proc.stdin.drain(), STALL_SECONDS)
+                if on_progress and written % FRAME_CHUNK == 0:
+                    on_progress(written, frame_count)
+            proc.stdin.close()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # FFmpeg exited early - the error is reported below
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"encoder accepted no frames for {STALL_SECONDS}s")
+        returncode, stderr = await _finish_process(proc, stderr_task, stage_timeout(video_duration))
+        if returncode != 0:
+            raise RuntimeError(f"encode failed (exit code {returncode}): {stderr.strip()}")
+    finally:
+        await _abandon_process(proc)
+        stderr_task.cancel()
+
+
+async def _encode_two_pass_async(frame_store, partial_path, fps, codec, bitrate, tags, video_duration, frame_indices,
+                                 audio_source, audio_start, audio_filters, threads, on_progress, rate_control, crf,
+                                 fragmented_mp4, key):
+    """Two-pass encode reusing cached first-pass stats (see process.encode_two_pass). Raises on failure."""
+    frame_count = len(frame_indices) if frame_indices is not None else len(frame_store)
+    passlog = get_cached_stats(key)
+    while True:
+        cached = passlog is not None
+        if not cached:
+            temp_passlog = new_stats_prefix(key)
+            cmd = process.build_encode_command(frame_store.width, frame_store.height, partial_path, fps, codec,
+                                               bitrate, tags, video_duration, rate_control=rate_control, crf=crf,
+                                               pass_number=1, passlog=temp_passlog)
+            try:
+                await _pipe_frames_async(cmd, frame_store, frame_indices, frame_count, video_duration, threads, None)
+            except BaseException:
+                discard_stats(temp_passlog)
+                raise
+            passlog = store_stats(key, temp_passlog)
+
+        cmd = process.build_encode_command(frame_store.width, frame_store.height, partial_path, fps, codec, bitrate,
+                                           tags, video_duration, audio_source, audio_start, audio_filters,
+                                           rate_control, crf, pass_number=2, passlog=passlog,
+                                           fragmented_mp4=fragmented_mp4)
+        try:
+            await _pipe_frames_async(cmd, frame_store, frame_indices, frame_count, video_duration, threads,
+                                     on_progress)
+            if not os.path.getsize(partial_path):
+                # FFmpeg exits 0 when the encoder refuses the stats file
+                raise RuntimeError("encoder wrote no output with the first-pass stats")
+            return
+        except RuntimeError:
+            if not cached:
+                raise
+            # Stats from the cache that the encoder rejects are dropped and measured again
+            discard_stats(passlog)
+            passlog = None
+
+
+async def encode_frames_async(frame_store, output_path, fps, codec, bitrate, frame_indices=None, audio_source=None,
+                              audio_start=0, audio_filters=None, threads=None, on_progress=None,
+                              rate_control='bitrate', crf=DEFAULT_CRF, target_size_mb=None, two_pass=False,
+                              metadata=None, fragmented_mp4=False):
+    """Async create_video_from_frames. Raises on failure."""
+    metadata = metadata or process.generate_spoofed_metadata()
+    frame_count = len(frame_indices) if frame_indices is not None else len(frame_store)
+    video_duration = frame_count / float(fps)
+    tags = process.build_video_tags(metadata)
+    partial_path = process.get_partial_path(output_path)
+
+    key = None
+    if rate_control == 'size':
+        loop = asyncio.get_running_loop()
+        audio_kbps = 0
+        if audio_source:
+            audio_kbps = 128 if audio_filters else await loop.run_in_executor(None, probe_audio_kbps, audio_source)
+        bitrate = size_target_bitrate(target_size_mb, video_duration, audio_kbps) or bitrate
+        if two_pass and supports_two_pass(codec):
+            key = await loop.run_in_executor(get_frame_executor(), frames_fingerprint,
+                                             frame_store, frame_indices, fps, codec)
+
+    try:
+        if key is None:
+            cmd = process.build_encode_command(frame_store.width, frame_store.height, partial_path, fps, codec, bitrate,
+                                               tags, video_duration, audio_source, audio_start, audio_filters,
+                                               rate_control, crf, fragmented_mp4=fragmented_mp4)
+            await _pipe_frames_async(cmd, frame_store, frame_indices, frame_count, video_duration, threads,
+                                     on_progress)
+        else:
+            await _encode_two_pass_async(frame_store, partial_path, fps, codec, bitrate, tags, video_duration,
+                                         frame_indices, audio_source, audio_start, audio_filters, threads,
+                                         on_progress, rate_control, crf, fragmented_mp4, key)
+        # Written once with every tag; one rename puts it in place
+        os.replace(partial_path, output_path)
+    except BaseException:
+        process.discard_partial(partial_path)
+        raise
+
+
+async def _acquire(scheduler, cost):
+    """Wait for the scheduler to admit a job without blocking the event loop."""
+    while True:
+        allocation = scheduler.try_acquire(cost)
+        if allocation is not None:
+            return allocation
+        await asyncio.sleep(0.5)
+
+
+def _run_with_stop_event(stop_event, func, *args):
+    """Run func on a pool thread with should_stop() bound to the job's stop event."""
+    previous = process.get_stop_event()
+    process.set_stop_event(stop_event)
+    try:
+        return func(*args)
+    finally:
+        process.set_stop_event(previous)
+
+
+def _remove(path):
+    try:
+        if path and os.path.exists(path):
+            os.remove(path)
+    except OSError:
+        pass
+
+
+async def _run_copy(job, copy_num, copies, source_info, options, threads):
+    """Produce one copy. Returns its output path; raises on failure."""
+    effect_vars = options['effect_vars']
+    if options['copy_type'] == 'variations':
+        effect_vars = process.create_variation_effects(effect_vars, copy_num)
+
+    variation_seed = int(time.time() * 1000000) + os.getpid() + copy_num * 1000 + job.job_id
+    random.seed(variation_seed)
+    np.random.seed(variation_seed % 2**32)
+
+    # Work files of this copy live in their own directory, unique across processes sharing the output folder
+    work_dir = tempfile.mkdtemp(prefix=".wash_", dir=options['output_folder'])
+    frame_store = None
+    try:
+        output_mode = options['output_mode']
+        if output_mode in process.ANIMATED_OUTPUT_MODES:
+            plan = process.plan_fused_filters(effect_vars, source_info, options['start_time'], options['end_time'],
+                                              options['fps'], options['gif_max_dimension'], work_dir=work_dir)
+        else:
+            plan = process.plan_fused_filters(effect_vars, source_info, options['start_time'], options['end_time'],
+                                              work_dir=work_dir)
+        copy_metadata = process.generate_spoofed_metadata()
+        name = f"{options['prefix']}_copy_{copy_num + 1:03d}" if copies > 1 else options['prefix']
+        output_path = os.path.join(options['output_folder'],
+                                   f"{name}_{copy_metadata['unique_id']}.{process.get_output_extension(output_mode)}")
+
+        def report(stage):
+            return lambda done, total: job._emit(stage, copy_num + 1, done, total)
+
+        job._emit('decode', copy_num + 1)
+        frame_store = await decode_frames_async(job.video_path, plan, os.path.join(work_dir, "frames"),
+                                                options['frame_store_backend'], threads)
+
+        if process.frame_effects_enabled(effect_vars):
+            job._emit('effects', copy_num + 1, 0, len(frame_store))
+            await process_frames_async(frame_store, effect_vars, report('effects'),
+                                       spatial_scale=plan['spatial_scale'], temporal_scale=plan['temporal_scale'])
+
+        frame_indices = process.get_speed_adjusted_indices(len(frame_store), options['speed'])
+        job._emit('encode', copy_num + 1, 0, len(frame_indices))
+        try:
+            if output_mode == 'gif':
+                loop = asyncio.get_running_loop()
+                encode = loop.run_in_executor(get_frame_executor(), _run_with_stop_event, job._stop_event,
+                                              process.create_gif_from_frames, frame_store, output_path,
+                                              options['fps'], options['quality'], frame_indices)
+                try:
+                    written = await asyncio.shield(encode)
+                except asyncio.CancelledError:
+                    # The pool thread keeps running after a cancel - stop it before its frames are released
+                    job._stop_event.set()
+                    await asyncio.wait([encode])
+                    raise
+                if not written:
+                    raise RuntimeError("GIF could not be written")
+            elif output_mode in process.ANIMATED_OUTPUT_MODES:
+                partial_path = process.get_partial_path(output_path)
+                cmd = process.build_animated_image_command(frame_store.width, frame_store.height, partial_path,
+                                                           output_mode, options['fps'], options['quality'])
+                try:
+                    await _pipe_frames_async(cmd, frame_store, frame_indices, len(frame_indices),
+                                             len(frame_indices) / float(options['fps']), threads, report('encode'))
+                    os.replace(partial_path, output_path)
+                finally:
+                    process.discard_partial(partial_path)
+            else:
+                audio_source = job.video_path if options['speed'] == 1.0 else None
+                await encode_frames_async(frame_store, output_path, plan['fps'], options['codec'], options['bitrate'],
+                                          frame_indices, audio_source, plan['start_time'], plan['audio_filters'],
+                                          threads, report('encode'), options['rate_control'], options['crf'],
+                                          options['target_size_mb'], options['two_pass'], copy_metadata,
+                                          options['fragmented_mp4'])
+        except BaseException:
+            _remove(output_path)
+            raise
+        return output_path
+    finally:
+        if frame_store is not None:
+            frame_store.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+async def _run_job(job, options, scheduler, threads):
+    started = time.time()
+    allocation = None
+    try:
+        os.makedirs(options['output_folder'], exist_ok=True)
+        job._emit('probe')
+        source_info = await probe_video_async(job.video_path)
+        if not source_info.get('width'):
+            raise RuntimeError(f"No video stream found in {job.video_path}")
+
+        if scheduler is not None:
+            cost = estimate_job_cost(source_info, options['effect_vars'], options['output_mode'],
+                                     options['start_time'], options['end_time'], options['copies'],
+                                     output_fps=options['fps'], max_dimension=options['gif_max_dimension'])
+            allocation = await _acquire(scheduler, cost)
+            threads = allocation.threads
+
+        copies = options['copies']
+        for copy_num in range(copies):
+            try:
+                job.outputs.append(await _run_copy(job, copy_num, copies, source_info, options, threads))
+            except Exception as e:
+                # One bad copy must not end the job - record it and go on with the next
+                error = f"{type(e).__name__}: {e}"
+                print(f"Error processing copy {copy_num + 1}: {error}")
+                job.failures.append({'copy': copy_num + 1, 'source': job.video_path, 'status': 'failed',
+                                     'error': error, 'stages': []})
+                job._emit('failed', copy_num + 1, message=error)
+
+        success = bool(job.outputs)
+        job._emit('done', message=f"Generated {len(job.outputs)}/{copies} files")
+        return {
+            'success': success,
+            'outputs': list(job.outputs),
+            'failures': list(job.failures),
+            'seconds': round(time.time() - started, 3),
+        }
+
+    except asyncio.CancelledError:
+        job._emit('cancelled')
+        raise
+
+    except Exception as e:
+        job._emit('failed', message=f"{type(e).__name__}: {e}")
+        job.failures.append({'copy': None, 'source': job.video_path, 'status': 'failed',
+                             'error': f"{type(e).__name__}: {e}", 'stages': []})
+        return {'success': False, 'outputs': list(job.outputs), 'failures': list(job.failures),
+                'seconds': round(time.time() - started, 3)}
+
+    finally:
+        if allocation is not None:
+            scheduler.release(allocation)
+        job._events.put_nowait(None)
+
+
+def start_wash_job(video_path, output_folder, prefix, output_mode, effect_vars,
+                   start_time=0, end_time=None, fps=None, quality=75, codec='libx264', bitrate=2000,
+                   copies=1, speed=1.0, copy_type='exact', frame_store_backend='auto',
+                   threads=None, scheduler=None, gif_max_dimension=None, rate_control='bitrate', crf=DEFAULT_CRF,
+                   target_size_mb=None, two_pass=False, fragmented_mp4=False):
+    """
+    Start an async wash job in the running event loop.
+
+    Takes the same settings as generate_washed_media. Segment-parallel encoding
+    and the PyAV backend are not used; every copy is one fused decode and one encode.
+
+    Args:
+        video_path: Source video path
+        output_folder: Output directory
+        prefix: Output file name prefix
+        output_mode: 'video', 'gif', 'webp', 'webp_lossless' or 'apng'
+        effect_vars: Effect variables (plain values or an EffectPlan's to_effect_vars())
+        fps: Frame rate of animated image outputs (default 10); video keeps the source rate
+        threads: Threads per ffmpeg process (ignored when a scheduler assigns them)
+        scheduler: Optional ResourceScheduler admitting the job; waiting for it does not block the loop
+
+    Returns:
+        WashJob - await it for the result dict
+    """
+    job = WashJob(video_path)
+    # Video frames are decoded at the source rate, so encoding them at any other fps changes the timing
+    if output_mode in process.ANIMATED_OUTPUT_MODES:
+        fps = fps or process.DEFAULT_ANIMATED_FPS
+    else:
+        fps = None
+    options = {
+        'output_folder': output_folder, 'prefix': prefix, 'output_mode': output_mode,
+        'effect_vars': effect_vars, 'start_time': start_time, 'end_time': end_time, 'fps': fps,
+        'quality': quality, 'codec': codec, 'bitrate': bitrate, 'copies': copies, 'speed': speed,
+        'copy_type': copy_type, 'frame_store_backend': frame_store_backend,
+        'gif_max_dimension': gif_max_dimension, 'rate_control': rate_control, 'crf': crf,
+        'target_size_mb': target_size_mb, 'two_pass': two_pass, 'fragmented_mp4': fragmented_mp4,
+    }
+    job._emit('queued')
+    job._task = asyncio.get_running_loop().create_task(_run_job(job, options, scheduler, threads))
+    return job
@@ -0,0 +1,236 @@
+"""
+In-process decode and encode through PyAV (libav bindings).
+
+The subprocess backend starts an ffmpeg process per decode and encode and
+moves frames through pipes. This backend opens the container in-process,
+runs the same fused filter chain in an av.filter.Graph and hands decoded
+frames straight to the frame store (and from it to the encoder). PyAV is
+optional; when it is not installed, or a job needs something this backend
+does not handle (rotated sources, filtered audio), process.py falls back to
+the subprocess backend.
+"""
+
+import os
+from fractions import Fraction
+
+try:
+    import av
+except ImportError:
+    av = None
+
+from src.core.frame_store import create_frame_store
+from src.core.rate_control import get_rate_control_options, DEFAULT_CRF
+
+
+def is_available():
+    """Return True if PyAV can be imported."""
+    return av is not None
+
+
+def _split_filter(filter_string):
+    """Split 'name=args' into (name, args); args is None for filters without options."""
+    name, _, args = filter_string.partition('=')
+    return name, (args or None)
+
+
+def _build_graph(stream, filters):
+    graph = av.filter.Graph()
+    last = graph.add_buffer(template=stream)
+    for filter_string in filters:
+        name, args = _split_filter(filter_string)
+        node = graph.add(name, args) if args else graph.add(name)
+        last.link_to(node)
+        last = node
+    sink = graph.add('buffersink')
+    last.link_to(sink)
+    graph.configure()
+    return graph
+
+
+def _set_threads(codec_context, threads):
+    codec_context.thread_type = 'AUTO'
+    codec_context.thread_count = threads or 0  # 0 lets libav pick
+
+
+def _time_base_rate(fps):
+    return Fraction(fps).limit_denominator(1001)
+
+
+def decode_frames_with_av(video_path, fused_plan, output_dir="temp_frames", backend='auto',
+                          threads=None, should_stop=None):
+    """
+    Decode frames in-process with the fused filter chain into a frame store.
+
+    Args:
+        video_path: Input video path
+        fused_plan: Result of plan_fused_filters (rotated sources are not supported)
+        output_dir: Work directory for frame stores that spill to disk
+        backend: Frame store backend ('auto', 'memory', 'memmap' or 'jpeg')
+        threads: Decoder threads (None = libav default)
+        should_stop: Optional callable; decoding ends early when it returns True
+
+    Returns:
+        (FrameStore, fps) - the store is None if decoding fails
+    """
+    frame_store = None
+    try:
+        width = fused_plan['width']
+        height = fused_plan['height']
+        fps = fused_plan['fps']
+        start_time = fused_plan.get('start_time') or 0
+        duration = fused_plan.get('duration')
+
+        with av.open(video_path) as container:
+            stream = container.streams.video[0]
+            _set_threads(stream.codec_context, threads)
+
+            # trim + setpts on the stream's own timestamps matches an accurate -ss/-t
+            stream_start = float(stream.start_time * stream.time_base) if stream.start_time is not None else 0.0
+            trim = f'trim=start={stream_start + start_time:.6f}'
+            if duration:
+                trim += f':duration={duration:.6f}'
+            graph = _build_graph(stream, [trim, 'setpts=PTS-STARTPTS'] + fused_plan['video_filters']
+                                 + ['format=pix_fmts=rgb24'])
+
+            if start_time > 0:
+                container.seek(int((stream_start + start_time) / stream.time_base), stream=stream, backward=True)
+
+            expected_frames = int(duration * fps) + 1 if duration else None  # None = unknown length
+            frame_store = create_frame_store(expected_frames, width, height, output_dir, backend)
+
+            def drain():
+                """Move filtered frames into the store. Returns True once the graph is finished."""
+                while True:
+                    try:
+                        frame = graph.pull()
+                    except av.error.BlockingIOError:
+                        return False
+                    except av.error.EOFError:
+                        return True
+                    frame_store.append(frame.to_ndarray())
+
+            finished = False
+            for frame in container.decode(stream):
+                if should_stop and should_stop():
+                    break
+                try:
+                    graph.push(frame)
+                except av.error.EOFError:
+                    finished = True  # trim has passed the end of the window
+                if drain() or finished:
+                    break
+            else:
+                try:
+                    graph.push(None)
+                except av.error.EOFError:
+                    pass
+                drain()
+
+        if len(frame_store) == 0:
+            print(f"Error decoding frames with PyAV: no frames in window of {video_path}")
+            frame_store.close()
+            return None, fps
+
+        return frame_store, fps
+
+    except Exception as e:
+        print(f"Error decoding frames with PyAV: {e}")
+        if frame_store is not None:
+            frame_store.close()
+        return None, 30.0
+
+
+def _copy_audio(output, audio_source, audio_start, duration):
+    """Remux the first audio stream of audio_source from audio_start for duration seconds."""
+    with av.open(audio_source) as source:
+        if not source.streams.audio:
+            return
+        in_stream = source.streams.audio[0]
+        out_stream = output.add_stream_from_template(in_stream)
+
+        start_pts = int(audio_start / in_stream.time_base) if audio_start else 0
+        end_pts = start_pts + int(duration / in_stream.time_base)
+        if start_pts:
+            source.seek(start_pts, stream=in_stream, backward=True)
+
+        for packet in source.demux(in_stream):
+            if packet.pts is None or packet.pts < start_pts:
+                continue
+            if packet.pts >= end_pts:
+                break
+            packet.pts -= start_pts
+            if packet.dts is not None:
+                packet.dts -= start_pts
+            packet.stream = out_stream
+            output.mux(packet)
+
+
+def encode_frames_with_av(frame_store, output_path, fps=30, codec='libx264', bitrate=2000, frame_indices=None,
+                          metadata=None, audio_source=None, audio_start=0, threads=None, should_stop=None,
+                          rate_control='bitrate', crf=DEFAULT_CRF, fragmented_mp4=False):
+    """
+    Encode a frame store in-process, with audio stream-copied from audio_source.
+
+    Args:
+        frame_store: Frames to encode
+        output_path: Output MP4 path
+        fps: Output frame rate
+        codec: Video encoder name
+        bitrate: Video bitrate in kbps (the max rate for rate_control 'quality')
+        frame_indices: Frame order (default: every frame once)
+        metadata: Container tags
+        audio_source: File whose first audio stream is copied (None = no audio)
+        audio_start: Second in audio_source the audio starts at
+        threads: Encoder threads (None = libav default)
+        should_stop: Optional callable; encoding fails early when it returns True
+        rate_control: 'bitrate', 'quality' or 'size' (single pass; see rate_control.py)
+        crf: Constant quality for 'quality'
+        fragmented_mp4: Write a fragmented MP4 instead of moving the index to the front afterwards
+
+    Returns:
+        bool: True if the file was written
+    """
+    try:
+        rate = _time_base_rate(fps)
+        frame_count = len(frame_indices) if frame_indices is not None else len(frame_store)
+
+        movflags = '+frag_keyframe+empty_moov+default_base_moof' if fragmented_mp4 else '+faststart'
+        with av.open(output_path, 'w', format='mp4', options={'movflags': movflags}) as output:
+            for key, value in (metadata or {}).items():
+                output.metadata[key] = value
+
+            stream = output.add_stream(codec, rate=rate)
+            stream.width = frame_store.width
+            stream.height = frame_store.height
+            stream.pix_fmt = 'yuv420p'
+            options = get_rate_control_options(codec, bitrate, rate_control, crf)
+            # -b:v is the codec context's bit_rate; the rest are encoder options
+            stream.bit_rate = int(options.pop('b:v', '0').rstrip('k')) * 1000
+            stream.options = options
+            _set_threads(stream.codec_context, threads)
+
+            if audio_source:
+                _copy_audio(output, audio_source, audio_start, frame_count / float(rate))
+
+            for index, frame in enumerate(frame_store.iter_frames(frame_indices)):
+                if should_stop and should_stop():
+                    return False
+                video_frame = av.VideoFrame.from_ndarray(frame, format='rgb24')
+                video_frame.pts = index
+                video_frame.time_base = 1 / rate
+                for packet in stream.encode(video_frame):
+                    output.mux(packet)
+            for packet in stream.encode():
+                output.mux(packet)
+
+        print(f"Video created successfully (PyAV): {output_path}")
+        return True
+
+    except Exception as e:
+        print(f"Error encoding video with PyAV: {e}")
+        try:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+        except OSError:
+            pass
+        return False
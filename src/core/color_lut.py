@@ -0,0 +1,232 @@
+"""
+3D LUT color engine.
+
+Brightness, contrast, saturation and hue are folded into a single RGB -> RGB
+3D lookup table, so any combination of color settings costs one lookup per
+pixel. LUTs are cached by their parameter tuple and can be exported as .cube
+files for FFmpeg's lut3d filter or applied in-process with trilinear lookup.
+
+The adjustments follow FFmpeg's eq and hue filters: contrast scales luma
+around mid grey, brightness offsets luma, saturation scales chroma and hue
+rotates the chroma plane.
+"""
+
+import os
+import functools
+
+import numpy as np
+
+
+# Grid points per axis - color adjustments are smooth, so 33 is visually exact
+DEFAULT_LUT_SIZE = 33
+
+# Rows processed per chunk by apply_color_lut to bound temporary memory
+APPLY_CHUNK_ROWS = 128
+
+# Full-range BT.601 RGB <-> YCbCr
+_RGB_TO_YCBCR = np.array([
+    [0.299, 0.587, 0.114],
+    [-0.168736, -0.331264, 0.5],
+    [0.5, -0.418688, -0.081312],
+], dtype=np.float64)
+_YCBCR_TO_RGB = np.linalg.inv(_RGB_TO_YCBCR)
+
+
+def color_params(brightness=1.0, contrast=1.0, saturation=1.0, hue=0.0):
+    """
+    Normalize color settings to the tuple LUTs are cached by.
+
+    Args:
+        brightness: Brightness factor (1.0 = no change)
+        contrast: Contrast factor (1.0 = no change)
+        saturation: Saturation factor (1.0 = no change)
+        hue: Hue shift in degrees
+
+    Returns:
+        (brightness, contrast, saturation, hue) rounded to the precision the
+        FFmpeg filters were given
+    """
+    return (round(float(brightness), 3), round(float(contrast), 3),
+            round(float(saturation), 3), round(float(hue), 1))
+
+
+def is_identity(params):
+    """Return True if the color parameters leave every pixel unchanged."""
+    return params == (1.0, 1.0, 1.0, 0.0)
+
+
+@functools.lru_cache(maxsize=64)
+def build_color_lut(params, size=DEFAULT_LUT_SIZE):
+    """
+    Build the 3D LUT for a color parameter tuple.
+
+    Args:
+        params: Tuple from color_params
+        size: Grid points per axis
+
+    Returns:
+        Read-only float32 array of shape (size, size, size, 3) indexed [r, g, b],
+        values in 0-1
+    """
+    brightness, contrast, saturation, hue = params
+
+    grid = np.linspace(0.0, 1.0, size)
+    r, g, b = np.meshgrid(grid, grid, grid, indexing='ij')
+    rgb = np.stack([r, g, b], axis=-1)
+
+    ycc = rgb @ _RGB_TO_YCBCR.T
+    y = ycc[..., 0]
+    cb = ycc[..., 1]
+    cr = ycc[..., 2]
+
+    # eq: contrast around mid grey, then brightness offset, saturation on chroma
+    y = (y - 0.5) * contrast + 0.5 + (brightness - 1.0)
+    cb = cb * saturation
+    cr = cr * saturation
+
+    # hue: rotate the chroma plane
+    if hue:
+        angle = np.deg2rad(hue)
+        cos_h, sin_h = np.cos(angle), np.sin(angle)
+        cb, cr = cb * cos_h - cr * sin_h, cb * sin_h + cr * cos_h
+
+    lut = np.stack([y, cb, cr], axis=-1) @ _YCBCR_TO_RGB.T
+    lut = np.clip(lut, 0.0, 1.0).astype(np.float32)
+    lut.flags.writeable = False
+    return lut
+
+
+def get_color_lut(brightness=1.0, contrast=1.0, saturation=1.0, hue=0.0, size=DEFAULT_LUT_SIZE):
+    """Return the cached 3D LUT for the given color settings."""
+    return build_color_lut(color_params(brightness, contrast, saturation, hue), size)
+
+
+def write_cube_file(lut, path, title="washer color"):
+    """
+    Write a 3D LUT as an Adobe .cube file.
+
+    The file is written next to its destination and renamed into place, so a
+    concurrent reader never sees a partial LUT.
+    """
+    size = lut.shape[0]
+    # .cube order: red varies fastest, then green, then blue
+    rows = np.ascontiguousarray(lut.transpose(2, 1, 0, 3)).reshape(-1, 3)
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as f:
+        f.write(f'TITLE "{title}"\n')
+        f.write(f"LUT_3D_SIZE {size}\n")
+        f.write("DOMAIN_MIN 0.0 0.0 0.0\n")
+        f.write("DOMAIN_MAX 1.0 1.0 1.0\n")
+        np.savetxt(f, rows, fmt='%.6f')
+    os.replace(temp_path, path)
+    return path
+
+
+def get_cube_file(cube_dir, brightness=1.0, contrast=1.0, saturation=1.0, hue=0.0, size=DEFAULT_LUT_SIZE):
+    """
+    Return a .cube file for the given color settings, writing it on first use.
+
+    cube_dir should belong to the job that reads the file (its work directory),
+    so the file lives exactly as long as the decodes that use it.
+
+    Returns:
+        Path to the .cube file
+    """
+    params = color_params(brightness, contrast, saturation, hue)
+    os.makedirs(cube_dir, exist_ok=True)
+
+    name = "lut_{}_{:+.3f}_{:.3f}_{:.3f}_{:+.1f}.cube".format(size, *params)
+    path = os.path.join(cube_dir, name)
+    if not os.path.exists(path):
+        write_cube_file(build_color_lut(params, size), path)
+    return path
+
+
+def escape_filter_path(path):
+    """Escape a file path for use as a quoted FFmpeg filter option."""
+    path = path.replace('\\', '/')
+    path = path.replace(':', '\\:')
+    path = path.replace("'", "'\\''")
+    return path
+
+
+def lut3d_filter(cube_dir, brightness=1.0, contrast=1.0, saturation=1.0, hue=0.0, size=DEFAULT_LUT_SIZE):
+    """
+    Return an FFmpeg lut3d filter applying all color settings at once.
+
+    The .cube file the filter reads is written to cube_dir (see get_cube_file).
+
+    Returns:
+        Filter string, or None if the settings leave the image unchanged
+    """
+    params = color_params(brightness, contrast, saturation, hue)
+    if is_identity(params):
+        return None
+    cube_path = get_cube_file(cube_dir, *params, size=size)
+    return f"lut3d=file='{escape_filter_path(cube_path)}':interp=trilinear"
+
+
+@functools.lru_cache(maxsize=8)
+def _lookup_tables(size):
+    """Per-channel 256-entry tables of flat-index offsets and interpolation weights."""
+    position = np.arange(256, dtype=np.float32) * ((size - 1) / 255.0)
+    low = np.minimum(position.astype(np.int32), size - 2)
+    weight = (position - low).astype(np.float32)
+    offsets = (low * size * size, low * size, low)
+    corners = (0, 1, size, size + 1, size * size, size * size + 1, size * size + size, size * size + size + 1)
+    return offsets, weight, corners
+
+
+def _lut_planes(lut):
+    """Split a LUT into flat float32 planes scaled to 0-255, one per output channel."""
+    return [np.ascontiguousarray(lut[..., channel], dtype=np.float32).ravel() * 255.0 for channel in range(3)]
+
+
+def apply_color_lut(frame, lut, out=None):
+    """
+    Apply a 3D LUT to an HxWx3 uint8 RGB frame with trilinear lookup.
+
+    Frames decoded through FFmpeg should use lut3d_filter instead; this is for
+    frames that are already in Python.
+
+    Args:
+        frame: HxWx3 uint8 RGB ndarray
+        lut: Array from build_color_lut / get_color_lut
+        out: Optional output array (may be `frame` itself for in-place use)
+
+    Returns:
+        The output array
+    """
+    if out is None:
+        out = np.empty_like(frame)
+
+    (offset_r, offset_g, offset_b), weight, corners = _lookup_tables(lut.shape[0])
+    planes = _lut_planes(lut)
+
+    for row in range(0, frame.shape[0], APPLY_CHUNK_ROWS):
+        chunk = frame[row:row + APPLY_CHUNK_ROWS]
+        r, g, b = chunk[..., 0], chunk[..., 1], chunk[..., 2]
+
+        # Flat index of the lower grid corner; the other seven are fixed strides away
+        base = offset_r[r] + offset_g[g] + offset_b[b]
+        w_r, w_g, w_b = weight[r], weight[g], weight[b]
+
+        # Output channels are written after all lookups, so out may alias frame
+        results = []
+        for plane in planes:
+            v = [plane.take(base + corner) for corner in corners]
+            c00 = v[0] + (v[1] - v[0]) * w_b
+            c01 = v[2] + (v[3] - v[2]) * w_b
+            c10 = v[4] + (v[5] - v[4]) * w_b
+            c11 = v[6] + (v[7] - v[6]) * w_b
+            c00 += (c01 - c00) * w_g
+            c10 += (c11 - c10) * w_g
+            c00 += (c10 - c00) * w_r
+            c00 += 0.5
+            results.append(c00)
+
+        for channel, result in enumerate(results):
+            out[row:row + APPLY_CHUNK_ROWS, :, channel] = result
+
+    return out
@@ -0,0 +1,154 @@
+"""
+Plain-value snapshot of the effect settings for one job.
+
+The GUI hands the engine tkinter variables; an EffectPlan holds their current
+values instead, so a job's settings can be written to JSON, sent to another
+process or machine, and turned back into the effect_vars dictionary that
+generate_washed_media takes.
+
+The GUI also keeps its live effect settings in an EffectPlan: widgets are
+bound to it when the Effects tab is built, and code that changes settings
+(presets, reset) goes through PlanVariable handles, so no widget or tkinter
+variable has to exist for the settings to be read or changed.
+"""
+
+import json
+
+
+PLAN_VERSION = 1
+
+# Every effect setting the engine reads, with the value used when it is missing
+EFFECT_DEFAULTS = {
+    # FFmpeg effects
+    'brightness_enabled': False,
+    'contrast_enabled': False,
+    'saturation_enabled': False,
+    'hue_enabled': False,
+    'blur_enabled': False,
+    'resize_enabled': False,
+    'noise_enabled': False,
+    'fps_change_enabled': False,
+    'audio_fingerprint_enabled': False,
+
+    # Frame effects
+    'region_enabled': False,
+    'region_x_var': 0,
+    'region_y_var': 0,
+    'region_width_var': 100,
+    'region_height_var': 100,
+    'region_effect_type': 'random',
+    'bitplane_enabled': False,
+    'bitplane_intensity_var': 0.5,
+    'bitplane_planes_var': 1,
+    'overlay_enabled': False,
+    'frame_overlay_interval': 1,
+    'shadow_enabled': False,
+    'shadow_h_lines_var': 0,
+    'shadow_v_lines_var': 0,
+    'shadow_intensity_var': 0.1,
+    'shadow_line_width_var': 1,
+    'shadow_speed_var': 0.5,
+
+    # Video effects
+    'clipping_enabled': False,
+    'clipping_min_var': 5.0,
+    'clipping_max_var': 10.0,
+    'flip_enabled': False,
+
+    # Randomness
+    'consistent_effects': False,
+    'effect_seed': '1',
+}
+
+
+def _read_value(var):
+    """Return the value of a tkinter-style variable, or the value itself."""
+    if hasattr(var, 'get'):
+        try:
+            return var.get()
+        except Exception:
+            return None
+    return var
+
+
+class PlanVariable:
+    """get()/set() handle on one setting of an EffectPlan, usable where a tkinter variable is expected."""
+
+    def __init__(self, plan, key):
+        self.plan = plan
+        self.key = key
+
+    def get(self):
+        return self.plan.get(self.key)
+
+    def set(self, value):
+        self.plan.set(self.key, value)
+
+
+class EffectPlan:
+    """Effect settings for one job as plain JSON-serializable values."""
+
+    def __init__(self, values=None):
+        self.values = dict(EFFECT_DEFAULTS)
+        if values:
+            self.values.update(values)
+        self._listeners = []
+
+    @classmethod
+    def from_effect_vars(cls, effect_vars):
+        """Snapshot an effect_vars dictionary (tkinter variables or plain values)."""
+        values = {}
+        for key, var in effect_vars.items():
+            value = _read_value(var)
+            if value is not None:
+                values[key] = value
+        return cls(values)
+
+    def to_effect_vars(self):
+        """Return an effect_vars dictionary generate_washed_media accepts."""
+        return dict(self.values)
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    def set(self, key, value):
+        if self.values.get(key) == value and key in self.values:
+            return
+        self.values[key] = value
+        for listener in list(self._listeners):
+            listener(key, value)
+
+    def add_listener(self, callback):
+        """Call callback(key, value) whenever set() changes a setting."""
+        self._listeners.append(callback)
+
+    def variables(self):
+        """Return an effect_vars dictionary of PlanVariable handles (reads and writes go to this plan)."""
+        return {key: PlanVariable(self, key) for key in self.values}
+
+    def enabled_effects(self):
+        """Return the names of enabled effects, e.g. ['blur', 'shadow']."""
+        return sorted(key[:-len('_enabled')] for key, value in self.values.items()
+                      if key.endswith('_enabled') and value is True)
+
+    def to_dict(self):
+        return {'version': PLAN_VERSION, 'values': dict(self.values)}
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get('version', PLAN_VERSION) > PLAN_VERSION:
+            raise ValueError(f"Effect plan version {data.get('version')} is newer than supported ({PLAN_VERSION})")
+        return cls(data.get('values', {}))
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), sort_keys=True)
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_dict(json.loads(text))
+
+    def __eq__(self, other):
+        return isinstance(other, EffectPlan) and self.values == other.values
+
+    def __repr__(self):
+        return f"EffectPlan(enabled={self.enabled_effects()})"
@@ -0,0 +1,253 @@
+"""
+Supervised FFmpeg execution.
+
+Every FFmpeg stage runs under a watchdog: the process is killed when it stops
+making progress (no -progress output, or no frames through its pipe) for
+STALL_SECONDS, or when it runs longer than a timeout scaled to the media
+duration. Stalled or timed-out runs are retried a bounded number of times.
+Failures are also recorded per thread, so the caller can attach them to the
+copy or file being processed instead of losing them in the log.
+"""
+
+import os
+import sys
+import time
+import tempfile
+import signal
+import threading
+import subprocess
+
+
+# No progress for this long means FFmpeg is hung
+STALL_SECONDS = 60
+
+# Stage timeout: fixed allowance plus a multiple of the media duration
+BASE_TIMEOUT = 120
+TIMEOUT_PER_MEDIA_SECOND = 20
+
+# ffprobe only reads headers or packets
+PROBE_TIMEOUT = 120
+
+# Extra attempts after a stall or timeout (plain errors are not retried)
+DEFAULT_RETRIES = 1
+
+_stage_failures = threading.local()
+_duration_cache = {}
+_duration_cache_lock = threading.Lock()
+
+
+def get_subprocess_creation_flags():
+    """Get the appropriate creation flags for subprocess to hide console windows on Windows."""
+    if sys.platform == "win32":
+        return subprocess.CREATE_NO_WINDOW
+    return 0
+
+
+def get_popen_group_kwargs():
+    """
+    Popen arguments that start FFmpeg in its own process group, so the watchdog
+    also kills helpers it spawned (launcher scripts, wrapper binaries).
+    """
+    if sys.platform == "win32":
+        return {}
+    return {'start_new_session': True}
+
+
+def kill_process_tree(process):
+    """Kill a process and, when it leads its own process group, everything in it."""
+    try:
+        if sys.platform != "win32" and os.getpgid(process.pid) == process.pid:
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except OSError:
+        pass
+
+
+def reset_stage_failures():
+    """Start a new failure record for the current thread."""
+    _stage_failures.items = []
+
+
+def get_stage_failures():
+    """Return the stage failures recorded on the current thread since the last reset."""
+    return list(getattr(_stage_failures, 'items', []))
+
+
+def record_stage_failure(stage, error):
+    if not hasattr(_stage_failures, 'items'):
+        _stage_failures.items = []
+    _stage_failures.items.append({'stage': stage, 'error': (error or '').strip()[-500:], 'at': time.time()})
+
+
+def stage_timeout(media_duration):
+    """Return the timeout for a stage over media_duration seconds (None = unknown, no timeout)."""
+    if not media_duration:
+        return None
+    return BASE_TIMEOUT + TIMEOUT_PER_MEDIA_SECOND * float(media_duration)
+
+
+def probe_duration(path):
+    """Return the container duration of a media file in seconds, or None."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _duration_cache_lock:
+        if key in _duration_cache:
+            return _duration_cache[key]
+
+    duration = None
+    try:
+        result = subprocess.run(['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+                                 '-of', 'default=noprint_wrappers=1:nokey=1', path],
+                                capture_output=True, text=True, timeout=PROBE_TIMEOUT,
+                                creationflags=get_subprocess_creation_flags())
+        duration = float(result.stdout.strip())
+    except (subprocess.TimeoutExpired, ValueError, OSError):
+        pass
+
+    with _duration_cache_lock:
+        if len(_duration_cache) > 256:
+            _duration_cache.clear()
+        _duration_cache[key] = duration
+    return duration
+
+
+def _command_duration(cmd):
+    """Estimate how much media an ffmpeg command processes from its -t and first input."""
+    limit = None
+    if '-t' in cmd:
+        try:
+            limit = float(cmd[cmd.index('-t') + 1])
+        except (ValueError, IndexError):
+            pass
+    duration = None
+    if '-i' in cmd:
+        source = cmd[cmd.index('-i') + 1]
+        if os.path.isfile(source):  # Never probe pipes or devices
+            duration = probe_duration(source)
+    if limit is not None:
+        return min(limit, duration) if duration else limit
+    return duration
+
+
+class ProcessWatchdog:
+    """
+    Kills a process that makes no progress for stall_timeout seconds or runs
+    longer than timeout. Callers report progress with touch().
+    """
+
+    def __init__(self, process, stall_timeout=STALL_SECONDS, timeout=None, description="ffmpeg"):
+        self.process = process
+        self.stall_timeout = stall_timeout
+        self.timeout = timeout
+        self.description = description
+        self.stalled = False
+        self.timed_out = False
+        self._started = time.monotonic()
+        self._last_progress = self._started
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def touch(self):
+        self._last_progress = time.monotonic()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    @property
+    def reason(self):
+        if self.stalled:
+            return f"no progress for {self.stall_timeout:.0f}s"
+        if self.timed_out:
+            return f"exceeded {self.timeout:.0f}s timeout"
+        return None
+
+    def _run(self):
+        while not self._stop.wait(0.5):
+            if self.process.poll() is not None:
+                return
+            now = time.monotonic()
+            if self.stall_timeout and now - self._last_progress > self.stall_timeout:
+                self.stalled = True
+            elif self.timeout and now - self._started > self.timeout:
+                self.timed_out = True
+            else:
+                continue
+            print(f"Watchdog: killing {self.description} ({self.reason})")
+            kill_process_tree(self.process)
+            return
+
+
+class FFmpegResult(subprocess.CompletedProcess):
+    """CompletedProcess with the watchdog outcome of a supervised run."""
+
+    def __init__(self, args, returncode, stdout=None, stderr=None, stalled=False, timed_out=False, attempts=1):
+        super().__init__(args, returncode, stdout, stderr)
+        self.stalled = stalled
+        self.timed_out = timed_out
+        self.attempts = attempts
+
+
+def _run_once(cmd, stall_timeout, timeout, description):
+    # -progress writes key=value lines to stdout as FFmpeg advances; they feed the watchdog
+    supervised = [cmd[0], '-progress', 'pipe:1', '-nostats'] + list(cmd[1:])
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(supervised, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=stderr_file,
+                                   creationflags=get_subprocess_creation_flags(), **get_popen_group_kwargs())
+        watchdog = ProcessWatchdog(process, stall_timeout, timeout, description).start()
+        try:
+            for _ in iter(process.stdout.readline, b''):
+                watchdog.touch()
+            returncode = process.wait()
+        finally:
+            process.stdout.close()
+            watchdog.stop()
+        stderr_file.seek(0)
+        stderr = stderr_file.read().decode(errors='replace')
+
+    if watchdog.reason:
+        stderr = f"{stderr}\n[watchdog] {description} killed: {watchdog.reason}".strip()
+        returncode = returncode or -1
+    return FFmpegResult(cmd, returncode, '', stderr, watchdog.stalled, watchdog.timed_out)
+
+
+def run_ffmpeg(cmd, media_duration=None, stall_timeout=STALL_SECONDS, timeout=None,
+               retries=DEFAULT_RETRIES, description=None):
+    """
+    Run an ffmpeg command that writes to a file, under a watchdog.
+
+    Args:
+        cmd: ffmpeg command list (output file last)
+        media_duration: Seconds of media processed (default: from -t / the first input)
+        stall_timeout: Seconds without progress before the process is killed
+        timeout: Total seconds allowed (default: scaled to media_duration)
+        retries: Extra attempts after a stall or timeout
+        description: Name used in logs and failure records (default: output file name)
+
+    Returns:
+        FFmpegResult - used like the CompletedProcess of subprocess.run
+    """
+    description = description or f"ffmpeg -> {os.path.basename(str(cmd[-1]))}"
+    if timeout is None:
+        timeout = stage_timeout(media_duration if media_duration is not None else _command_duration(cmd))
+
+    attempt = 0
+    while True:
+        attempt += 1
+        result = _run_once(cmd, stall_timeout, timeout, description)
+        result.attempts = attempt
+        if result.returncode == 0:
+            return result
+        if (result.stalled or result.timed_out) and attempt <= retries:
+            print(f"Retrying {description} (attempt {attempt + 1}/{retries + 1})")
+            continue
+        record_stage_failure(description, result.stderr)
+        return result
@@ -0,0 +1,308 @@
+"""
+Frame storage backends for the frame-effects pipeline.
+
+Extraction, frame effects and encoding all work against the FrameStore
+interface, so a clip can be held in RAM, spilled to a numpy memmap or kept as
+the legacy JPEG directory without the pipeline knowing which one it got.
+Frames are always HxWx3 uint8 RGB ndarrays.
+"""
+
+import os
+import sys
+import glob
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+# Share of the currently available RAM a clip may occupy before it is spilled to disk
+MEMORY_BUDGET_FRACTION = 0.25
+
+# Used when the available RAM cannot be determined
+DEFAULT_AVAILABLE_MEMORY = 2 * 1024 ** 3
+
+
+class FrameStore:
+    """Base class for frame stores holding HxWx3 uint8 RGB frames."""
+
+    backend = None
+
+    def __init__(self):
+        self.width = None
+        self.height = None
+
+    def append(self, frame):
+        """Add a frame at the end of the store."""
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def __getitem__(self, index):
+        raise NotImplementedError
+
+    def __setitem__(self, index, frame):
+        raise NotImplementedError
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def iter_frames(self, indices=None):
+        """Yield frames in order, or the frames at the given indices."""
+        if indices is None:
+            yield from self
+        else:
+            for index in indices:
+                yield self[index]
+
+    def close(self):
+        """Release memory and delete any files owned by the store."""
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def _set_shape(self, frame):
+        """Record the frame size from the first frame written to the store."""
+        height, width = frame.shape[:2]
+        if self.width is None:
+            self.width = width
+            self.height = height
+        elif (width, height) != (self.width, self.height):
+            raise ValueError(f"Frame size {width}x{height} does not match store size {self.width}x{self.height}")
+
+
+class RingBufferFrameStore(FrameStore):
+    """
+    In-memory frame store.
+
+    With a capacity, only the most recent frames are kept and older ones are
+    evicted, which suits streaming consumers that never look back. Without a
+    capacity it holds the whole clip.
+    """
+
+    backend = 'memory'
+
+    def __init__(self, capacity=None):
+        super().__init__()
+        self.capacity = capacity
+        self._frames = deque(maxlen=capacity)
+        self._first_index = 0  # Absolute index of the oldest retained frame
+
+    def append(self, frame):
+        self._set_shape(frame)
+        if self.capacity is not None and len(self._frames) == self.capacity:
+            self._first_index += 1
+        self._frames.append(np.ascontiguousarray(frame, dtype=np.uint8))
+
+    def __len__(self):
+        return self._first_index + len(self._frames)
+
+    def _position(self, index):
+        if index < 0:
+            index += len(self)
+        position = index - self._first_index
+        if position < 0:
+            raise IndexError(f"Frame {index} has already been evicted from the ring buffer")
+        if position >= len(self._frames):
+            raise IndexError(f"Frame index {index} out of range")
+        return position
+
+    def __getitem__(self, index):
+        return self._frames[self._position(index)]
+
+    def __setitem__(self, index, frame):
+        position = self._position(index)
+        if frame is not self._frames[position]:
+            self._frames[position] = np.ascontiguousarray(frame, dtype=np.uint8)
+
+    def close(self):
+        self._frames.clear()
+
+
+class MemmapFrameStore(FrameStore):
+    """
+    Frame store backed by a single numpy.memmap uint8 array on disk.
+
+    Gives random access to every frame without per-frame files, and the OS
+    pages frames in and out so long clips never have to fit in RAM.
+    """
+
+    backend = 'memmap'
+
+    def __init__(self, directory, expected_frames=0):
+        super().__init__()
+        self.directory = directory
+        self.path = os.path.join(directory, "frames.u8")
+        self._capacity = max(1, int(expected_frames or 0))
+        self._count = 0
+        self._array = None
+
+    def _open(self, capacity, mode):
+        self._array = np.memmap(self.path, dtype=np.uint8, mode=mode,
+                                shape=(capacity, self.height, self.width, 3))
+        self._capacity = capacity
+
+    def _grow(self):
+        """Double the backing file when more frames arrive than were expected."""
+        new_capacity = self._capacity * 2
+        self._array.flush()
+        self._array = None
+        with open(self.path, 'r+b') as f:
+            f.truncate(new_capacity * self.height * self.width * 3)
+        self._open(new_capacity, 'r+')
+
+    def append(self, frame):
+        self._set_shape(frame)
+        if self._array is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._open(self._capacity, 'w+')
+        elif self._count == self._capacity:
+            self._grow()
+        self._array[self._count] = frame
+        self._count += 1
+
+    def __len__(self):
+        return self._count
+
+    def _check_index(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError(f"Frame index {index} out of range")
+        return index
+
+    def __getitem__(self, index):
+        return self._array[self._check_index(index)]
+
+    def __setitem__(self, index, frame):
+        target = self._array[self._check_index(index)]
+        # Frames modified in place through the view returned by __getitem__ are already stored
+        if not np.may_share_memory(frame, target):
+            target[...] = frame
+
+    def close(self):
+        self._array = None
+        try:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            os.rmdir(self.directory)
+        except OSError:
+            pass
+
+
+class JpegFrameStore(FrameStore):
+    """Legacy frame store writing one JPEG file per frame into a directory."""
+
+    backend = 'jpeg'
+
+    def __init__(self, directory, quality=95):
+        super().__init__()
+        self.directory = directory
+        self.quality = quality
+        self.paths = []
+
+        os.makedirs(directory, exist_ok=True)
+        # Clear existing frames
+        for f in glob.glob(os.path.join(directory, "*.jpg")):
+            os.remove(f)
+
+    def _write(self, path, frame):
+        self._set_shape(frame)
+        cv2.imwrite(path, cv2.cvtColor(frame, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+
+    def append(self, frame):
+        path = os.path.join(self.directory, f"frame_{len(self.paths):06d}.jpg")
+        self._write(path, frame)
+        self.paths.append(path)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, index):
+        frame = cv2.imread(self.paths[index], cv2.IMREAD_COLOR)
+        if frame is None:
+            raise IOError(f"Could not read frame {self.paths[index]}")
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    def __setitem__(self, index, frame):
+        self._write(self.paths[index], frame)
+
+    def close(self):
+        for path in self.paths:
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError:
+                pass
+        self.paths = []
+        try:
+            os.rmdir(self.directory)
+        except OSError:
+            pass
+
+
+def get_available_memory():
+    """Return the currently available RAM in bytes (best effort)."""
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except ImportError:
+        pass
+
+    try:
+        if sys.platform.startswith('linux'):
+            with open('/proc/meminfo') as f:
+                for line in f:
+                    if line.startswith('MemAvailable:'):
+                        return int(line.split()[1]) * 1024
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return DEFAULT_AVAILABLE_MEMORY
+
+
+def estimate_clip_bytes(frame_count, width, height):
+    """Return the raw RGB size of a clip in bytes."""
+    return max(0, int(frame_count)) * max(0, int(width)) * max(0, int(height)) * 3
+
+
+def create_frame_store(frame_count, width, height, work_dir, backend='auto'):
+    """
+    Create a frame store for a clip.
+
+    Args:
+        frame_count: Expected number of frames (None if unknown)
+        width: Expected frame width
+        height: Expected frame height
+        work_dir: Directory for backends that spill to disk
+        backend: 'auto', 'memory', 'memmap' or 'jpeg'
+
+    Returns:
+        FrameStore instance. 'auto' keeps the clip in RAM when it fits in the
+        memory budget and spills to a memmap otherwise. A clip of unknown length
+        goes to a memmap, which grows as frames arrive, since nothing bounds how
+        much RAM it would take.
+    """
+    if backend == 'auto':
+        if frame_count is None:
+            return MemmapFrameStore(work_dir)
+        clip_bytes = estimate_clip_bytes(frame_count, width, height)
+        if clip_bytes <= get_available_memory() * MEMORY_BUDGET_FRACTION:
+            backend = 'memory'
+        else:
+            backend = 'memmap'
+
+    if backend == 'memory':
+        return RingBufferFrameStore()
+    elif backend == 'memmap':
+        return MemmapFrameStore(work_dir, expected_frames=frame_count)
+    elif backend == 'jpeg':
+        return JpegFrameStore(work_dir)
+    else:
+        raise ValueError(f"Unknown frame store backend: {backend}")
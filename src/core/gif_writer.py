@@ -0,0 +1,152 @@
+"""
+Streaming GIF writer that only stores what changes between frames.
+
+PIL's multi-frame GIF save keeps every frame in memory until the end and
+quantizes each frame with its own palette, so even pixels that never change
+come out with different palette indices and are written again in every
+frame. This writer instead compares each frame with the pixels currently on
+screen:
+
+- only the bounding box of the changed pixels is written, with a local
+  palette built from that area alone;
+- unchanged pixels inside the box are transparent, so the previous frame
+  shows through (disposal "do not dispose");
+- a frame with no changes is not written at all; the previous frame's
+  delay is extended instead.
+
+Frames are written as they arrive. Memory is the reference frame plus one
+pending frame, whatever the length of the GIF.
+"""
+
+import struct
+
+import cv2
+import numpy as np
+from PIL import Image, GifImagePlugin
+
+
+# Palette index reserved for "unchanged" pixels; quantized areas use 0-254
+TRANSPARENT_INDEX = 255
+
+# Per-channel difference treated as "unchanged" at quality 0 (quality 100 = exact)
+MAX_DELTA_TOLERANCE = 16
+
+# Graphic control extension disposal method: leave the frame in place
+DISPOSAL_KEEP = 1
+
+
+def delta_tolerance(quality):
+    """Return the per-channel difference below which a pixel counts as unchanged."""
+    quality = max(0, min(100, int(quality)))
+    return int(round((100 - quality) / 100.0 * MAX_DELTA_TOLERANCE))
+
+
+def _sub_blocks(data):
+    """Split data into GIF data sub-blocks (length-prefixed, zero-terminated)."""
+    blocks = b''.join(bytes([len(data[i:i + 255])]) + data[i:i + 255] for i in range(0, len(data), 255))
+    return blocks + b'\0'
+
+
+class GifDeltaWriter:
+    """
+    Writes an animated GIF frame by frame.
+
+    Args:
+        output_path: GIF file to write
+        width, height: Canvas size
+        quality: 0-100; below 100, pixels that changed by less than
+            delta_tolerance(quality) per channel are left as they are
+        loop: Loop count (0 = forever)
+        comment: Optional comment extension text
+    """
+
+    def __init__(self, output_path, width, height, quality=100, loop=0, comment=None):
+        self.width = width
+        self.height = height
+        self.tolerance = delta_tolerance(quality)
+        self.frames_written = 0
+        self.frames_merged = 0
+        self._reference = None  # Source pixels of what is on screen
+        self._pending = None    # (image, offset, transparent, start_ms) of the last frame, written once its delay is known
+        self._elapsed_ms = 0.0
+        self._file = open(output_path, 'wb')
+        self._write_header(loop, comment)
+
+    def _write_header(self, loop, comment):
+        # Logical screen without a global color table - every frame has a local one
+        self._file.write(b'GIF89a' + struct.pack('<HHBBB', self.width, self.height, 0, 0, 0))
+        self._file.write(b'!\xff\x0bNETSCAPE2.0\x03\x01' + struct.pack('<H', loop) + b'\0')
+        if comment:
+            self._file.write(b'!\xfe' + _sub_blocks(comment.encode('utf-8')))
+
+    def add_frame(self, frame, duration_ms):
+        """Add an RGB frame (height x width x 3 uint8) shown for duration_ms."""
+        if self._reference is None:
+            self._reference = np.array(frame, dtype=np.uint8, copy=True)
+            self._queue(self._reference, None, (0, 0), duration_ms)
+            return
+
+        difference = cv2.absdiff(frame, self._reference).max(axis=2)
+        changed = difference > self.tolerance
+        rows = np.flatnonzero(changed.any(axis=1))
+        if rows.size == 0:
+            # Identical to what is on screen - hold the previous frame longer
+            self._elapsed_ms += duration_ms
+            self.frames_merged += 1
+            return
+        cols = np.flatnonzero(changed.any(axis=0))
+        top, bottom, left, right = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+
+        mask = changed[top:bottom, left:right]
+        self._reference[top:bottom, left:right][mask] = frame[top:bottom, left:right][mask]
+        self._queue(frame[top:bottom, left:right], mask, (int(left), int(top)), duration_ms)
+
+    def _queue(self, pixels, mask, offset, duration_ms):
+        if mask is not None and mask.all():
+            mask = None  # Every pixel in the box changed - no transparency needed
+        colors = 256 if mask is None else TRANSPARENT_INDEX
+        image = Image.fromarray(np.ascontiguousarray(pixels)).quantize(colors)
+        if mask is not None:
+            indices = np.array(image, dtype=np.uint8)
+            indices[~mask] = TRANSPARENT_INDEX
+            palette = image.getpalette()
+            image = Image.fromarray(indices, 'P')
+            image.putpalette(palette + [0] * (768 - len(palette)))
+
+        self._flush_pending()
+        self._pending = (image, offset, mask is not None, self._elapsed_ms)
+        self._elapsed_ms += duration_ms
+
+    def _flush_pending(self):
+        if self._pending is None:
+            return
+        image, offset, transparent, start_ms = self._pending
+        # Delays are whole centiseconds; rounding the end times keeps the total in step
+        delay = int(round(self._elapsed_ms / 10.0)) - int(round(start_ms / 10.0))
+        packed = (DISPOSAL_KEEP << 2) | (1 if transparent else 0)
+        self._file.write(b'!\xf9\x04' + struct.pack('<BHB', packed, max(0, delay), TRANSPARENT_INDEX) + b'\0')
+        for chunk in GifImagePlugin.getdata(image, offset, include_color_table=True):
+            self._file.write(chunk)
+        self.frames_written += 1
+        self._pending = None
+
+    def close(self):
+        """Write the last frame and the trailer and close the file."""
+        try:
+            self._flush_pending()
+            self._file.write(b';')
+        finally:
+            self._file.close()
+
+    def abort(self):
+        """Close the file without finishing it (the caller removes it)."""
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
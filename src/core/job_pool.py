@@ -0,0 +1,369 @@
+"""
+In-process queue of wash jobs run concurrently on background threads.
+
+The GUI's queue panel submits jobs (a source plus a snapshot of the settings)
+to a JobPool. Up to max_concurrent jobs run at once, each admitted by the
+resource scheduler like a single GUI job, and each can be cancelled on its
+own through its stop event (see should_stop in process.py). Queued jobs can
+be reordered and paused; pausing a running job stops it and puts it back as
+paused, to be run again from the start when resumed.
+
+Progress of every job is reported into a ProgressBus under the job's id.
+Jobs may share an output folder: each keeps its intermediates in a work
+directory of its own (see generate_washed_media) and records the files it
+wrote in its outputs.
+
+A batch of sources (submit_batch, generate_washed_batch) is probed in parallel
+and queued longest expected job first. With jobs started in queue order on the
+first free slot, that is LPT list scheduling: the long clips start early and
+the short ones fill in around them, instead of one large file starting last
+and running alone while the other slots sit idle.
+
+Job states:
+    queued     waiting for a free slot, in queue order
+    paused     held back until resumed
+    running    being processed
+    done       finished with at least one output
+    failed     finished without outputs, or raised
+    cancelled  cancelled by the user
+"""
+
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.core.process import generate_washed_media, get_video_info_ffprobe, default_segment_workers
+from src.core.resource_scheduler import get_default_scheduler, estimate_job_cost
+
+
+DEFAULT_MAX_CONCURRENT = 2
+
+# ffprobe processes run at once when a batch is probed
+DEFAULT_PROBE_WORKERS = 8
+
+FINISHED_STATES = ('done', 'failed', 'cancelled')
+
+
+def probe_sources(video_paths, max_workers=DEFAULT_PROBE_WORKERS):
+    """Probe sources in parallel. Returns {path: video info} (an empty dict for unreadable sources)."""
+    video_paths = list(video_paths)
+    if not video_paths:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(video_paths)))) as executor:
+        return dict(zip(video_paths, executor.map(get_video_info_ffprobe, video_paths)))
+
+
+def _estimate_cost(video_info, effect_vars, output_mode, options):
+    return estimate_job_cost(video_info, effect_vars, output_mode, options.get('start_time', 0),
+                             options.get('end_time'), options.get('copies', 1),
+                             options.get('segment_workers') or default_segment_workers(),
+                             options.get('fps'), options.get('gif_max_dimension'))
+
+
+def order_longest_first(video_paths, effect_vars, output_mode='video', probes=None, **options):
+    """
+    Order sources by expected work, largest first.
+
+    Args:
+        video_paths: Source paths
+        effect_vars, output_mode, options: Settings of the jobs (as JobPool.submit)
+        probes: {path: video info} from probe_sources (probed here if None)
+
+    Returns:
+        List of (path, JobCost); unreadable sources come last
+    """
+    probes = probe_sources(video_paths) if probes is None else probes
+    costs = [(path, _estimate_cost(probes.get(path) or {}, effect_vars, output_mode, options)) for path in video_paths]
+    # sorted() is stable, so equal estimates keep the order they were given in
+    return sorted(costs, key=lambda item: item[1].work, reverse=True)
+
+
+class PooledJob:
+    """One queued wash job and its outcome."""
+
+    def __init__(self, video_path, output_folder, prefix, output_mode, effect_vars, options, video_info=None):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.video_path = video_path
+        self.output_folder = output_folder
+        self.prefix = prefix
+        self.output_mode = output_mode
+        self.effect_vars = dict(effect_vars)
+        self.options = dict(options)
+        self.video_info = video_info  # Probe result, if the job was probed when it was queued
+        self.state = 'queued'
+        self.error = None
+        self.failures = []
+        self.outputs = []  # Files this job wrote
+        self.stop_event = threading.Event()
+        self.pause_requested = False
+        self.thread = None
+        self.started_at = None   # time.time() of the last start
+        self.finished_at = None
+
+    @property
+    def name(self):
+        return os.path.basename(self.video_path)
+
+    def to_dict(self):
+        return {'job_id': self.job_id, 'name': self.name, 'video_path': self.video_path,
+                'output_mode': self.output_mode, 'copies': self.options.get('copies', 1),
+                'state': self.state, 'error': self.error, 'failures': list(self.failures),
+                'outputs': list(self.outputs), 'started_at': self.started_at, 'finished_at': self.finished_at}
+
+
+class JobPool:
+    """
+    Runs submitted jobs in queue order, at most max_concurrent at a time.
+
+    Args:
+        max_concurrent: Jobs run at once
+        progress_bus: Optional ProgressBus the jobs report into (worker = job id)
+        scheduler: ResourceScheduler admitting each job (default: the process-wide one)
+    """
+
+    def __init__(self, max_concurrent=DEFAULT_MAX_CONCURRENT, progress_bus=None, scheduler=None):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.progress_bus = progress_bus
+        self.scheduler = scheduler or get_default_scheduler()
+        self._jobs = []
+        self._lock = threading.Lock()
+        self._finished = threading.Condition(self._lock)
+
+    def submit(self, video_path, output_folder, prefix, output_mode, effect_vars, video_info=None, **options):
+        """
+        Queue a job. options are generate_washed_media keyword arguments
+        (start_time, end_time, fps, quality, codec, bitrate, copies, speed, ...).
+        video_info is the source's probe result, if already known.
+
+        Returns:
+            The job id
+        """
+        job = PooledJob(video_path, output_folder, prefix, output_mode, effect_vars, options, video_info)
+        with self._lock:
+            self._jobs.append(job)
+        self._report(job, "Queued", restart=True)
+        self._dispatch()
+        return job.job_id
+
+    def submit_batch(self, video_paths, output_folder, output_mode, effect_vars, prefix=None, **options):
+        """
+        Probe sources in parallel and queue one job per source, longest expected job first.
+
+        Outputs are named after each source, behind prefix if one is given.
+
+        Returns:
+            Job ids in the order they were queued
+        """
+        video_paths = list(dict.fromkeys(video_paths))  # Drop duplicates, keep order
+        probes = probe_sources(video_paths)
+        job_ids = []
+        for path, cost in order_longest_first(video_paths, effect_vars, output_mode, probes, **options):
+            name = os.path.splitext(os.path.basename(path))[0]
+            job_prefix = f"{prefix}_{name}" if prefix else name
+            print(f"Queueing {os.path.basename(path)}: {cost.description}")
+            job_ids.append(self.submit(path, output_folder, job_prefix, output_mode, effect_vars,
+                                       video_info=probes.get(path) or None, **options))
+        return job_ids
+
+    def wait(self, job_ids=None, timeout=None):
+        """
+        Wait until the given jobs (default: all) are done, failed or cancelled.
+
+        Returns:
+            True if they all finished, False on timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._finished:
+            while True:
+                jobs = self._jobs if job_ids is None else [job for job in self._jobs if job.job_id in job_ids]
+                if all(job.state in FINISHED_STATES for job in jobs):
+                    return True
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._finished.wait(remaining)
+
+    def jobs(self):
+        """Return a dict per job (see PooledJob.to_dict), in queue order."""
+        with self._lock:
+            return [job.to_dict() for job in self._jobs]
+
+    def set_max_concurrent(self, max_concurrent):
+        with self._lock:
+            self.max_concurrent = max(1, int(max_concurrent))
+        self._dispatch()
+
+    def move(self, job_id, offset):
+        """Move a job offset places up (negative) or down the queue. Returns True if it moved."""
+        with self._lock:
+            job = self._find(job_id)
+            if job is None:
+                return False
+            index = self._jobs.index(job)
+            new_index = max(0, min(len(self._jobs) - 1, index + offset))
+            if new_index == index:
+                return False
+            self._jobs.insert(new_index, self._jobs.pop(index))
+        if self.progress_bus:
+            self.progress_bus.touch()
+        self._dispatch()
+        return True
+
+    def pause(self, job_id):
+        """Hold a queued job, or stop a running one and hold it. Returns True if paused."""
+        with self._lock:
+            job = self._find(job_id)
+            if job is None or job.state not in ('queued', 'running'):
+                return False
+            if job.state == 'queued':
+                job.state = 'paused'
+            else:
+                job.pause_requested = True
+                job.stop_event.set()
+        self._report(job, "Paused" if job.state == 'paused' else "Pausing...")
+        return True
+
+    def resume(self, job_id):
+        """Put a paused job back in the queue. Returns True if resumed."""
+        with self._lock:
+            job = self._find(job_id)
+            if job is None or job.state != 'paused':
+                return False
+            job.state = 'queued'
+        self._report(job, "Queued", restart=True)
+        self._dispatch()
+        return True
+
+    def cancel(self, job_id):
+        """Cancel a queued, paused or running job. Returns True if it was cancelled."""
+        with self._lock:
+            job = self._find(job_id)
+            if job is None or job.state in FINISHED_STATES:
+                return False
+            job.pause_requested = False
+            if job.state == 'running':
+                job.stop_event.set()
+            else:
+                job.state = 'cancelled'
+                self._finished.notify_all()
+        self._report(job, "Cancelled" if job.state == 'cancelled' else "Cancelling...")
+        return True
+
+    def cancel_all(self):
+        for job in self.jobs():
+            self.cancel(job['job_id'])
+
+    def clear_finished(self, job_ids=None):
+        """Remove done, failed and cancelled jobs from the list (only those in job_ids, if given)."""
+        with self._lock:
+            finished = [job for job in self._jobs if job.state in FINISHED_STATES
+                        and (job_ids is None or job.job_id in job_ids)]
+            self._jobs = [job for job in self._jobs if job not in finished]
+        if self.progress_bus:
+            for job in finished:
+                self.progress_bus.remove_worker(job.job_id)
+
+    def running_count(self):
+        with self._lock:
+            return sum(1 for job in self._jobs if job.state == 'running')
+
+    def _find(self, job_id):
+        for job in self._jobs:
+            if job.job_id == job_id:
+                return job
+        return None
+
+    def _report(self, job, message, restart=False):
+        if self.progress_bus:
+            if restart:
+                self.progress_bus.add_worker(job.job_id, job.options.get('copies', 1))
+            self.progress_bus.stage(message, job.job_id)
+
+    def _dispatch(self):
+        """Start queued jobs, in queue order, while there are free slots."""
+        with self._lock:
+            running = sum(1 for job in self._jobs if job.state == 'running')
+            to_start = []
+            for job in self._jobs:
+                if running >= self.max_concurrent:
+                    break
+                if job.state == 'queued':
+                    job.state = 'running'
+                    job.stop_event.clear()
+                    job.pause_requested = False
+                    job.error = None
+                    job.failures = []
+                    job.outputs = []
+                    job.started_at = time.time()
+                    job.finished_at = None
+                    to_start.append(job)
+                    running += 1
+        for job in to_start:
+            job.thread = threading.Thread(target=self._run, args=(job,), daemon=True)
+            job.thread.start()
+
+    def _run(self, job):
+        allocation = None
+        state = 'failed'
+        try:
+            self._report(job, "Waiting for resources...", restart=True)
+            options = dict(job.options)
+            cost = _estimate_cost(job.video_info or get_video_info_ffprobe(job.video_path), job.effect_vars,
+                                  job.output_mode, options)
+            options.pop('segment_workers', None)  # The allocation decides
+            allocation = self.scheduler.acquire(cost, should_stop=job.stop_event.is_set)
+
+            if allocation is not None:
+                progress_callback = status_callback = copy_callback = None
+                if self.progress_bus:
+                    progress_callback, status_callback, copy_callback = self.progress_bus.callbacks(job.job_id)
+                success = generate_washed_media(
+                    job.video_path, job.output_folder, job.prefix, job.output_mode, job.effect_vars,
+                    progress_callback=progress_callback, status_callback=status_callback,
+                    copy_callback=copy_callback, segment_workers=allocation.segment_workers,
+                    threads=allocation.threads, failures=job.failures, stop_event=job.stop_event,
+                    outputs=job.outputs, **options)
+                state = 'done' if success else 'failed'
+                if not success and job.failures:
+                    job.error = job.failures[0].get('error')
+
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            print(f"Error running queued job {job.name}: {job.error}")
+
+        finally:
+            if allocation is not None:
+                self.scheduler.release(allocation)
+            with self._lock:
+                # A stop that arrives after the last copy finished does not undo a completed job
+                if state != 'done' and job.stop_event.is_set():
+                    state = 'paused' if job.pause_requested else 'cancelled'
+                job.state = state
+                job.finished_at = time.time()
+                self._finished.notify_all()
+            if self.progress_bus:
+                if state in ('done', 'failed'):
+                    self.progress_bus.worker_done(job.job_id)
+                message = {'done': "Done", 'failed': f"Failed: {job.error or 'no output'}",
+                           'paused': "Paused", 'cancelled': "Cancelled"}[state]
+                self.progress_bus.stage(message, job.job_id)
+            self._dispatch()
+
+
+def generate_washed_batch(video_paths, output_folder, output_mode, effect_vars, workers=DEFAULT_MAX_CONCURRENT,
+                          prefix=None, progress_bus=None, scheduler=None, **options):
+    """
+    Wash many sources, up to workers at once, longest expected job first, and wait for them.
+
+    Takes generate_washed_media's settings as keyword arguments (applied to every source).
+
+    Returns:
+        List of job dicts (see PooledJob.to_dict) in the order the jobs were queued
+    """
+    pool = JobPool(workers, progress_bus, scheduler)
+    job_ids = pool.submit_batch(video_paths, output_folder, output_mode, effect_vars, prefix, **options)
+    pool.wait(job_ids)
+    jobs = {job['job_id']: job for job in pool.jobs()}
+    return [jobs[job_id] for job_id in job_ids]
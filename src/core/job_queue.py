@@ -0,0 +1,544 @@
+"""
+Shared-directory job queue for running washer jobs on several machines.
+
+A coordinator submits job descriptors (source, EffectPlan, output target) into
+a queue directory on a filesystem every node can reach. Worker processes claim
+jobs by renaming them out of pending/, which only one claimant can win, keep a
+lease file fresh while they work, and move the job to done/ or failed/ with a
+result record. Jobs whose lease expires (worker crashed or lost the share) are
+put back into pending/ by any worker or the coordinator.
+
+Layout of a queue directory:
+    pending/<job_id>.json   waiting to be claimed
+    claimed/<job_id>.json   being processed
+    leases/<job_id>.json    owner and expiry of a claimed job
+    done/<job_id>.json      descriptor plus result
+    failed/<job_id>.json    descriptor plus error, after the last attempt
+    workers/<worker>.json   worker heartbeats
+
+Lease expiry compares wall-clock times written by different machines, so node
+clocks should be kept in sync (NTP).
+
+Usage:
+    python -m src.core.job_queue submit QUEUE_DIR SOURCE OUTPUT_FOLDER [--plan plan.json]
+    python -m src.core.job_queue worker QUEUE_DIR
+    python -m src.core.job_queue status QUEUE_DIR
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+import uuid
+import socket
+import argparse
+import threading
+
+from src.core.effect_plan import EffectPlan
+from src.core.resource_scheduler import ResourceScheduler, get_default_scheduler, estimate_job_cost
+
+
+QUEUE_DIRS = ('pending', 'claimed', 'leases', 'done', 'failed', 'workers', 'tmp')
+
+DEFAULT_LEASE_SECONDS = 60
+DEFAULT_POLL_INTERVAL = 2.0
+DEFAULT_MAX_ATTEMPTS = 3
+
+# Options passed through to generate_washed_media
+JOB_OPTIONS = ('start_time', 'end_time', 'fps', 'quality', 'codec', 'bitrate',
+               'copies', 'speed', 'copy_type', 'segment_workers', 'media_backend', 'gif_max_dimension',
+               'rate_control', 'crf', 'target_size_mb', 'two_pass', 'fragmented_mp4')
+
+
+def init_queue(queue_dir):
+    """Create the queue directory layout if it does not exist."""
+    for name in QUEUE_DIRS:
+        os.makedirs(os.path.join(queue_dir, name), exist_ok=True)
+
+
+def _path(queue_dir, state, job_id):
+    return os.path.join(queue_dir, state, f"{job_id}.json")
+
+
+def _write_json_atomic(queue_dir, path, data):
+    """Write JSON through queue_dir/tmp and rename it into place so readers never see partial files."""
+    temp_path = os.path.join(queue_dir, 'tmp', f"{uuid.uuid4().hex}.json")
+    with open(temp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def default_worker_id():
+    """Return an id unique to this worker process across machines."""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def submit_job(queue_dir, source, output_folder, effect_plan, output_mode='video', prefix=None,
+               max_attempts=DEFAULT_MAX_ATTEMPTS, **options):
+    """
+    Add a job to the queue.
+
+    Args:
+        queue_dir: Shared queue directory
+        source: Source video path, as seen by the workers
+        output_folder: Output folder, as seen by the workers
+        effect_plan: EffectPlan (or effect_vars dictionary) for the job
+        output_mode: 'video', 'gif', 'webp', 'webp_lossless' or 'apng'
+        prefix: Output file prefix (default: source file name)
+        max_attempts: Claims allowed before the job is failed
+        **options: generate_washed_media options (start_time, copies, codec, ...)
+
+    Returns:
+        The job id
+    """
+    unknown = set(options) - set(JOB_OPTIONS)
+    if unknown:
+        raise ValueError(f"Unknown job options: {', '.join(sorted(unknown))}")
+
+    if not isinstance(effect_plan, EffectPlan):
+        effect_plan = EffectPlan.from_effect_vars(effect_plan)
+
+    init_queue(queue_dir)
+    # Time-ordered ids, so workers take jobs roughly first in, first out
+    job_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    job = {
+        'job_id': job_id,
+        'source': source,
+        'output_folder': output_folder,
+        'output_mode': output_mode,
+        'prefix': prefix or os.path.splitext(os.path.basename(source))[0],
+        'effect_plan': effect_plan.to_dict(),
+        'options': options,
+        'submitted_at': time.time(),
+        'submitted_by': default_worker_id(),
+        'attempts': 0,
+        'max_attempts': max_attempts,
+        'history': [],
+    }
+    _write_json_atomic(queue_dir, _path(queue_dir, 'pending', job_id), job)
+    return job_id
+
+
+def write_lease(queue_dir, job_id, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS, status=None):
+    """Create or renew the lease of a claimed job."""
+    now = time.time()
+    _write_json_atomic(queue_dir, _path(queue_dir, 'leases', job_id), {
+        'job_id': job_id,
+        'worker_id': worker_id,
+        'heartbeat_at': now,
+        'expires_at': now + lease_seconds,
+        'status': status,
+    })
+
+
+def claim_job(queue_dir, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """
+    Claim the oldest pending job.
+
+    The rename from pending/ to claimed/ is atomic, so when several workers race
+    for the same job exactly one of them gets it. The descriptor is touched
+    first: a rename keeps the file's old mtime, and until the lease is written
+    that mtime is the claim time requeue_expired_jobs goes by.
+
+    Returns:
+        The job descriptor, or None if nothing is pending
+    """
+    for pending_path in sorted(glob.glob(os.path.join(queue_dir, 'pending', '*.json'))):
+        job_id = os.path.splitext(os.path.basename(pending_path))[0]
+        claimed_path = _path(queue_dir, 'claimed', job_id)
+        try:
+            os.utime(pending_path)
+            os.rename(pending_path, claimed_path)
+        except OSError:
+            continue  # Another worker won this one
+
+        write_lease(queue_dir, job_id, worker_id, lease_seconds, status='claimed')
+        job = _read_json(claimed_path)
+        if job is None:
+            fail_job(queue_dir, {'job_id': job_id, 'attempts': 0, 'max_attempts': 0}, "Unreadable job descriptor")
+            continue
+
+        job['attempts'] = job.get('attempts', 0) + 1
+        job['claimed_by'] = worker_id
+        job['claimed_at'] = time.time()
+        _write_json_atomic(queue_dir, claimed_path, job)
+        return job
+    return None
+
+
+def owns_lease(queue_dir, job_id, worker_id):
+    """Return True if the job is still claimed and its lease belongs to worker_id."""
+    lease = _read_json(_path(queue_dir, 'leases', job_id))
+    return (os.path.exists(_path(queue_dir, 'claimed', job_id))
+            and lease is not None and lease.get('worker_id') == worker_id)
+
+
+def _finish(queue_dir, job, state, record):
+    job = dict(job)
+    job.update(record)
+    job['finished_at'] = time.time()
+    _write_json_atomic(queue_dir, _path(queue_dir, state, job['job_id']), job)
+    for leftover in (_path(queue_dir, 'claimed', job['job_id']), _path(queue_dir, 'leases', job['job_id'])):
+        try:
+            os.remove(leftover)
+        except OSError:
+            pass
+
+
+def complete_job(queue_dir, job, result):
+    """Move a claimed job to done/ with its result."""
+    _finish(queue_dir, job, 'done', {'result': result})
+
+
+def fail_job(queue_dir, job, error):
+    """
+    Record a failed attempt. The job goes back to pending/ while attempts remain
+    and to failed/ after the last one.
+    """
+    job = dict(job)
+    job.setdefault('history', []).append({'worker_id': job.get('claimed_by'), 'error': error, 'at': time.time()})
+    if job.get('attempts', 0) < job.get('max_attempts', DEFAULT_MAX_ATTEMPTS):
+        _write_json_atomic(queue_dir, _path(queue_dir, 'claimed', job['job_id']), job)
+        _requeue(queue_dir, job['job_id'])
+    else:
+        _finish(queue_dir, job, 'failed', {'error': error})
+
+
+def _requeue(queue_dir, job_id):
+    try:
+        os.rename(_path(queue_dir, 'claimed', job_id), _path(queue_dir, 'pending', job_id))
+    except OSError:
+        return False  # Already requeued or finished elsewhere
+    try:
+        os.remove(_path(queue_dir, 'leases', job_id))
+    except OSError:
+        pass
+    return True
+
+
+def requeue_expired_jobs(queue_dir, grace_seconds=DEFAULT_LEASE_SECONDS):
+    """
+    Put claimed jobs whose lease has expired back into pending/.
+
+    A claimed job without any lease (its worker died right after claiming) is
+    requeued once its claim is older than grace_seconds. The claim time is the
+    later of the descriptor's claimed_at and its mtime, which claim_job sets
+    when it claims the job; a claimed_at left from an earlier attempt is older.
+
+    Returns:
+        List of requeued job ids
+    """
+    now = time.time()
+    requeued = []
+    for claimed_path in glob.glob(os.path.join(queue_dir, 'claimed', '*.json')):
+        job_id = os.path.splitext(os.path.basename(claimed_path))[0]
+        lease = _read_json(_path(queue_dir, 'leases', job_id))
+        if lease is not None:
+            expired = lease.get('expires_at', 0) < now
+        else:
+            try:
+                claimed_at = os.path.getmtime(claimed_path)
+            except OSError:
+                continue
+            job = _read_json(claimed_path) or {}
+            claimed_at = max(claimed_at, job.get('claimed_at') or 0)
+            expired = claimed_at + grace_seconds < now
+        if expired and _requeue(queue_dir, job_id):
+            print(f"Requeued job {job_id} after its lease expired")
+            requeued.append(job_id)
+    return requeued
+
+
+def queue_status(queue_dir):
+    """Return job counts per state, active leases and known workers."""
+    status = {name: len(glob.glob(os.path.join(queue_dir, name, '*.json')))
+              for name in ('pending', 'claimed', 'done', 'failed')}
+    status['leases'] = [lease for lease in (_read_json(path) for path in
+                        sorted(glob.glob(os.path.join(queue_dir, 'leases', '*.json')))) if lease]
+    status['workers'] = [worker for worker in (_read_json(path) for path in
+                         sorted(glob.glob(os.path.join(queue_dir, 'workers', '*.json')))) if worker]
+    return status
+
+
+class LeaseKeeper:
+    """Background thread that renews a job's lease and the worker heartbeat while the job runs."""
+
+    def __init__(self, queue_dir, job_id, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS, on_lost=None):
+        self.queue_dir = queue_dir
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.on_lost = on_lost
+        self.status = 'running'
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.lease_seconds / 3.0):
+            if not owns_lease(self.queue_dir, self.job_id, self.worker_id):
+                # Lease expired and the job was requeued - someone else will redo it
+                self.lost = True
+                print(f"Lost lease on job {self.job_id}, abandoning it")
+                if self.on_lost:
+                    self.on_lost()
+                return
+            try:
+                write_lease(self.queue_dir, self.job_id, self.worker_id, self.lease_seconds, self.status)
+            except OSError as e:
+                print(f"Could not renew lease on job {self.job_id}: {e}")
+
+
+def write_worker_heartbeat(queue_dir, worker_id, state, job_id=None, jobs_done=0, jobs_failed=0):
+    """Record what a worker is doing in queue_dir/workers/."""
+    _write_json_atomic(queue_dir, os.path.join(queue_dir, 'workers', f"{worker_id}.json"), {
+        'worker_id': worker_id,
+        'host': socket.gethostname(),
+        'pid': os.getpid(),
+        'state': state,
+        'job_id': job_id,
+        'jobs_done': jobs_done,
+        'jobs_failed': jobs_failed,
+        'heartbeat_at': time.time(),
+    })
+
+
+def run_job(job, status_callback=None, scheduler=None, stop_event=None):
+    """
+    Run one job descriptor through generate_washed_media.
+
+    The job is admitted by the resource scheduler first, which decides its
+    FFmpeg threads and segment workers. Setting stop_event abandons this job
+    only (see run_worker).
+
+    Returns:
+        (success, result dict with the output files, per-copy failures and timing)
+    """
+    from src.core.process import (generate_washed_media, get_video_info_ffprobe, default_segment_workers,
+                                  ANIMATED_OUTPUT_MODES, DEFAULT_ANIMATED_FPS)
+
+    output_folder = job['output_folder']
+    os.makedirs(output_folder, exist_ok=True)
+    started = time.time()
+
+    effect_vars = EffectPlan.from_dict(job['effect_plan']).to_effect_vars()
+    options = dict(job.get('options', {}))
+    options.setdefault('segment_workers', default_segment_workers())
+    # Video is encoded at the decoded (source) rate; a fixed fps would stretch it against its audio
+    if job['output_mode'] in ANIMATED_OUTPUT_MODES:
+        options['fps'] = options.get('fps') or DEFAULT_ANIMATED_FPS
+    else:
+        options['fps'] = None
+
+    scheduler = scheduler or get_default_scheduler()
+    cost = estimate_job_cost(get_video_info_ffprobe(job['source']), effect_vars, job['output_mode'],
+                             options.get('start_time', 0), options.get('end_time'), options.get('copies', 1),
+                             options['segment_workers'], options['fps'], options.get('gif_max_dimension'))
+    allocation = scheduler.acquire(cost, should_stop=stop_event.is_set if stop_event else None)
+    if allocation is None:
+        return False, {'success': False, 'outputs': [], 'failures': [], 'seconds': round(time.time() - started, 3)}
+    failures = []
+    outputs = []  # Reported by the job itself; other workers may share the output folder
+    try:
+        options['segment_workers'] = allocation.segment_workers
+        success = generate_washed_media(job['source'], output_folder, job['prefix'], job['output_mode'],
+                                        effect_vars, status_callback=status_callback,
+                                        threads=allocation.threads, failures=failures, stop_event=stop_event,
+                                        outputs=outputs, **options)
+    finally:
+        scheduler.release(allocation)
+
+    return success, {
+        'success': success,
+        'outputs': outputs,
+        'failures': failures,
+        'seconds': round(time.time() - started, 3),
+    }
+
+
+def _describe_failures(failures):
+    """One-line error for a job whose copies all failed."""
+    if not failures:
+        return "generate_washed_media produced no output"
+    return "; ".join(f"copy {f['copy']}: {f['error']}" for f in failures)[:1000]
+
+
+def run_worker(queue_dir, worker_id=None, lease_seconds=DEFAULT_LEASE_SECONDS,
+               poll_interval=DEFAULT_POLL_INTERVAL, max_jobs=None, exit_when_empty=False, scheduler=None):
+    """
+    Claim and run jobs from a queue directory until stopped.
+
+    Args:
+        queue_dir: Shared queue directory
+        worker_id: Unique worker id (default: host name and pid)
+        lease_seconds: Lease length; it is renewed every third of that
+        poll_interval: Seconds to wait when no job is pending
+        max_jobs: Stop after this many jobs (None = no limit)
+        exit_when_empty: Stop as soon as no job is pending
+        scheduler: ResourceScheduler budgeting this worker's jobs (default: whole machine)
+
+    Returns:
+        (jobs done, jobs failed) by this worker
+    """
+    worker_id = worker_id or default_worker_id()
+    init_queue(queue_dir)
+    jobs_done = 0
+    jobs_failed = 0
+    print(f"Worker {worker_id} polling {queue_dir}")
+
+    try:
+        while max_jobs is None or jobs_done + jobs_failed < max_jobs:
+            requeue_expired_jobs(queue_dir, lease_seconds)
+            job = claim_job(queue_dir, worker_id, lease_seconds)
+            if job is None:
+                write_worker_heartbeat(queue_dir, worker_id, 'idle', None, jobs_done, jobs_failed)
+                if exit_when_empty:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            job_id = job['job_id']
+            print(f"Worker {worker_id} running job {job_id} (attempt {job['attempts']}/{job['max_attempts']})")
+            write_worker_heartbeat(queue_dir, worker_id, 'busy', job_id, jobs_done, jobs_failed)
+
+            # Losing the lease abandons this job only, not others running in the process
+            stop_event = threading.Event()
+            keeper = LeaseKeeper(queue_dir, job_id, worker_id, lease_seconds, on_lost=stop_event.set).start()
+
+            def status_callback(message):
+                keeper.status = message
+
+            try:
+                success, result = run_job(job, status_callback, scheduler, stop_event)
+                error = None if success else _describe_failures(result['failures'])
+            except Exception as e:
+                success, result, error = False, None, f"{type(e).__name__}: {e}"
+            finally:
+                keeper.stop()
+
+            if keeper.lost:
+                continue  # The job belongs to whoever claims it next
+
+            if success:
+                complete_job(queue_dir, job, result)
+                jobs_done += 1
+                print(f"Job {job_id} done: {len(result['outputs'])} file(s) in {result['seconds']}s")
+                for failure in result['failures']:
+                    print(f"Job {job_id} copy {failure['copy']} {failure['status']}: {failure['error']}")
+            else:
+                fail_job(queue_dir, job, error)
+                jobs_failed += 1
+                print(f"Job {job_id} failed: {error}")
+
+    except KeyboardInterrupt:
+        print(f"Worker {worker_id} interrupted")
+
+    finally:
+        write_worker_heartbeat(queue_dir, worker_id, 'stopped', None, jobs_done, jobs_failed)
+
+    return jobs_done, jobs_failed
+
+
+def main(argv=None):
+    """Command line entry point for submitting jobs, running workers and showing queue status."""
+    parser = argparse.ArgumentParser(description="Reels Washer shared-directory job queue")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    submit = commands.add_parser('submit', help="Add a job to the queue")
+    submit.add_argument('queue_dir')
+    submit.add_argument('source')
+    submit.add_argument('output_folder')
+    submit.add_argument('--plan', help="EffectPlan JSON file (default: no effects)")
+    submit.add_argument('--mode', default='video', choices=['video', 'gif', 'webp', 'webp_lossless', 'apng'])
+    submit.add_argument('--prefix')
+    submit.add_argument('--copies', type=int, default=1)
+    submit.add_argument('--start-time', type=float, default=0)
+    submit.add_argument('--end-time', type=float)
+    submit.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS)
+    submit.add_argument('--media-backend', default='subprocess', choices=['subprocess', 'pyav', 'auto'],
+                        help="Decode/encode with ffmpeg processes or in-process PyAV (falls back if not installed)")
+    submit.add_argument('--fps', type=int,
+                        help="GIF / WebP / APNG frame rate (default: 10); video keeps the source frame rate")
+    submit.add_argument('--gif-max-dimension', type=int,
+                        help="Longest side of GIF / WebP / APNG output in pixels (default: source size)")
+    submit.add_argument('--bitrate', type=int, default=2000,
+                        help="Video bitrate in kb/s (the max rate with --rate-control quality)")
+    submit.add_argument('--rate-control', default='bitrate', choices=['bitrate', 'quality', 'size'],
+                        help="Fixed bitrate, constant quality with a max rate, or a target file size")
+    submit.add_argument('--crf', type=int, default=23, help="Quality for --rate-control quality (lower is better)")
+    submit.add_argument('--target-size-mb', type=float, help="File size for --rate-control size")
+    submit.add_argument('--two-pass', action='store_true', help="Two-pass encode for --rate-control size")
+    submit.add_argument('--fragmented-mp4', action='store_true',
+                        help="Write fragmented MP4 instead of rewriting the file for faststart")
+
+    worker = commands.add_parser('worker', help="Claim and run jobs")
+    worker.add_argument('queue_dir')
+    worker.add_argument('--worker-id')
+    worker.add_argument('--lease-seconds', type=float, default=DEFAULT_LEASE_SECONDS)
+    worker.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL)
+    worker.add_argument('--max-jobs', type=int)
+    worker.add_argument('--exit-when-empty', action='store_true')
+    worker.add_argument('--threads', type=int, help="CPU threads this worker may use (default: all)")
+    worker.add_argument('--memory-mb', type=int, help="RAM this worker may use (default: share of available)")
+
+    status = commands.add_parser('status', help="Show queue status")
+    status.add_argument('queue_dir')
+
+    requeue = commands.add_parser('requeue', help="Requeue jobs with expired leases")
+    requeue.add_argument('queue_dir')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'submit':
+        from src.core.process import ANIMATED_OUTPUT_MODES, DEFAULT_ANIMATED_FPS
+
+        plan = EffectPlan()
+        if args.plan:
+            with open(args.plan) as f:
+                plan = EffectPlan.from_json(f.read())
+        # A frame rate only belongs in the job when asked for or when it is an animated image
+        options = {}
+        if args.fps is not None or args.mode in ANIMATED_OUTPUT_MODES:
+            options['fps'] = args.fps or DEFAULT_ANIMATED_FPS
+        job_id = submit_job(args.queue_dir, args.source, args.output_folder, plan, args.mode, args.prefix,
+                            args.max_attempts, copies=args.copies, start_time=args.start_time, end_time=args.end_time,
+                            media_backend=args.media_backend, gif_max_dimension=args.gif_max_dimension,
+                            bitrate=args.bitrate, rate_control=args.rate_control, crf=args.crf,
+                            target_size_mb=args.target_size_mb, two_pass=args.two_pass,
+                            fragmented_mp4=args.fragmented_mp4, **options)
+        print(job_id)
+    elif args.command == 'worker':
+        # Several workers on one machine should each get a share of it
+        scheduler = ResourceScheduler(args.threads, args.memory_mb * 1024 ** 2 if args.memory_mb else None)
+        jobs_done, jobs_failed = run_worker(args.queue_dir, args.worker_id, args.lease_seconds, args.poll_interval,
+                                            args.max_jobs, args.exit_when_empty, scheduler)
+        return 0 if jobs_failed == 0 else 1
+    elif args.command == 'status':
+        print(json.dumps(queue_status(args.queue_dir), indent=2))
+    elif args.command == 'requeue':
+        for job_id in requeue_expired_jobs(args.queue_dir):
+            print(job_id)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
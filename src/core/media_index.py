@@ -0,0 +1,242 @@
+"""
+Per-source keyframe and packet index.
+
+A source's video packets are scanned once with ffprobe (no decoding) and the
+keyframe timestamps and byte offsets, frame count and VFR flag are kept in a
+cache file keyed by the file's identity (path, size and modification time).
+Trimming, segmenting and frame extraction use it to seek to keyframes instead
+of decoding from the start.
+"""
+
+import os
+import sys
+import json
+import glob
+import bisect
+import hashlib
+import subprocess
+import threading
+
+from src.core.ffmpeg_runner import get_subprocess_creation_flags
+
+
+INDEX_VERSION = 1
+
+# Index files kept in the cache directory before the oldest are removed
+MAX_CACHED_INDEXES = 256
+
+# Relative spread of frame durations above which a stream counts as VFR
+VFR_TOLERANCE = 0.1
+
+# Indexes kept in memory for the lifetime of the process
+MAX_MEMORY_INDEXES = 64
+
+# A packet scan reads the whole file without decoding; give up on hung reads
+SCAN_TIMEOUT = 300
+
+_memory_cache = {}
+_memory_cache_lock = threading.Lock()
+
+
+def get_index_cache_dir():
+    """Return the directory index files are cached in (WASHER_CACHE_DIR overrides it)."""
+    base = os.environ.get('WASHER_CACHE_DIR')
+    if not base:
+        if sys.platform == "win32":
+            base = os.path.join(os.environ.get('LOCALAPPDATA', os.path.expanduser('~')), 'Washer', 'Cache')
+        elif sys.platform == "darwin":
+            base = os.path.join(os.path.expanduser('~'), 'Library', 'Caches', 'Washer')
+        else:
+            base = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')), 'washer')
+    return os.path.join(base, 'media_index')
+
+
+def get_file_identity(video_path):
+    """Return (absolute path, size, mtime_ns) identifying the current contents of a file."""
+    stat = os.stat(video_path)
+    return os.path.abspath(video_path), stat.st_size, stat.st_mtime_ns
+
+
+def _cache_path(identity):
+    key = hashlib.sha1(repr(identity).encode('utf-8')).hexdigest()
+    return os.path.join(get_index_cache_dir(), f"{key}.json")
+
+
+class MediaIndex:
+    """Keyframe and packet summary of the first video stream of a file."""
+
+    def __init__(self, identity, keyframes, frame_count, duration, fps, vfr):
+        self.identity = tuple(identity)
+        self.keyframes = [tuple(k) for k in keyframes]  # (pts_time, byte_offset), sorted
+        self.keyframe_times = [k[0] for k in self.keyframes]
+        self.frame_count = frame_count
+        self.duration = duration
+        self.fps = fps
+        self.vfr = vfr
+
+    def keyframe_at_or_before(self, time_seconds):
+        """Return (pts_time, byte_offset) of the last keyframe at or before a time, or None."""
+        position = bisect.bisect_right(self.keyframe_times, time_seconds + 1e-6)
+        if position == 0:
+            return None
+        return self.keyframes[position - 1]
+
+    def is_keyframe(self, time_seconds, tolerance=None):
+        """Return True if a keyframe falls within tolerance (default half a frame) of a time."""
+        if tolerance is None:
+            tolerance = 0.5 / self.fps if self.fps else 0.001
+        position = bisect.bisect_left(self.keyframe_times, time_seconds - tolerance)
+        return position < len(self.keyframe_times) and self.keyframe_times[position] <= time_seconds + tolerance
+
+    def to_dict(self):
+        return {
+            'version': INDEX_VERSION,
+            'identity': list(self.identity),
+            'keyframes': [list(k) for k in self.keyframes],
+            'frame_count': self.frame_count,
+            'duration': self.duration,
+            'fps': self.fps,
+            'vfr': self.vfr,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['identity'], data['keyframes'], data['frame_count'],
+                   data['duration'], data['fps'], data['vfr'])
+
+
+def scan_media_index(video_path, identity=None):
+    """
+    Scan the video packets of a file with ffprobe and build its index.
+
+    Returns:
+        MediaIndex, or None if the file has no readable video stream
+    """
+    identity = identity or get_file_identity(video_path)
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,pos,flags',
+        '-of', 'csv=p=0',
+        video_path
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=SCAN_TIMEOUT,
+                                creationflags=get_subprocess_creation_flags())
+    except subprocess.TimeoutExpired:
+        print(f"Error indexing {video_path}: ffprobe timed out after {SCAN_TIMEOUT}s")
+        return None
+    if result.returncode != 0:
+        print(f"Error indexing {video_path}: {result.stderr}")
+        return None
+
+    times = []
+    keyframes = []
+    for line in result.stdout.splitlines():
+        parts = line.strip().split(',')
+        if len(parts) < 3:
+            continue
+        try:
+            pts_time = float(parts[0])
+        except ValueError:
+            continue  # Packets without a timestamp
+        times.append(pts_time)
+        if 'K' in parts[2]:
+            try:
+                pos = int(parts[1])
+            except ValueError:
+                pos = -1
+            keyframes.append((pts_time, pos))
+
+    if not times:
+        return None
+
+    times.sort()
+    keyframes.sort()
+    deltas = [b - a for a, b in zip(times, times[1:]) if b > a]
+    if deltas:
+        median = sorted(deltas)[len(deltas) // 2]
+        vfr = (max(deltas) - min(deltas)) > VFR_TOLERANCE * median
+        fps = 1.0 / median if median > 0 else 0.0
+        duration = times[-1] - times[0] + median
+    else:
+        vfr = False
+        fps = 0.0
+        duration = 0.0
+
+    return MediaIndex(identity, keyframes, len(times), duration, fps, vfr)
+
+
+def _prune_index_cache(cache_dir, keep=MAX_CACHED_INDEXES):
+    """Remove the oldest index files beyond the first `keep`."""
+    try:
+        files = sorted(glob.glob(os.path.join(cache_dir, "*.json")), key=os.path.getmtime, reverse=True)
+        for path in files[keep:]:
+            os.remove(path)
+    except OSError:
+        pass
+
+
+def _load_cached_index(identity):
+    try:
+        with open(_cache_path(identity)) as f:
+            data = json.load(f)
+        if data.get('version') == INDEX_VERSION and tuple(data.get('identity', ())) == identity:
+            return MediaIndex.from_dict(data)
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def _save_cached_index(index):
+    path = _cache_path(index.identity)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(index.to_dict(), f)
+        os.replace(temp_path, path)
+        _prune_index_cache(os.path.dirname(path))
+    except OSError as e:
+        print(f"Could not cache media index: {e}")
+
+
+def get_media_index(video_path, persist=True):
+    """
+    Return the index of a file, scanning it only if no cached index matches its identity.
+
+    Args:
+        video_path: Media file path
+        persist: Also keep the index on disk; turn off for temporary files
+
+    Returns:
+        MediaIndex, or None if the file cannot be indexed
+    """
+    try:
+        identity = get_file_identity(video_path)
+    except OSError as e:
+        print(f"Error indexing {video_path}: {e}")
+        return None
+
+    with _memory_cache_lock:
+        index = _memory_cache.get(identity)
+    if index is not None:
+        return index
+
+    index = _load_cached_index(identity) if persist else None
+    if index is None:
+        try:
+            index = scan_media_index(video_path, identity)
+        except Exception as e:
+            print(f"Error indexing {video_path}: {e}")
+            return None
+        if index is None:
+            return None
+        if persist:
+            _save_cached_index(index)
+
+    with _memory_cache_lock:
+        if len(_memory_cache) >= MAX_MEMORY_INDEXES:
+            _memory_cache.clear()
+        _memory_cache[identity] = index
+    return index
@@ -0,0 +1,246 @@
+"""
+Throttled progress reporting for the GUI.
+
+Processing threads report every frame, every stage message and every finished
+copy. Forwarding each of those to Tk as its own after() callback floods the
+event queue with thousands of label updates per second. The bus instead only
+records the latest state of each worker under a lock (cheap enough to call
+per frame), and a timer on the GUI thread publishes one coalesced snapshot at
+most rate_hz times per second, with overall progress, throughput and ETA.
+
+Any number of workers (jobs, sources, copies running side by side) can report
+to one bus; overall progress is the mean of their progress, and every snapshot
+also carries the progress, throughput and ETA of each worker.
+"""
+
+import time
+import threading
+from collections import deque
+
+
+DEFAULT_RATE_HZ = 10
+
+# Seconds of frame counts the throughput is averaged over
+THROUGHPUT_WINDOW = 3.0
+
+# Share of a copy covered by its frame progress; the rest (encoding, muxing)
+# only completes when the copy is reported done
+FRAME_PROGRESS_SHARE = 0.8
+
+# Overall progress below which no ETA is given (too early to extrapolate)
+MIN_ETA_PROGRESS = 0.02
+
+
+def format_eta(seconds):
+    """Return seconds as m:ss (or h:mm:ss), or '--:--' if unknown."""
+    if seconds is None:
+        return "--:--"
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+def _estimate_eta(progress, elapsed):
+    if progress >= 1.0:
+        return 0.0
+    if progress >= MIN_ETA_PROGRESS and elapsed > 0:
+        return elapsed * (1.0 - progress) / progress
+    return None
+
+
+class _WorkerProgress:
+    """Latest reported state of one worker."""
+
+    def __init__(self, copies):
+        self.copies = max(1, copies)
+        self.copies_done = 0
+        self.frames_current = 0
+        self.frames_total = 0
+        self.frames_processed = 0
+        self.samples = deque()
+        self.stage = ""
+        self.started = None  # First progress report; a queued worker has no ETA yet
+        self.finished = False
+
+    def report(self, now):
+        if self.started is None:
+            self.started = now
+
+    def fraction(self):
+        if self.finished:
+            return 1.0
+        frame_fraction = self.frames_current / self.frames_total if self.frames_total else 0.0
+        return min(1.0, (self.copies_done + min(1.0, frame_fraction) * FRAME_PROGRESS_SHARE) / self.copies)
+
+
+class ProgressBus:
+    """
+    Collects progress events from worker threads and publishes them at a fixed rate.
+
+    Args:
+        publish: Called on the GUI thread with a snapshot dict (see snapshot())
+        schedule: schedule(delay_ms, callback) on the GUI thread, e.g. a Tk widget's after
+        rate_hz: Maximum snapshots published per second
+    """
+
+    def __init__(self, publish, schedule, rate_hz=DEFAULT_RATE_HZ):
+        self.publish = publish
+        self.schedule = schedule
+        self.interval_ms = max(1, int(1000 / rate_hz))
+        self._lock = threading.Lock()
+        self._workers = {}
+        self._stage = ""
+        self._started = None
+        self._version = 0
+        self._published_version = -1
+        self._running = False
+        self._closed = False
+
+    def start(self):
+        """Reset the bus and start publishing. Call on the GUI thread."""
+        with self._lock:
+            self._workers = {}
+            self._stage = ""
+            self._started = time.monotonic()
+            self._version += 1
+            self._closed = False
+        if not self._running:
+            self._running = True
+            self.schedule(self.interval_ms, self._tick)
+
+    def close(self):
+        """Stop publishing after one last snapshot. Safe to call from any thread."""
+        with self._lock:
+            self._closed = True
+            self._version += 1
+
+    def touch(self):
+        """Publish on the next tick even if no progress was reported (e.g. a list was reordered)."""
+        with self._lock:
+            self._version += 1
+
+    def add_worker(self, worker, copies=1):
+        """Register (or restart) a worker producing copies outputs (unregistered workers count as one copy)."""
+        with self._lock:
+            self._workers[worker] = _WorkerProgress(copies)
+            self._version += 1
+
+    def remove_worker(self, worker):
+        """Forget a worker, e.g. when its row is cleared from a list."""
+        with self._lock:
+            if self._workers.pop(worker, None) is not None:
+                self._version += 1
+
+    def frames(self, current, total, worker=None):
+        """Report current/total frames of the copy a worker is on."""
+        with self._lock:
+            state = self._get_worker(worker)
+            state.report(time.monotonic())
+            # A count that goes backwards is a new copy or stage starting from zero
+            advanced = current - state.frames_current if current >= state.frames_current else current
+            state.frames_processed += max(0, advanced)
+            state.frames_current = current
+            state.frames_total = total
+            self._version += 1
+
+    def copy_done(self, done, copies, worker=None):
+        """Report that a worker has finished done of its copies."""
+        with self._lock:
+            state = self._get_worker(worker)
+            state.report(time.monotonic())
+            state.copies = max(1, copies)
+            state.copies_done = done
+            state.frames_current = 0
+            state.frames_total = 0
+            self._version += 1
+
+    def stage(self, message, worker=None):
+        """Report a status message (the latest one from any worker is the overall stage)."""
+        with self._lock:
+            self._stage = message
+            self._get_worker(worker).stage = message
+            self._version += 1
+
+    def worker_done(self, worker=None):
+        """Mark a worker as finished, whatever it reported last."""
+        with self._lock:
+            self._get_worker(worker).finished = True
+            self._version += 1
+
+    def callbacks(self, worker=None):
+        """Return (progress_callback, status_callback, copy_callback) reporting for worker."""
+        return (lambda current, total: self.frames(current, total, worker),
+                lambda message: self.stage(message, worker),
+                lambda done, copies: self.copy_done(done, copies, worker))
+
+    def _get_worker(self, worker):
+        state = self._workers.get(worker)
+        if state is None:
+            state = self._workers[worker] = _WorkerProgress(1)
+        return state
+
+    def snapshot(self):
+        """
+        Return the current state as a dict:
+        stage, progress (0-1), copies_done, copies, frames_per_second, elapsed, eta (seconds or None),
+        and workers: {worker: dict of the same keys for that worker}.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return self._snapshot(now)
+
+    def _worker_snapshot(self, state, now):
+        state.samples.append((now, state.frames_processed))
+        while len(state.samples) > 2 and now - state.samples[0][0] > THROUGHPUT_WINDOW:
+            state.samples.popleft()
+        first_time, first_frames = state.samples[0]
+        span = now - first_time
+        progress = state.fraction()
+        elapsed = now - state.started if state.started is not None else 0.0
+        return {
+            'stage': state.stage,
+            'progress': progress,
+            'copies_done': min(state.copies_done, state.copies),
+            'copies': state.copies,
+            'frames_per_second': (state.frames_processed - first_frames) / span if span > 0 else 0.0,
+            'elapsed': elapsed,
+            'eta': _estimate_eta(progress, elapsed) if state.started is not None or state.finished else None,
+        }
+
+    def _snapshot(self, now):
+        workers = {worker: self._worker_snapshot(state, now) for worker, state in self._workers.items()}
+        progress = sum(w['progress'] for w in workers.values()) / len(workers) if workers else 0.0
+        elapsed = now - self._started if self._started is not None else 0.0
+        return {
+            'stage': self._stage,
+            'progress': progress,
+            'copies_done': sum(w['copies_done'] for w in workers.values()),
+            'copies': sum(w['copies'] for w in workers.values()),
+            'frames_per_second': sum(w['frames_per_second'] for w in workers.values()),
+            'elapsed': elapsed,
+            'eta': _estimate_eta(progress, elapsed),
+            'workers': workers,
+        }
+
+    def _tick(self):
+        now = time.monotonic()
+        with self._lock:
+            closed = self._closed
+            changed = self._version != self._published_version
+            self._published_version = self._version
+            # Throughput decays to zero while nothing is reported, so keep sampling until it has
+            sampling = any(state.samples and state.samples[0][1] != state.frames_processed
+                           for state in self._workers.values())
+            snapshot = self._snapshot(now) if changed or sampling else None
+        if snapshot is not None:
+            try:
+                self.publish(snapshot)
+            except Exception as e:
+                print(f"Error publishing progress: {e}")
+        if closed:
+            self._running = False
+        else:
+            self.schedule(self.interval_ms, self._tick)
@@ -0,0 +1,203 @@
+"""
+Rate control for video encodes.
+
+'bitrate' is the original fixed average bitrate (-b:v), which bloats simple
+clips and starves complex ones. 'quality' encodes at a constant quality (CRF)
+with the bitrate as a VBV max rate, so easy content comes out small and hard
+content is capped. 'size' aims at a target file size: the video bitrate is
+derived from the size, the duration and the audio, and with two passes the
+first pass measures the clip so the second can spend the bits where they are
+needed.
+
+First-pass stats are cached by a fingerprint of the frames being encoded, so
+encoding the same frames again (a retried stage, a requeued job, exact copies
+without frame randomness) goes straight to the second pass.
+"""
+
+import os
+import glob
+import hashlib
+import threading
+import subprocess
+
+from src.core.media_index import get_index_cache_dir
+from src.core.ffmpeg_runner import get_subprocess_creation_flags, PROBE_TIMEOUT
+
+
+RATE_CONTROL_MODES = ('bitrate', 'quality', 'size')
+
+DEFAULT_CRF = 23
+
+# VBV buffer as a multiple of the max rate (seconds of video at that rate)
+VBV_BUFFER_SECONDS = 2
+
+# Max rate of a size-targeted encode relative to its average bitrate
+SIZE_MAXRATE_FACTOR = 1.5
+
+# Muxing overhead of MP4 at typical bitrates
+CONTAINER_OVERHEAD = 0.02
+
+# Audio bitrate assumed when the source does not report one
+AUDIO_KBPS_ESTIMATE = 128
+
+# Below this a video is unwatchable; a size target that asks for less is ignored
+MIN_VIDEO_KBPS = 100
+
+# Encoders whose -pass 1/2 stats files ffmpeg understands
+TWO_PASS_CODECS = ('libx264', 'libvpx', 'libvpx-vp9')
+
+# Stats sets kept in the cache directory before the oldest are removed
+MAX_CACHED_STATS = 64
+
+# Frames hashed for the fingerprint of an encode
+FINGERPRINT_SAMPLES = 32
+
+_stats_lock = threading.Lock()
+
+
+def get_rate_control_options(codec, bitrate, rate_control='bitrate', crf=DEFAULT_CRF):
+    """
+    Return the encoder options for a rate control mode as an ordered dict of
+    ffmpeg option names (without the leading '-') to values.
+
+    Args:
+        codec: Video encoder name
+        bitrate: Average bitrate in kbps ('bitrate' and 'size'), or the max rate ('quality')
+        rate_control: 'bitrate', 'quality' or 'size'
+        crf: Constant quality for 'quality' (lower is better)
+
+    Returns:
+        dict of option name to string value
+    """
+    bitrate = int(bitrate)
+    if rate_control == 'quality':
+        if 'nvenc' in codec:
+            return {'rc': 'vbr', 'cq': str(crf), 'b:v': '0',
+                    'maxrate': f'{bitrate}k', 'bufsize': f'{bitrate * VBV_BUFFER_SECONDS}k'}
+        if codec.startswith('libvpx'):
+            # Constrained quality: -b:v is the ceiling
+            return {'crf': str(crf), 'b:v': f'{bitrate}k'}
+        return {'crf': str(crf), 'maxrate': f'{bitrate}k', 'bufsize': f'{bitrate * VBV_BUFFER_SECONDS}k'}
+    if rate_control == 'size':
+        # Average bitrate with a VBV cap, so no part of the clip overshoots badly
+        return {'b:v': f'{bitrate}k', 'maxrate': f'{int(bitrate * SIZE_MAXRATE_FACTOR)}k',
+                'bufsize': f'{bitrate * VBV_BUFFER_SECONDS}k'}
+    return {'b:v': f'{bitrate}k'}
+
+
+def build_rate_control_args(codec, bitrate, rate_control='bitrate', crf=DEFAULT_CRF):
+    """Return get_rate_control_options as ffmpeg command line arguments."""
+    args = []
+    for key, value in get_rate_control_options(codec, bitrate, rate_control, crf).items():
+        args += [f'-{key}', value]
+    return args
+
+
+def size_target_bitrate(target_size_mb, duration, audio_kbps=0):
+    """
+    Return the video bitrate in kbps that makes a file of duration seconds
+    come out at target_size_mb megabytes, or None if that is not possible.
+    """
+    if not target_size_mb or not duration or duration <= 0:
+        return None
+    total_kbps = float(target_size_mb) * 1024 * 1024 * 8 / 1000 * (1 - CONTAINER_OVERHEAD) / float(duration)
+    video_kbps = int(total_kbps - (audio_kbps or 0))
+    if video_kbps < MIN_VIDEO_KBPS:
+        print(f"Target size {target_size_mb} MB is too small for {duration:.1f}s "
+              f"({video_kbps} kbps left for video)")
+        return None
+    return video_kbps
+
+
+def probe_audio_kbps(path):
+    """Return the bitrate of the first audio stream of path in kbps (0 = no audio)."""
+    try:
+        result = subprocess.run(['ffprobe', '-v', 'error', '-select_streams', 'a:0',
+                                 '-show_entries', 'stream=bit_rate', '-of', 'default=noprint_wrappers=1:nokey=1',
+                                 path], capture_output=True, text=True, timeout=PROBE_TIMEOUT,
+                                creationflags=get_subprocess_creation_flags())
+    except (subprocess.TimeoutExpired, OSError):
+        return AUDIO_KBPS_ESTIMATE
+    value = result.stdout.strip()
+    if not value:
+        return 0
+    try:
+        return int(value) // 1000
+    except ValueError:
+        return AUDIO_KBPS_ESTIMATE  # Stream without a bitrate in its header
+
+
+def supports_two_pass(codec):
+    """Return True if ffmpeg can run codec in two passes with a stats file."""
+    return codec in TWO_PASS_CODECS
+
+
+def get_stats_cache_dir():
+    """Return the directory first-pass stats are cached in (next to the media index)."""
+    return os.path.join(os.path.dirname(get_index_cache_dir()), 'pass_stats')
+
+
+def frames_fingerprint(frame_store, frame_indices, fps, codec):
+    """
+    Return a key for the stats of encoding these frames with codec at fps.
+
+    Frame count, size and order are hashed exactly; pixel content is hashed
+    from up to FINGERPRINT_SAMPLES frames spread over the clip.
+    """
+    indices = list(frame_indices) if frame_indices is not None else list(range(len(frame_store)))
+    digest = hashlib.sha1()
+    digest.update(repr((codec, f'{float(fps):.3f}', frame_store.width, frame_store.height, len(indices))).encode())
+    digest.update(hashlib.sha1(repr(indices).encode()).digest())
+    step = max(1, len(indices) // FINGERPRINT_SAMPLES)
+    for frame in frame_store.iter_frames(indices[::step][:FINGERPRINT_SAMPLES]):
+        digest.update(frame.tobytes())
+    return digest.hexdigest()
+
+
+def get_cached_stats(key):
+    """Return the passlogfile prefix of cached stats for key, or None."""
+    prefix = os.path.join(get_stats_cache_dir(), key)
+    log_path = f"{prefix}-0.log"
+    if not os.path.exists(log_path):
+        return None
+    try:
+        os.utime(log_path)  # Most recently used stats are pruned last
+    except OSError:
+        pass
+    return prefix
+
+
+def new_stats_prefix(key):
+    """Return a private passlogfile prefix for a first pass whose stats will be stored under key."""
+    cache_dir = get_stats_cache_dir()
+    os.makedirs(cache_dir, exist_ok=True)
+    return os.path.join(cache_dir, f"{key}.tmp{os.getpid()}_{threading.get_ident()}")
+
+
+def store_stats(key, temp_prefix):
+    """Move the stats a first pass wrote at temp_prefix into the cache. Returns the cached prefix."""
+    prefix = os.path.join(get_stats_cache_dir(), key)
+    with _stats_lock:
+        for path in glob.glob(f"{glob.escape(temp_prefix)}-0.log*"):
+            os.replace(path, prefix + path[len(temp_prefix):])
+        _prune_stats_cache()
+    return prefix
+
+
+def discard_stats(prefix):
+    """Remove the stats files at a passlogfile prefix."""
+    for path in glob.glob(f"{glob.escape(prefix)}-0.log*"):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _prune_stats_cache(keep=MAX_CACHED_STATS):
+    cache_dir = get_stats_cache_dir()
+    try:
+        logs = sorted(glob.glob(os.path.join(cache_dir, "*-0.log")), key=os.path.getmtime, reverse=True)
+    except OSError:
+        return
+    for log_path in logs[keep:]:
+        discard_stats(log_path[:-len("-0.log")])
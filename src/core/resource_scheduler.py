@@ -0,0 +1,243 @@
+"""
+Resource-aware admission for washer jobs.
+
+Each job's CPU and memory cost is estimated from the probed resolution,
+duration and enabled effects. Jobs are admitted against a machine-wide budget
+of CPU threads and RAM, and each admitted job is told how many threads its
+FFmpeg processes, OpenCV and segment workers may use. Without this every
+ffmpeg takes all cores and OpenCV starts its own pool per job, and frame
+stores for several 4K clips can push the machine into swap.
+"""
+
+import os
+import threading
+
+from src.core.frame_store import get_available_memory, estimate_clip_bytes, MEMORY_BUDGET_FRACTION
+
+
+# Share of the available RAM the scheduler hands out to jobs
+SCHEDULER_MEMORY_FRACTION = 0.6
+
+# Fewest threads worth giving a job; it waits instead of running on less
+MIN_JOB_THREADS = 2
+
+# Encoder threads per 640x360 of frame area (x264 stops scaling well around 8)
+PIXELS_PER_THREAD = 640 * 360
+MAX_JOB_THREADS = 8
+
+# Fixed memory per FFmpeg process plus its lookahead buffers, in frames
+FFMPEG_BASE_BYTES = 64 * 1024 ** 2
+ENCODER_BUFFER_FRAMES = 60
+
+# Frames a memmap-backed store keeps resident while it is being processed
+MEMMAP_RESIDENT_FRAMES = 64
+
+FRAME_EFFECT_KEYS = ('bitplane_enabled', 'region_enabled', 'region_effects_enabled', 'overlay_enabled',
+                     'frame_overlay_enabled', 'shadow_enabled', 'shadow_lines_enabled')
+
+
+def _enabled(effect_vars, key):
+    var = effect_vars.get(key)
+    try:
+        return bool(var.get() if hasattr(var, 'get') else var)
+    except Exception:
+        return False
+
+
+class JobCost:
+    """Estimated CPU threads, peak memory and total work (pixels x frames x copies) of one job."""
+
+    def __init__(self, threads, memory_bytes, segment_workers=1, description="", work=0):
+        self.threads = threads
+        self.memory_bytes = memory_bytes
+        self.segment_workers = segment_workers
+        self.description = description
+        self.work = work
+
+    def __repr__(self):
+        return (f"JobCost(threads={self.threads}, memory={self.memory_bytes / 1024 ** 2:.0f}MB, "
+                f"segment_workers={self.segment_workers})")
+
+
+class Allocation:
+    """Resources granted to an admitted job."""
+
+    def __init__(self, threads, memory_bytes, segment_workers):
+        self.threads = threads
+        self.memory_bytes = memory_bytes
+        self.segment_workers = segment_workers
+
+    def __repr__(self):
+        return (f"Allocation(threads={self.threads}, memory={self.memory_bytes / 1024 ** 2:.0f}MB, "
+                f"segment_workers={self.segment_workers})")
+
+
+def estimate_job_cost(video_info, effect_vars, output_mode='video', start_time=0, end_time=None,
+                      copies=1, segment_workers=1, output_fps=None, max_dimension=None):
+    """
+    Estimate the cost of a job from its probed source and settings.
+
+    Args:
+        video_info: Result of get_video_info_ffprobe for the source
+        effect_vars: Effect variables (tkinter variables or plain values)
+        output_mode: 'video' or an animated image mode ('gif', 'webp', 'webp_lossless', 'apng')
+        start_time: Window start in seconds
+        end_time: Window end in seconds (None = until the end)
+        copies: Copies per job (processed one after another)
+        segment_workers: Requested parallel segments
+        output_fps: Frame rate of animated image outputs (they are decoded at it)
+        max_dimension: Size limit of animated image outputs (they are decoded scaled to it)
+
+    Returns:
+        JobCost
+    """
+    from src.core.process import get_display_size
+
+    width, height = get_display_size(video_info)
+    try:
+        fps = float(video_info.get('fps', 30.0)) or 30.0
+        duration = float(video_info.get('duration', 0))
+    except (ValueError, TypeError):
+        fps, duration = 30.0, 0.0
+    if end_time is not None:
+        duration = min(duration, float(end_time)) if duration else float(end_time)
+    duration = max(0.0, duration - float(start_time or 0))
+
+    if output_mode != 'video':
+        # GIF / WebP / APNG frames are reduced to the output rate and size at the decoder
+        if output_fps:
+            fps = min(fps, float(output_fps))
+        if max_dimension and max(width, height) > int(max_dimension):
+            scale = int(max_dimension) / float(max(width, height))
+            width, height = int(width * scale), int(height * scale)
+
+    frame_bytes = width * height * 3
+    threads = max(MIN_JOB_THREADS, min(MAX_JOB_THREADS, round(width * height / PIXELS_PER_THREAD)))
+
+    frame_effects = any(_enabled(effect_vars, key) for key in FRAME_EFFECT_KEYS)
+    decodes_frames = frame_effects or output_mode != 'video' or segment_workers > 1
+    parallel = max(1, segment_workers) if output_mode == 'video' else 1
+
+    # Each running segment has its own decoder and encoder
+    memory_bytes = parallel * 2 * (FFMPEG_BASE_BYTES + ENCODER_BUFFER_FRAMES * width * height * 3 // 2)
+    if decodes_frames:
+        clip_bytes = estimate_clip_bytes(duration * fps, width, height)
+        if clip_bytes <= get_available_memory() * MEMORY_BUDGET_FRACTION:
+            memory_bytes += clip_bytes  # Whole clip held in RAM
+        else:
+            memory_bytes += parallel * MEMMAP_RESIDENT_FRAMES * frame_bytes
+        if frame_effects:
+            threads += 1  # Python frame effects run next to the codecs
+
+    description = (f"{width}x{height} {duration:.1f}s x{copies} "
+                   f"{'frames' if decodes_frames else 'ffmpeg-only'} {output_mode}")
+    # Work grows with the frames to process at their processed size; used to order batches
+    work = duration * fps * width * height * max(1, int(copies or 1))
+    return JobCost(threads * parallel, memory_bytes, parallel, description, work)
+
+
+class ResourceScheduler:
+    """
+    Admits jobs while their estimated cost fits in the remaining budget.
+
+    A job that is larger than the whole budget is still admitted when nothing
+    else is running, so it runs alone instead of waiting forever.
+    """
+
+    def __init__(self, cpu_threads=None, memory_bytes=None):
+        self.cpu_threads = cpu_threads or os.cpu_count() or 1
+        self.memory_bytes = memory_bytes or int(get_available_memory() * SCHEDULER_MEMORY_FRACTION)
+        self._running = []
+        self._condition = threading.Condition()
+
+    @property
+    def free_threads(self):
+        return self.cpu_threads - sum(a.threads for a in self._running)
+
+    @property
+    def free_memory(self):
+        return self.memory_bytes - sum(a.memory_bytes for a in self._running)
+
+    def _try_admit(self, cost):
+        if self._running:
+            if self.free_threads < MIN_JOB_THREADS or self.free_memory < cost.memory_bytes:
+                return None
+            threads = min(cost.threads, self.free_threads)
+        else:
+            threads = min(cost.threads, self.cpu_threads)
+
+        # Segments share the job's threads; each keeps at least two
+        segment_workers = max(1, min(cost.segment_workers, threads // MIN_JOB_THREADS))
+        allocation = Allocation(max(1, threads), cost.memory_bytes, segment_workers)
+        self._running.append(allocation)
+        self._apply_opencv_threads()
+        return allocation
+
+    def _apply_opencv_threads(self):
+        """OpenCV's pool is process-wide, so split it evenly between running jobs."""
+        try:
+            import cv2
+            cv2.setNumThreads(max(1, self.cpu_threads // max(1, len(self._running))))
+        except Exception:
+            pass
+
+    def try_acquire(self, cost):
+        """Admit a job if it fits now. Returns an Allocation or None."""
+        with self._condition:
+            return self._try_admit(cost)
+
+    def acquire(self, cost, timeout=None, should_stop=None):
+        """
+        Wait until a job fits and admit it.
+
+        Args:
+            cost: JobCost from estimate_job_cost
+            timeout: Seconds to wait at most (None = no limit)
+            should_stop: Optional callable; waiting ends with None when it returns True
+
+        Returns:
+            Allocation, or None on timeout or stop
+        """
+        waited = 0.0
+        with self._condition:
+            while True:
+                allocation = self._try_admit(cost)
+                if allocation is not None:
+                    return allocation
+                if should_stop and should_stop():
+                    return None
+                if timeout is not None and waited >= timeout:
+                    return None
+                self._condition.wait(0.5)
+                waited += 0.5
+
+    def release(self, allocation):
+        """Return a job's resources to the budget."""
+        with self._condition:
+            if allocation in self._running:
+                self._running.remove(allocation)
+            self._apply_opencv_threads()
+            self._condition.notify_all()
+
+    def status(self):
+        with self._condition:
+            return {
+                'running': len(self._running),
+                'free_threads': self.free_threads,
+                'free_memory': self.free_memory,
+                'cpu_threads': self.cpu_threads,
+                'memory_bytes': self.memory_bytes,
+            }
+
+
+_default_scheduler = None
+_default_scheduler_lock = threading.Lock()
+
+
+def get_default_scheduler():
+    """Return the process-wide scheduler shared by the GUI, batches and workers."""
+    global _default_scheduler
+    with _default_scheduler_lock:
+        if _default_scheduler is None:
+            _default_scheduler = ResourceScheduler()
+        return _default_scheduler
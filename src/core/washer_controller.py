@@ -2,7 +2,12 @@ import threading
 import os
 import cv2
 from PIL import Image, ImageTk
-from src.core.process import generate_washed_media, stop_generation, apply_quick_wash_preset
+from src.core.process import generate_washed_media, apply_quick_wash_preset, default_segment_workers, get_video_info_ffprobe
+from src.core.resource_scheduler import get_default_scheduler, estimate_job_cost
+from src.core.media_index import get_media_index
+from src.core.progress_bus import ProgressBus, format_eta
+from src.core.effect_plan import EFFECT_DEFAULTS
+from src.core.job_pool import JobPool, DEFAULT_MAX_CONCURRENT
 from src.utils.utils import browse_output_folder, open_folder_in_explorer, ensure_output_folder_exists
 
 
@@ -12,8 +17,18 @@ class WasherController:
     def __init__(self, gui_instance):
         self.gui = gui_instance
         self.current_video_path = None
+        self.batch_video_paths = []  # Set when several sources are selected at once
         self.is_processing = False
         self.processing_thread = None
+        # Workers report into the bus; the GUI is updated from it at most 10 times a second
+        self.progress_bus = ProgressBus(self._publish_progress, self.gui.after)
+        # Stop event of the single job started with Generate (queued jobs have their own)
+        self.stop_event = threading.Event()
+        
+        # Queue panel: jobs run concurrently in a pool and report into their own bus
+        self.queue_bus = ProgressBus(self._publish_queue_progress, self.gui.after)
+        self.job_pool = JobPool(DEFAULT_MAX_CONCURRENT, self.queue_bus)
+        self.queue_bus.start()
         
     def get_video_info_and_thumbnail(self, video_path):
         """Get video info and extract first frame as thumbnail."""
@@ -78,11 +93,11 @@ class WasherController:
             return None, None
 
     def select_video_and_show_info(self):
-        """Handle video selection and display info with thumbnail."""
+        """Handle video selection and display info with thumbnail (of the first file, if several are selected)."""
         from tkinter import filedialog
         
-        file_path = filedialog.askopenfilename(
-            title="Select Video/GIF File",
+        file_paths = filedialog.askopenfilenames(
+            title="Select Video/GIF File(s)",
             filetypes=[
                 ("Video files", "*.mp4 *.avi *.mov *.mkv *.wmv *.flv *.webm *.m4v"),
                 ("GIF files", "*.gif"),
@@ -90,16 +105,22 @@ class WasherController:
             ]
         )
         
-        if not file_path:
+        if not file_paths:
             return
         
         try:
+            file_path = file_paths[0]
             self.current_video_path = file_path
+            self.batch_video_paths = list(file_paths) if len(file_paths) > 1 else []
             
             # Update file label and prefix
             filename = os.path.basename(file_path)
             video_name = os.path.splitext(filename)[0]  # Remove extension
-            self.gui.file_label.configure(text=filename)
+            if self.batch_video_paths:
+                self.gui.file_label.configure(text=f"{filename} + {len(file_paths) - 1} more "
+                                                   f"(batch - Generate queues them longest first)")
+            else:
+                self.gui.file_label.configure(text=filename)
             self.gui.prefix_var.set(video_name)
             
             # Get video info and thumbnail
@@ -158,10 +179,35 @@ class WasherController:
                 self.gui.preview_label.configure(text=preview_text, image="")
                 self.gui.preview_label.image = None
                 self._show_info_popup("File Selected", f"Selected: {filename}\nReady for processing!")
+            
+            if info:
+                self._index_in_background(file_path, info)
                 
         except Exception as e:
             self._show_error_popup("Error", f"Failed to load video: {str(e)}")
     
+    def _index_in_background(self, video_path, info):
+        """
+        Index the source on a worker thread, then show its exact duration.
+        
+        The packet scan reads the whole file, so it must not run on the Tk thread.
+        Trimming and segmenting reuse the cached index when the job starts.
+        """
+        def worker():
+            index = get_media_index(video_path)
+            if index is None or not index.frame_count:
+                return
+            
+            def update():
+                if self.current_video_path != video_path:
+                    return  # Another source was selected meanwhile
+                info_text = f"📹 {info['resolution']} • {info['fps']} FPS • {index.duration:.1f}s"
+                self.gui.video_info_label.configure(text=info_text)
+            
+            self.gui.after(0, update)
+        
+        threading.Thread(target=worker, daemon=True).start()
+    
     def browse_output_folder(self):
         """Handle output folder selection."""
         folder = browse_output_folder()
@@ -183,54 +229,39 @@ class WasherController:
             self._show_error_popup("Error", "Please select a video file first.")
             return
         
+        if self.batch_video_paths:
+            # Several sources run as queued jobs, side by side
+            self._enqueue(self.batch_video_paths, batch=True)
+            self.gui.tabview.set("Queue")
+            self.gui.on_tab_changed()
+            return
+        
         if self.is_processing:
             self._show_error_popup("Error", "Processing already in progress.")
             return
         
         try:
-            # Get settings from GUI
-            output_mode = self.gui.output_mode_var.get()
-            output_folder = self.gui.output_folder
-            prefix = self.gui.prefix_var.get()
-            
-            # Use entire video (no time controls)
-            start_time = 0.0
-            end_time = None  # Process entire video
-            
-            # Output settings
-            if output_mode == 'gif':
-                fps = self.gui.fps_var.get()
-                quality = self.gui.quality_var.get()
-                codec = None
-                bitrate = None
-            else:
-                fps = None
-                quality = None
-                codec = self.gui.codec_var.get()
-                bitrate = self.gui.bitrate_var.get()
-            
-            # Generation settings
-            if bulk:
-                copies = 10  # Default bulk amount
-            else:
-                copies = self.gui.copies_var.get()
+            settings = self._get_job_settings(bulk)
+            copies = settings['copies']
             
-            speed_str = self.gui.speed_var.get().replace('x', '')
-            try:
-                speed = float(speed_str)
-            except:
-                speed = 1.0
+            # Snapshot the effect settings, so edits made while the job runs do not leak into it
+            effect_vars = self.gui.effect_plan.to_effect_vars()
             
-            copy_type = self.gui.copy_type_var.get()
+            self.stop_event = threading.Event()
             
-            # Get effect variables
-            effect_vars = self._get_effect_variables()
+            # Start publishing progress before the worker can report any
+            self.gui.progress_bar.set(0)
+            self.gui.progress_container.pack(fill="x", pady=5)
+            self.progress_bus.start()
+            self.progress_bus.add_worker(None, copies)
             
             # Start processing in thread
             self.processing_thread = threading.Thread(
                 target=self._process_media_thread,
-                args=(output_mode, output_folder, prefix, effect_vars, start_time, end_time,
-                      fps, quality, codec, bitrate, copies, speed, copy_type)
+                args=(settings['output_mode'], settings['output_folder'], settings['prefix'], effect_vars,
+                      settings['start_time'], settings['end_time'], settings['fps'], settings['quality'],
+                      settings['codec'], settings['bitrate'], copies, settings['speed'], settings['copy_type'],
+                      settings['gif_max_dimension'], settings['encode_options'])
             )
             self.processing_thread.daemon = True
             self.processing_thread.start()
@@ -238,14 +269,131 @@ class WasherController:
         except Exception as e:
             self._show_error_popup("Error", f"Failed to start processing: {str(e)}")
     
+    def _get_job_settings(self, bulk=False):
+        """Return the output and generation settings of the GUI as a dict (everything but the source and effects)."""
+        # Get settings from GUI
+        output_mode = self.gui.output_mode_var.get()
+        output_folder = self.gui.output_folder
+        prefix = self.gui.prefix_var.get()
+        
+        # Use entire video (no time controls)
+        start_time = 0.0
+        end_time = None  # Process entire video
+        
+        # Output settings
+        gif_max_dimension = None
+        encode_options = {}
+        if output_mode != 'video':
+            fps = self.gui.fps_var.get()
+            quality = self.gui.quality_var.get()
+            codec = None
+            bitrate = None
+            max_size = self.gui.gif_max_size_var.get()
+            gif_max_dimension = int(max_size) if max_size.isdigit() else None
+        else:
+            fps = None
+            quality = None
+            codec = self.gui.codec_var.get()
+            bitrate = self.gui.bitrate_var.get()
+            encode_options = {
+                'rate_control': self.gui.rate_control_var.get(),
+                'crf': self.gui.crf_var.get(),
+                'target_size_mb': self.gui.target_size_var.get(),
+                'two_pass': self.gui.two_pass_var.get(),
+                'fragmented_mp4': self.gui.fragmented_mp4_var.get(),
+            }
+        
+        # Generation settings
+        if bulk:
+            copies = 10  # Default bulk amount
+        else:
+            copies = self.gui.copies_var.get()
+        
+        speed_str = self.gui.speed_var.get().replace('x', '')
+        try:
+            speed = float(speed_str)
+        except:
+            speed = 1.0
+        
+        copy_type = self.gui.copy_type_var.get()
+        
+        return {
+            'output_mode': output_mode, 'output_folder': output_folder, 'prefix': prefix,
+            'start_time': start_time, 'end_time': end_time, 'fps': fps, 'quality': quality,
+            'codec': codec, 'bitrate': bitrate, 'copies': copies, 'speed': speed, 'copy_type': copy_type,
+            'gif_max_dimension': gif_max_dimension, 'encode_options': encode_options,
+        }
+    
     def stop_processing(self):
         """Stop the current processing operation."""
         if self.is_processing:
-            stop_generation()
+            self.stop_event.set()
             self.is_processing = False
             self.gui.generate_button.configure(state="normal")
             self.gui.stop_button.configure(state="disabled")
     
+    def enqueue_current(self):
+        """Add the selected source with the current settings and effects to the job queue."""
+        if not self.current_video_path:
+            self._show_error_popup("Error", "Please select a video file first.")
+            return
+        self._enqueue([self.current_video_path], batch=False)
+    
+    def enqueue_files(self):
+        """Pick one or more sources and add each to the job queue with the current settings."""
+        from tkinter import filedialog
+        
+        file_paths = filedialog.askopenfilenames(
+            title="Add Videos/GIFs to Queue",
+            filetypes=[
+                ("Video files", "*.mp4 *.avi *.mov *.mkv *.wmv *.flv *.webm *.m4v"),
+                ("GIF files", "*.gif"),
+                ("All files", "*.*")
+            ]
+        )
+        if file_paths:
+            self._enqueue(list(file_paths), batch=True)
+    
+    def _enqueue(self, file_paths, batch):
+        """Queue one source named by the prefix setting, or a batch named after each source."""
+        try:
+            options = self._get_job_settings()
+            output_mode = options.pop('output_mode')
+            output_folder = options.pop('output_folder')
+            prefix = options.pop('prefix')
+            options.update(options.pop('encode_options'))
+            effect_vars = self.gui.effect_plan.to_effect_vars()
+            if batch:
+                # Probing every source takes a while; keep it off the GUI thread
+                threading.Thread(target=self.job_pool.submit_batch,
+                                 args=(file_paths, output_folder, output_mode, effect_vars),
+                                 kwargs=options, daemon=True).start()
+            else:
+                self.job_pool.submit(file_paths[0], output_folder, prefix, output_mode, effect_vars, **options)
+        except Exception as e:
+            self._show_error_popup("Error", f"Failed to queue job: {str(e)}")
+    
+    def move_queued_job(self, job_id, offset):
+        self.job_pool.move(job_id, offset)
+    
+    def toggle_pause_queued_job(self, job_id):
+        """Pause a queued or running job, or resume a paused one."""
+        if not self.job_pool.resume(job_id):
+            self.job_pool.pause(job_id)
+    
+    def cancel_queued_job(self, job_id):
+        self.job_pool.cancel(job_id)
+    
+    def clear_finished_jobs(self):
+        self.job_pool.clear_finished()
+    
+    def set_queue_concurrency(self, value):
+        """Set how many queued jobs run at once (value from the GUI option menu)."""
+        try:
+            self.job_pool.set_max_concurrent(int(value))
+        except ValueError:
+            pass
+    
     def apply_quick_wash(self, wash_type):
         """Apply quick wash presets."""
         try:
@@ -263,38 +411,20 @@ class WasherController:
     def reset_effects(self):
         """Reset all effects to default values."""
         try:
+            plan = self.gui.effect_plan
+            
             # Reset all effect checkboxes
-            self.gui.brightness_enabled.set(False)
-            self.gui.contrast_enabled.set(False)
-            self.gui.saturation_enabled.set(False)
-            self.gui.hue_enabled.set(False)
-            self.gui.blur_enabled.set(False)
-            self.gui.resize_enabled.set(False)
-            self.gui.noise_enabled.set(False)
-            self.gui.fps_change_enabled.set(False)
-            self.gui.audio_fingerprint_enabled.set(False)
-            self.gui.region_enabled.set(False)
-            self.gui.bitplane_enabled.set(False)
-            self.gui.overlay_enabled.set(False)
-            self.gui.shadow_enabled.set(False)
-            self.gui.clipping_enabled.set(False)
-            self.gui.flip_enabled.set(False)
+            for key in list(plan.values):
+                if key.endswith('_enabled'):
+                    plan.set(key, False)
             
             # Reset values to defaults (only for effects that still have controls)
             # FFmpeg effects have no controls to reset - they use predefined ranges
-            
-            # PIL effects
-            self.gui.bitplane_intensity_var.set(0.5)
-            self.gui.bitplane_planes_var.set(1)
-            self.gui.shadow_h_lines_var.set(0)
-            self.gui.shadow_v_lines_var.set(0)
-            self.gui.shadow_intensity_var.set(0.1)
-            self.gui.shadow_line_width_var.set(1)
-            self.gui.shadow_speed_var.set(0.5)
-            
-            # Video effects  
-            self.gui.clipping_min_var.set(5.0)
-            self.gui.clipping_max_var.set(10.0)
+            for key in ('bitplane_intensity_var', 'bitplane_planes_var',  # PIL effects
+                        'shadow_h_lines_var', 'shadow_v_lines_var', 'shadow_intensity_var',
+                        'shadow_line_width_var', 'shadow_speed_var',
+                        'clipping_min_var', 'clipping_max_var'):  # Video effects
+                plan.set(key, EFFECT_DEFAULTS[key])
             
             self.gui.update_effects_status()
             
@@ -303,7 +433,7 @@ class WasherController:
     
     def _process_media_thread(self, output_mode, output_folder, prefix, effect_vars,
                              start_time, end_time, fps, quality, codec, bitrate,
-                             copies, speed, copy_type):
+                             copies, speed, copy_type, gif_max_dimension=None, encode_options=None):
         """Thread function for media processing."""
         self.is_processing = True
         
@@ -311,79 +441,63 @@ class WasherController:
         self.gui.after(0, lambda: self.gui.generate_button.configure(state="disabled"))
         self.gui.after(0, lambda: self.gui.stop_button.configure(state="normal"))
         
-        def progress_callback(current, total):
-            progress = int((current / total) * 100)
-            self.gui.after(0, lambda: self._update_status(f"Processing frames: {current}/{total} ({progress}%)"))
+        progress_callback, status_callback, copy_callback = self.progress_bus.callbacks()
         
-        def status_callback(status):
-            self.gui.after(0, lambda: self._update_status(status))
+        scheduler = get_default_scheduler()
+        allocation = None
         
         try:
+            # Budget threads and memory for this job before starting it
+            cost = estimate_job_cost(get_video_info_ffprobe(self.current_video_path), effect_vars, output_mode,
+                                     start_time, end_time, copies, default_segment_workers(), fps, gif_max_dimension)
+            allocation = scheduler.acquire(cost)
+            
+            failures = []
             success = generate_washed_media(
                 self.current_video_path, output_folder, prefix, output_mode,
                 effect_vars, start_time, end_time, fps, quality, codec, bitrate,
-                copies, speed, copy_type, progress_callback, status_callback
+                copies, speed, copy_type, progress_callback, status_callback,
+                segment_workers=allocation.segment_workers, threads=allocation.threads,
+                failures=failures, gif_max_dimension=gif_max_dimension, copy_callback=copy_callback,
+                stop_event=self.stop_event,
+                **(encode_options or {})
             )
             
-            if success:
+            failure_lines = "\n".join(f"Copy {f['copy']} {f['status']}: {f['error']}" for f in failures[:10])
+            if success and not failures:
                 self.gui.after(0, lambda: self._show_info_popup("Success", f"Successfully generated {copies} {output_mode} file(s)!"))
+            elif success:
+                self.gui.after(0, lambda: self._show_info_popup("Completed with errors", f"Some copies failed or are missing effects:\n\n{failure_lines}"))
             else:
-                self.gui.after(0, lambda: self._show_error_popup("Error", "Failed to generate media files."))
+                self.gui.after(0, lambda: self._show_error_popup("Error", f"Failed to generate media files.\n\n{failure_lines}".strip()))
                 
         except Exception as e:
             self.gui.after(0, lambda: self._show_error_popup("Error", f"Processing failed: {str(e)}"))
         
         finally:
+            if allocation is not None:
+                scheduler.release(allocation)
             self.is_processing = False
             self.gui.after(0, lambda: self.gui.generate_button.configure(state="normal"))
             self.gui.after(0, lambda: self.gui.stop_button.configure(state="disabled"))
-            self.gui.after(0, lambda: self._update_status("Ready"))
+            self.progress_bus.worker_done()
+            self.progress_bus.stage("Ready")
+            self.progress_bus.close()
     
     def _get_effect_variables(self):
-        """Get effect variables from GUI."""
-        return {
-            # FFmpeg effects (simple checkboxes only)
-            'brightness_enabled': self.gui.brightness_enabled,
-            'contrast_enabled': self.gui.contrast_enabled,
-            'saturation_enabled': self.gui.saturation_enabled,
-            'hue_enabled': self.gui.hue_enabled,
-            'blur_enabled': self.gui.blur_enabled,
-            'resize_enabled': self.gui.resize_enabled,
-            'noise_enabled': self.gui.noise_enabled,
-            'fps_change_enabled': self.gui.fps_change_enabled,
-            'audio_fingerprint_enabled': self.gui.audio_fingerprint_enabled,
-            
-            # PIL effects (still have controls)
-            'region_enabled': self.gui.region_enabled,
-            'region_x_var': self.gui.region_x_var,
-            'region_y_var': self.gui.region_y_var,
-            'region_width_var': self.gui.region_width_var,
-            'region_height_var': self.gui.region_height_var,
-            'bitplane_enabled': self.gui.bitplane_enabled,
-            'bitplane_intensity_var': self.gui.bitplane_intensity_var,
-            'bitplane_planes_var': self.gui.bitplane_planes_var,
-            'overlay_enabled': self.gui.overlay_enabled,
-            'frame_overlay_interval': self.gui.frame_overlay_interval,
-            'shadow_enabled': self.gui.shadow_enabled,
-            'shadow_h_lines_var': self.gui.shadow_h_lines_var,
-            'shadow_v_lines_var': self.gui.shadow_v_lines_var,
-            'shadow_intensity_var': self.gui.shadow_intensity_var,
-            'shadow_line_width_var': self.gui.shadow_line_width_var,
-            'shadow_speed_var': self.gui.shadow_speed_var,
-            
-            # Video effects (still have controls)
-            'clipping_enabled': self.gui.clipping_enabled,
-            'clipping_min_var': self.gui.clipping_min_var,
-            'clipping_max_var': self.gui.clipping_max_var,
-            'flip_enabled': self.gui.flip_enabled,
-        }
+        """Get effect variables from GUI (handles on its effect plan, settable like tkinter variables)."""
+        return self.gui.effect_plan.variables()
     
-    def _update_status(self, status):
-        """Update status in GUI."""
-        try:
-            self.gui.effects_status_var.set(status)
-        except:
-            pass
+    def _publish_progress(self, snapshot):
+        """Show a progress bus snapshot in the progress bar and status labels (GUI thread)."""
+        self.gui.progress_bar.set(snapshot['progress'])
+        details = (f"{int(snapshot['progress'] * 100)}% - copy {snapshot['copies_done']}/{snapshot['copies']} - "
+                   f"{snapshot['frames_per_second']:.0f} frames/s - ETA {format_eta(snapshot['eta'])}")
+        self.gui.progress_label.configure(text=f"{snapshot['stage'] or 'Processing...'}\n{details}")
+    
+    def _publish_queue_progress(self, snapshot):
+        """Show a queue bus snapshot in the queue panel rows (GUI thread)."""
+        self.gui.update_queue_panel(self.job_pool.jobs(), snapshot)
     
     def _show_info_popup(self, title, message):
         """Show information popup."""
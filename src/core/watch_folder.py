@@ -0,0 +1,416 @@
+"""
+Watch-folder ingestion: wash every clip that is dropped into a directory.
+
+The input directory is polled (no OS-specific file notification APIs). A new
+file is only queued once its size and modification time have stayed the same
+for stable_polls polls in a row, so clips still being copied or rendered in are
+left alone. Queued clips run through a JobPool with the configured EffectPlan,
+and each source is then moved to the done or failed directory together with a
+JSON record of the outcome. A source only counts as done once every copy it
+should have produced was written and probes as a complete file (see
+check_output); outputs that do not are removed and the source is failed.
+
+Files that are hidden, have a temporary extension (.part, .tmp, .crdownload,
+...) or are not media files are ignored. Sources still in the input directory
+when the watcher starts (e.g. after a restart) are picked up like new ones.
+
+Usage:
+    python -m src.core.watch_folder INPUT_DIR OUTPUT_FOLDER [--plan plan.json] [--workers 2]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from collections import deque
+
+from src.core.effect_plan import EffectPlan
+from src.core.process import get_video_info_ffprobe, ANIMATED_OUTPUT_MODES, DEFAULT_ANIMATED_FPS
+from src.core.job_pool import JobPool, DEFAULT_MAX_CONCURRENT, FINISHED_STATES
+from src.core.job_queue import JOB_OPTIONS
+from src.core.resource_scheduler import ResourceScheduler
+
+
+DEFAULT_POLL_INTERVAL = 2.0
+
+# Polls a file's size and mtime must stay unchanged before it counts as fully written
+DEFAULT_STABLE_POLLS = 2
+
+MEDIA_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm', '.m4v', '.gif')
+
+# Extensions of files that are still being written by a downloader or encoder
+TEMP_EXTENSIONS = ('.part', '.tmp', '.temp', '.crdownload', '.download', '.partial')
+
+# Seconds of finished jobs the throughput is measured over
+THROUGHPUT_WINDOW = 3600
+
+# Share of the expected length a video output may lack (frame rounding, keyframe cuts)
+DURATION_TOLERANCE = 0.1
+
+# Clipping removes up to this many seconds from the end of each copy (see compute_clipped_duration)
+MAX_CLIPPED_SECONDS = 2.0
+
+
+def is_candidate(name, extensions=MEDIA_EXTENSIONS):
+    """Return True if a file name in the input directory should be watched."""
+    if name.startswith('.'):
+        return False
+    lower = name.lower()
+    if lower.endswith(TEMP_EXTENSIONS):
+        return False
+    return lower.endswith(tuple(extensions))
+
+
+def move_to_dir(path, target_dir):
+    """Move path into target_dir, adding a counter to the name if it is taken. Returns the new path."""
+    os.makedirs(target_dir, exist_ok=True)
+    base, ext = os.path.splitext(os.path.basename(path))
+    target = os.path.join(target_dir, base + ext)
+    counter = 1
+    while os.path.exists(target):
+        target = os.path.join(target_dir, f"{base}_{counter}{ext}")
+        counter += 1
+    os.replace(path, target)
+    return target
+
+
+def _probe_duration(video_info):
+    try:
+        return float(video_info.get('duration', 0))
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def expected_duration(source_info, start_time=0, end_time=None, speed=1.0):
+    """Return the length in seconds a video output of source_info should have (0 = unknown)."""
+    duration = _probe_duration(source_info)
+    if end_time is not None:
+        duration = min(duration, float(end_time)) if duration else float(end_time)
+    duration = max(0.0, duration - float(start_time or 0))
+    return duration / float(speed or 1.0)
+
+
+def check_output(path, output_mode='video', min_duration=0):
+    """
+    Check that an output is a complete, readable file.
+
+    Args:
+        path: Output path
+        output_mode: Mode the output was written in
+        min_duration: Shortest acceptable length of a video output in seconds
+
+    Returns:
+        None if the output is fine, otherwise what is wrong with it
+    """
+    try:
+        if os.path.getsize(path) == 0:
+            return "empty file"
+    except OSError:
+        return "missing"
+    info = get_video_info_ffprobe(path)
+    if not info.get('width'):
+        return "no readable video stream"
+    if output_mode not in ANIMATED_OUTPUT_MODES:
+        duration = _probe_duration(info)
+        if duration <= 0 or duration < min_duration:
+            return f"{duration:.2f}s long, expected at least {min_duration:.2f}s"
+    return None
+
+
+class FolderWatcher:
+    """
+    Polls input_dir and washes every clip that finishes arriving in it.
+
+    Args:
+        input_dir: Directory that clips are dropped into
+        output_folder: Where washed outputs are written
+        effect_plan: EffectPlan (or effect_vars dictionary) applied to every clip
+        output_mode: 'video', 'gif', 'webp', 'webp_lossless' or 'apng'
+        done_dir, failed_dir: Where sources go afterwards (default: done/ and failed/ in input_dir)
+        workers: Clips processed at once
+        poll_interval: Seconds between polls
+        stable_polls: Unchanged polls before a file is queued
+        progress_bus, scheduler: Passed to the JobPool
+        **options: generate_washed_media options (copies, codec, bitrate, ...); fps only
+            applies to animated modes (default 10), video keeps the source frame rate
+    """
+
+    def __init__(self, input_dir, output_folder, effect_plan=None, output_mode='video', done_dir=None,
+                 failed_dir=None, workers=DEFAULT_MAX_CONCURRENT, poll_interval=DEFAULT_POLL_INTERVAL,
+                 stable_polls=DEFAULT_STABLE_POLLS, progress_bus=None, scheduler=None, **options):
+        unknown = set(options) - set(JOB_OPTIONS)
+        if unknown:
+            raise ValueError(f"Unknown job options: {', '.join(sorted(unknown))}")
+        if effect_plan is None:
+            effect_plan = EffectPlan()
+        elif not isinstance(effect_plan, EffectPlan):
+            effect_plan = EffectPlan.from_effect_vars(effect_plan)
+        # A fixed fps on video would stretch the frames against the audio
+        if output_mode in ANIMATED_OUTPUT_MODES:
+            options['fps'] = options.get('fps') or DEFAULT_ANIMATED_FPS
+        else:
+            options['fps'] = None
+
+        self.input_dir = os.path.abspath(input_dir)
+        self.output_folder = output_folder
+        self.effect_plan = effect_plan
+        self.output_mode = output_mode
+        self.done_dir = done_dir or os.path.join(self.input_dir, 'done')
+        self.failed_dir = failed_dir or os.path.join(self.input_dir, 'failed')
+        self.poll_interval = poll_interval
+        self.stable_polls = max(1, int(stable_polls))
+        self.options = options
+        self.pool = JobPool(workers, progress_bus, scheduler)
+
+        self._lock = threading.Lock()
+        self._candidates = {}   # path -> (size, mtime, unchanged polls)
+        self._in_flight = {}    # job id -> (path, size, queued at)
+        self._finished = deque()  # (finished at, size, seconds, succeeded) of recent jobs
+        self._counts = {'seen': 0, 'queued': 0, 'done': 0, 'failed': 0}
+        self._started_at = time.time()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def poll(self):
+        """Run one poll: queue files that have become stable and file away finished sources."""
+        self._collect_finished()
+        try:
+            entries = [entry for entry in os.scandir(self.input_dir)
+                       if entry.is_file() and is_candidate(entry.name)]
+        except OSError as e:
+            print(f"Error scanning {self.input_dir}: {e}")
+            return
+
+        with self._lock:
+            in_flight = {path for path, _, _ in self._in_flight.values()}
+        present = set()
+        for entry in entries:
+            path = entry.path
+            present.add(path)
+            if path in in_flight:
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue  # Removed or renamed since the scan
+            with self._lock:
+                previous = self._candidates.get(path)
+                if previous is None:
+                    self._counts['seen'] += 1
+                    self._candidates[path] = (stat.st_size, stat.st_mtime, 0)
+                    continue
+                size, mtime, unchanged = previous
+                if stat.st_size != size or stat.st_mtime != mtime or stat.st_size == 0:
+                    self._candidates[path] = (stat.st_size, stat.st_mtime, 0)
+                    continue
+                unchanged += 1
+                if unchanged < self.stable_polls:
+                    self._candidates[path] = (size, mtime, unchanged)
+                    continue
+                del self._candidates[path]
+            self._enqueue(path, stat.st_size)
+
+        # Forget files that disappeared before they were queued
+        with self._lock:
+            for path in list(self._candidates):
+                if path not in present:
+                    del self._candidates[path]
+
+    def _enqueue(self, path, size):
+        prefix = os.path.splitext(os.path.basename(path))[0]
+        job_id = self.pool.submit(path, self.output_folder, prefix, self.output_mode,
+                                  self.effect_plan.to_effect_vars(), **self.options)
+        with self._lock:
+            self._in_flight[job_id] = (path, size, time.time())
+            self._counts['queued'] += 1
+        print(f"Queued {os.path.basename(path)} ({size / 1024 ** 2:.1f} MB)")
+
+    def _collect_finished(self):
+        """Move the sources of finished jobs to the done or failed directory."""
+        jobs = {job['job_id']: job for job in self.pool.jobs()}
+        with self._lock:
+            finished = [(job_id, jobs[job_id]) for job_id in self._in_flight
+                        if job_id in jobs and jobs[job_id]['state'] in FINISHED_STATES]
+        for job_id, job in finished:
+            path, size, queued_at = self._in_flight[job_id]
+            if job['state'] == 'done':
+                job['error'] = self._check_outputs(path, job['outputs'])
+                if job['error']:
+                    job['state'] = 'failed'
+            succeeded = job['state'] == 'done'
+            target_dir = self.done_dir if succeeded else self.failed_dir
+            try:
+                moved = move_to_dir(path, target_dir)
+                record = dict(job, source=path, moved_to=moved, queued_at=queued_at)
+                with open(moved + '.json', 'w') as f:
+                    json.dump(record, f, indent=2)
+                print(f"{'Done' if succeeded else 'Failed'}: {os.path.basename(path)} -> {target_dir}")
+            except OSError as e:
+                print(f"Error moving {path} to {target_dir}: {e}")
+            seconds = (job['finished_at'] or time.time()) - (job['started_at'] or queued_at)
+            with self._lock:
+                del self._in_flight[job_id]
+                self._counts['done' if succeeded else 'failed'] += 1
+                self._finished.append((time.time(), size, seconds, succeeded))
+        if finished:
+            self.pool.clear_finished([job_id for job_id, _ in finished])
+
+    def _check_outputs(self, source_path, outputs):
+        """Return None if the job wrote every copy in full, otherwise the problem (bad outputs are removed)."""
+        min_duration = 0
+        if self.output_mode not in ANIMATED_OUTPUT_MODES:
+            expected = expected_duration(get_video_info_ffprobe(source_path), self.options.get('start_time', 0),
+                                         self.options.get('end_time'), self.options.get('speed', 1.0))
+            if self.effect_plan.get('clipping_enabled'):
+                expected -= MAX_CLIPPED_SECONDS
+            min_duration = max(0.0, expected * (1.0 - DURATION_TOLERANCE))
+
+        problems = []
+        for output in outputs:
+            problem = check_output(output, self.output_mode, min_duration)
+            if problem:
+                problems.append(f"{os.path.basename(output)}: {problem}")
+                try:
+                    os.remove(output)
+                except OSError:
+                    pass
+        copies = self.options.get('copies', 1)
+        if len(outputs) < copies:
+            problems.append(f"{len(outputs)} of {copies} copies written")
+        if problems:
+            print(f"Rejected outputs of {os.path.basename(source_path)}: {'; '.join(problems)}")
+            return "; ".join(problems)
+        return None
+
+    def metrics(self):
+        """
+        Return throughput and backlog metrics as a dict:
+
+        seen, queued, done, failed: files since start
+        writing: files waiting to become stable; waiting, running: queued jobs by state
+        backlog: files not finished yet (writing + waiting + running)
+        jobs_per_hour, mb_per_minute: throughput over the last hour (or the uptime, if shorter)
+        avg_job_seconds: mean run time of the jobs in that window
+        """
+        now = time.time()
+        states = {job['job_id']: job['state'] for job in self.pool.jobs()}
+        with self._lock:
+            while self._finished and now - self._finished[0][0] > THROUGHPUT_WINDOW:
+                self._finished.popleft()
+            recent = list(self._finished)
+            waiting = sum(1 for job_id in self._in_flight if states.get(job_id) in ('queued', 'paused'))
+            running = sum(1 for job_id in self._in_flight if states.get(job_id) == 'running')
+            writing = len(self._candidates)
+            in_flight = len(self._in_flight)
+            counts = dict(self._counts)
+        window = max(1.0, min(THROUGHPUT_WINDOW, now - self._started_at))
+        return dict(counts, writing=writing, waiting=waiting, running=running,
+                    backlog=writing + in_flight,
+                    jobs_per_hour=round(len(recent) * 3600.0 / window, 2),
+                    mb_per_minute=round(sum(size for _, size, _, ok in recent if ok) / 1024 ** 2 * 60.0 / window, 2),
+                    avg_job_seconds=round(sum(s for _, _, s, _ in recent) / len(recent), 1) if recent else None,
+                    uptime_seconds=round(now - self._started_at, 1))
+
+    def run(self, metrics_file=None, max_files=None):
+        """
+        Poll until stop() is called (or max_files sources have been filed away).
+
+        Args:
+            metrics_file: Optional path the metrics are written to as JSON after every poll
+            max_files: Stop after this many sources are done or failed (None = run forever)
+        """
+        print(f"Watching {self.input_dir} (every {self.poll_interval:.1f}s, "
+              f"{self.stable_polls} stable polls before a file is queued)")
+        try:
+            while not self._stop_event.is_set():
+                self.poll()
+                metrics = self.metrics()
+                if metrics_file:
+                    self._write_metrics(metrics_file, metrics)
+                if max_files is not None and metrics['done'] + metrics['failed'] >= max_files:
+                    break
+                self._stop_event.wait(self.poll_interval)
+        finally:
+            self.pool.cancel_all()
+
+    def _write_metrics(self, metrics_file, metrics):
+        temp_path = f"{metrics_file}.tmp"
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump(metrics, f, indent=2)
+            os.replace(temp_path, metrics_file)
+        except OSError as e:
+            print(f"Error writing metrics to {metrics_file}: {e}")
+
+    def start(self, metrics_file=None):
+        """Run the watcher on a background thread."""
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self.run, args=(metrics_file,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Stop polling and cancel the clips still queued or running (their sources stay in input_dir)."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def main(argv=None):
+    """Command line entry point: watch a folder until interrupted."""
+    parser = argparse.ArgumentParser(description="Reels Washer watch-folder ingestion")
+    parser.add_argument('input_dir')
+    parser.add_argument('output_folder')
+    parser.add_argument('--plan', help="EffectPlan JSON file (default: no effects)")
+    parser.add_argument('--mode', default='video', choices=['video', 'gif', 'webp', 'webp_lossless', 'apng'])
+    parser.add_argument('--done-dir', help="Where finished sources go (default: INPUT_DIR/done)")
+    parser.add_argument('--failed-dir', help="Where failed sources go (default: INPUT_DIR/failed)")
+    parser.add_argument('--workers', type=int, default=DEFAULT_MAX_CONCURRENT, help="Clips processed at once")
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL)
+    parser.add_argument('--stable-polls', type=int, default=DEFAULT_STABLE_POLLS,
+                        help="Unchanged polls before a file counts as fully written")
+    parser.add_argument('--metrics-file', help="Write throughput and backlog metrics to this JSON file")
+    parser.add_argument('--max-files', type=int, help="Exit after this many sources are done or failed")
+    parser.add_argument('--threads', type=int, help="CPU threads the watcher may use (default: all)")
+    parser.add_argument('--memory-mb', type=int, help="RAM the watcher may use (default: share of available)")
+    parser.add_argument('--copies', type=int, default=1)
+    parser.add_argument('--media-backend', default='subprocess', choices=['subprocess', 'pyav', 'auto'],
+                        help="Decode/encode with ffmpeg processes or in-process PyAV (falls back if not installed)")
+    parser.add_argument('--fps', type=int,
+                        help="GIF / WebP / APNG frame rate (default: 10); video keeps the source frame rate")
+    parser.add_argument('--gif-max-dimension', type=int,
+                        help="Longest side of GIF / WebP / APNG output in pixels (default: source size)")
+    parser.add_argument('--bitrate', type=int, default=2000,
+                        help="Video bitrate in kb/s (the max rate with --rate-control quality)")
+    parser.add_argument('--rate-control', default='bitrate', choices=['bitrate', 'quality', 'size'])
+    parser.add_argument('--crf', type=int, default=23, help="Quality for --rate-control quality (lower is better)")
+    parser.add_argument('--target-size-mb', type=float, help="File size for --rate-control size")
+    parser.add_argument('--two-pass', action='store_true', help="Two-pass encode for --rate-control size")
+    parser.add_argument('--fragmented-mp4', action='store_true',
+                        help="Write fragmented MP4 instead of rewriting the file for faststart")
+    args = parser.parse_args(argv)
+
+    plan = EffectPlan()
+    if args.plan:
+        with open(args.plan) as f:
+            plan = EffectPlan.from_json(f.read())
+    scheduler = ResourceScheduler(args.threads, args.memory_mb * 1024 ** 2 if args.memory_mb else None)
+    watcher = FolderWatcher(args.input_dir, args.output_folder, plan, args.mode, args.done_dir, args.failed_dir,
+                            args.workers, args.poll_interval, args.stable_polls, scheduler=scheduler,
+                            copies=args.copies, media_backend=args.media_backend, fps=args.fps,
+                            gif_max_dimension=args.gif_max_dimension, bitrate=args.bitrate,
+                            rate_control=args.rate_control, crf=args.crf, target_size_mb=args.target_size_mb,
+                            two_pass=args.two_pass, fragmented_mp4=args.fragmented_mp4)
+    try:
+        watcher.run(args.metrics_file, args.max_files)
+    except KeyboardInterrupt:
+        pass
+    metrics = watcher.metrics()
+    print(json.dumps(metrics, indent=2))
+    return 0 if metrics['failed'] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
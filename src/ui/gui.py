@@ -5,6 +5,28 @@ import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../core')))
 
 from src.core.washer_controller import WasherController
+from src.core.effect_plan import EffectPlan
+from src.core.progress_bus import format_eta
+from src.core.job_pool import DEFAULT_MAX_CONCURRENT
+
+# Effects listed in the status label, in display order
+EFFECT_STATUS_NAMES = [
+    ('brightness_enabled', "Brightness"),
+    ('contrast_enabled', "Contrast"),
+    ('saturation_enabled', "Saturation"),
+    ('hue_enabled', "Hue"),
+    ('blur_enabled', "Blur"),
+    ('resize_enabled', "Resize"),
+    ('noise_enabled', "Noise"),
+    ('fps_change_enabled', "FPS Change"),
+    ('audio_fingerprint_enabled', "Audio Fingerprint"),
+    ('region_enabled', "Region"),
+    ('bitplane_enabled', "Bitplane"),
+    ('overlay_enabled', "Overlay"),
+    ('shadow_enabled', "Shadow Lines"),
+    ('clipping_enabled', "Clipping"),
+    ('flip_enabled', "Horizontal Flip"),
+]
 
 class ReelsWasherApp(ctk.CTk):
     def __init__(self):
@@ -13,15 +35,24 @@ class ReelsWasherApp(ctk.CTk):
         self.geometry("1000x800")
         self.resizable(True, True)
         
+        # Effect settings live in the plan; Effects tab widgets are bound to it when the tab is first shown
+        self.effect_plan = EffectPlan()
+        self.effect_plan.add_listener(self.on_effect_plan_changed)
+        self.effect_tk_vars = {}
+        self.effects_tab_built = False
+        self.queue_tab_built = False
+        self.queue_rows = {}
+        self.queue_row_order = []
+        
         # Initialize controller
         self.controller = WasherController(self)
         
-        self.tabview = ctk.CTkTabview(self, width=980, height=780)
+        self.tabview = ctk.CTkTabview(self, width=980, height=780, command=self.on_tab_changed)
         self.tabview.pack(padx=10, pady=10, fill="both", expand=True)
         self.tab_main = self.tabview.add("Main")
         self.tab_effects = self.tabview.add("Effects")
+        self.tab_queue = self.tabview.add("Queue")
         self.setup_main_tab()
-        self.setup_effects_tab()
         
         # Initialize UI state based on defaults
         self.update_output_mode()
@@ -106,6 +137,12 @@ class ReelsWasherApp(ctk.CTk):
         self.output_mode_var = ctk.StringVar(value="video")
         gif_radio = ctk.CTkRadioButton(mode_frame, text="GIF", variable=self.output_mode_var, value="gif", command=self.update_output_mode)
         gif_radio.pack(side="left", padx=5)
+        webp_radio = ctk.CTkRadioButton(mode_frame, text="WebP", variable=self.output_mode_var, value="webp", command=self.update_output_mode)
+        webp_radio.pack(side="left", padx=5)
+        webp_lossless_radio = ctk.CTkRadioButton(mode_frame, text="WebP Lossless", variable=self.output_mode_var, value="webp_lossless", command=self.update_output_mode)
+        webp_lossless_radio.pack(side="left", padx=5)
+        apng_radio = ctk.CTkRadioButton(mode_frame, text="APNG", variable=self.output_mode_var, value="apng", command=self.update_output_mode)
+        apng_radio.pack(side="left", padx=5)
         video_radio = ctk.CTkRadioButton(mode_frame, text="Video", variable=self.output_mode_var, value="video", command=self.update_output_mode)
         video_radio.pack(side="left", padx=5)
 
@@ -131,7 +168,7 @@ class ReelsWasherApp(ctk.CTk):
         prefix_entry = ctk.CTkEntry(name_frame, textvariable=self.prefix_var)
         prefix_entry.pack(side="left", fill="x", expand=True, padx=5)
 
-        # GIF-specific options
+        # GIF / WebP / APNG options
         self.gif_options_frame = ctk.CTkFrame(output_frame)
         self.gif_options_frame.pack(fill="x", pady=5)
         fps_frame = ctk.CTkFrame(self.gif_options_frame)
@@ -151,6 +188,13 @@ class ReelsWasherApp(ctk.CTk):
         quality_scale.pack(side="left", fill="x", expand=True, padx=5)
         quality_value = ctk.CTkLabel(quality_frame, textvariable=self.quality_var)
         quality_value.pack(side="left", padx=5)
+        max_size_frame = ctk.CTkFrame(self.gif_options_frame)
+        max_size_frame.pack(fill="x", pady=2)
+        max_size_label = ctk.CTkLabel(max_size_frame, text="Max Size:")
+        max_size_label.pack(side="left", padx=5)
+        self.gif_max_size_var = ctk.StringVar(value="Original")
+        max_size_menu = ctk.CTkOptionMenu(max_size_frame, variable=self.gif_max_size_var, values=["Original", "720", "480", "360"])
+        max_size_menu.pack(side="left", padx=5)
 
         # Video-specific options
         self.video_options_frame = ctk.CTkFrame(output_frame)
@@ -169,6 +213,31 @@ class ReelsWasherApp(ctk.CTk):
         self.bitrate_var = ctk.IntVar(value=2000)
         bitrate_entry = ctk.CTkEntry(bitrate_frame, textvariable=self.bitrate_var, width=100)
         bitrate_entry.pack(side="left", padx=5)
+        rate_control_frame = ctk.CTkFrame(self.video_options_frame)
+        rate_control_frame.pack(fill="x", pady=2)
+        rate_control_label = ctk.CTkLabel(rate_control_frame, text="Rate Control:")
+        rate_control_label.pack(side="left", padx=5)
+        self.rate_control_var = ctk.StringVar(value="bitrate")
+        rate_control_menu = ctk.CTkOptionMenu(rate_control_frame, variable=self.rate_control_var, values=["bitrate", "quality", "size"])
+        rate_control_menu.pack(side="left", padx=5)
+        crf_label = ctk.CTkLabel(rate_control_frame, text="CRF:")
+        crf_label.pack(side="left", padx=5)
+        self.crf_var = ctk.IntVar(value=23)
+        crf_entry = ctk.CTkEntry(rate_control_frame, textvariable=self.crf_var, width=50)
+        crf_entry.pack(side="left", padx=5)
+        target_size_frame = ctk.CTkFrame(self.video_options_frame)
+        target_size_frame.pack(fill="x", pady=2)
+        target_size_label = ctk.CTkLabel(target_size_frame, text="Target Size (MB):")
+        target_size_label.pack(side="left", padx=5)
+        self.target_size_var = ctk.DoubleVar(value=8.0)
+        target_size_entry = ctk.CTkEntry(target_size_frame, textvariable=self.target_size_var, width=70)
+        target_size_entry.pack(side="left", padx=5)
+        self.two_pass_var = ctk.BooleanVar(value=False)
+        two_pass_check = ctk.CTkCheckBox(target_size_frame, text="Two-pass", variable=self.two_pass_var)
+        two_pass_check.pack(side="left", padx=5)
+        self.fragmented_mp4_var = ctk.BooleanVar(value=False)
+        fragmented_check = ctk.CTkCheckBox(target_size_frame, text="Fragmented MP4", variable=self.fragmented_mp4_var)
+        fragmented_check.pack(side="left", padx=5)
         fps_info_frame = ctk.CTkFrame(self.video_options_frame)
         fps_info_frame.pack(fill="x", pady=2)
         fps_info_label = ctk.CTkLabel(fps_info_frame, text="Output Frame Rate:")
@@ -223,6 +292,9 @@ class ReelsWasherApp(ctk.CTk):
         self.stop_button = ctk.CTkButton(button_frame, text="⏹️ Stop", command=self.controller.stop_processing, 
                                         state="disabled", corner_radius=8, height=40)
         self.stop_button.pack(side="left", padx=5)
+        self.enqueue_button = ctk.CTkButton(button_frame, text="➕ Add to Queue", command=self.controller.enqueue_current,
+                                           corner_radius=8, height=40)
+        self.enqueue_button.pack(side="left", padx=5)
 
         # Effects status
         effects_status_frame = ctk.CTkFrame(parent)
@@ -235,7 +307,8 @@ class ReelsWasherApp(ctk.CTk):
 
     def update_output_mode(self):
         """Update UI based on output mode selection."""
-        if self.output_mode_var.get() == "gif":
+        # GIF, WebP and APNG share the frame rate / quality / size options
+        if self.output_mode_var.get() != "video":
             self.gif_options_frame.pack(fill="x", pady=5)
             self.video_options_frame.pack_forget()
         else:
@@ -249,6 +322,42 @@ class ReelsWasherApp(ctk.CTk):
         else:
             self.variations_info_frame.pack_forget()
 
+    def on_tab_changed(self):
+        """Build the Effects and Queue tabs the first time they are shown."""
+        if self.tabview.get() == "Effects" and not self.effects_tab_built:
+            self.effects_tab_built = True
+            self.setup_effects_tab()
+        elif self.tabview.get() == "Queue" and not self.queue_tab_built:
+            self.queue_tab_built = True
+            self.setup_queue_tab()
+            self.controller.queue_bus.touch()
+
+    def bind_effect_var(self, key, var_class):
+        """Return a tkinter variable of var_class that mirrors effect_plan[key] both ways."""
+        var = var_class(value=self.effect_plan.get(key))
+        self.effect_tk_vars[key] = var
+        var.trace_add("write", lambda *args: self.on_effect_var_written(key, var))
+        return var
+
+    def on_effect_var_written(self, key, var):
+        try:
+            value = var.get()
+        except Exception:
+            return  # Entry holding a half-typed number - keep the last valid value
+        self.effect_plan.set(key, value)
+
+    def on_effect_plan_changed(self, key, value):
+        var = self.effect_tk_vars.get(key)
+        if var is not None:
+            try:
+                current = var.get()
+            except Exception:
+                current = None
+            if current != value:
+                var.set(value)
+        if key.endswith('_enabled'):
+            self.update_effects_status()
+
     def setup_effects_tab(self):
         # Scrollable frame for effects
         effects_canvas = ctk.CTkScrollableFrame(self.tab_effects, width=900, height=700)
@@ -256,10 +365,6 @@ class ReelsWasherApp(ctk.CTk):
 
 
 
-        # Initialize removed variables with defaults to prevent errors
-        self.consistent_effects = ctk.BooleanVar(value=False)
-        self.effect_seed = ctk.StringVar(value="1")
-        
         # Quick Wash Buttons Frame
         wash_buttons_frame = ctk.CTkFrame(effects_canvas)
         wash_buttons_frame.pack(fill="x", padx=5, pady=5)
@@ -272,7 +377,7 @@ class ReelsWasherApp(ctk.CTk):
         bright_frame = ctk.CTkFrame(effects_canvas)
         bright_frame.pack(fill="x", padx=5, pady=5)
         ctk.CTkLabel(bright_frame, text="Brightness", font=("Arial", 14, "bold")).pack(anchor="w", padx=5, pady=(0, 5))
-        self.brightness_enabled = ctk.BooleanVar(value=False)
+        self.brightness_enabled = self.bind_effect_var('brightness_enabled', ctk.BooleanVar)
         bright_cb = ctk.CTkCheckBox(bright_frame, text="Enable Brightness Adjustment (Random 0.9-1.1)", variable=self.brightness_enabled)
         bright_cb.pack(anchor="w", padx=5, pady=2)
         # Info label
@@ -284,7 +389,7 @@ class ReelsWasherApp(ctk.CTk):
         contrast_frame = ctk.CTkFrame(effects_canvas)
         contrast_frame.pack(fill="x", padx=5, pady=5)
         ctk.CTkLabel(contrast_frame, text="Contrast", font=("Arial", 14, "bold")).pack(anchor="w", padx=5, pady=(0, 5))
-        self.contrast_enabled = ctk.BooleanVar(value=False)
+        self.contrast_enabled = self.bind_effect_var('contrast_enabled', ctk.BooleanVar)
         contrast_cb = ctk.CTkCheckBox(contrast_frame, text="Enable Contrast Adjustment (Random 0.95-1.1)", variable=self.contrast_enabled)
         contrast_cb.pack(anchor="w", padx=5, pady=2)
         # Info label
@@ -296,7 +401,7 @@ class ReelsWasherApp(ctk.CTk):
         saturation_frame = ctk.CTkFrame(effects_canvas)
         saturation_frame.pack(fill="x", padx=5, pady=5)
         ctk.CTkLabel(saturation_frame, text="Saturation", font=("Arial", 14, "bold")).pack(anchor="w", padx=5, pady=(0, 5))
-        self.saturation_enabled = ctk.BooleanVar(value=False)
+        self.saturation_enabled = self.bind_effect_var('saturation_enabled', ctk.BooleanVar)
         saturation_cb = ctk.CTkCheckBox(saturation_frame, text="Enable Saturation Adjustment (Random 0.9-1.1)", variable=self.saturation_enabled)
         saturation_cb.pack(anchor="w", padx=5, pady=2)
         # Info label
@@ -308,7 +413,7 @@ class ReelsWasherApp(ctk.CTk):
         hue_frame = ctk.CTkFrame(effects_canvas)
         hue_frame.pack(fill="x", padx=5, pady=5)
         ctk.CTkLabel(hue_frame, text="Hue Shift", font=("Arial", 14, "bold")).pack(anchor="w", padx=5, pady=(0, 5))
-        self.hue_enabled = ctk.BooleanVar(value=False)
+        self.hue_enabled = self.bind_effect_var('hue_enabled', ctk.BooleanVar)
         hue_cb = ctk.CTkCheckBox(hue_frame, text="Enable Hue Shift (Random -15° to +15°)", variable=self.hue_enabled)
         hue_cb.pack(anchor="w", padx=5, pady=2)
         # Info label
@@ -320,7 +425,7 @@ class ReelsWasherApp(ctk.CTk):
         blur_frame = ctk.CTkFrame(effects_canvas)
         blur_frame.pack(fill="x", padx=5, pady=5)
         ctk.CTkLabel(blur_frame, text="Blur", font=("Arial", 14, "bold")).pack(anchor="w", padx=5, pady=(0, 5))
-        self.blur_enabled = ctk.BooleanVar(value=False)
+        self.blur_enabled = self.bind_effect_var('blur_enabled', ctk.BooleanVar)
         blur_cb = ctk.CTkCheckBox(blur_frame, text="Enable Blur (Random 0.5-3.0 radius)", variable=self.blur_enabled)
         blur_cb.pack(anchor="w", padx=5, pady=2)
         # Info label
@@ -334,7 +439,7 @@ class ReelsWasherApp(ctk.CTk):
         resize_frame = ctk.CTkFrame(effects_canvas)
         resize_frame.pack(fill="x", padx=5, pady=5)
         ctk.CTkLabel(resize_frame, text="Resize", font=("Arial", 14, "bold")).pack(anchor="w", padx=5, pady=(0, 5))
-        self.resize_enabled = ctk.BooleanVar(value=False)
+        self.resize_enabled = self.bind_effect_var('resize_enabled', ctk.BooleanVar)
         resize_cb = ctk.CTkCheckBox(resize_frame, text="Enable Random Resize (98-102% of original)", variable=self.resize_enabled)
         resize_cb.pack(anchor="w", padx=5, pady=2)
         # Info label
@@ -346,7 +451,7 @@ class ReelsWasherApp(ctk.CTk):
         noise_frame = ctk.CTkFrame(effects_canvas)
         noise_frame.pack(fill="x", padx=5, pady=5)
         ctk.CTkLabel(noise_frame, text="Noise", font=("Arial", 14, "bold")).pack(anchor="w", padx=5, pady=(0, 5))
-        self.noise_enabled = ctk.BooleanVar(value=False)
+        self.noise_enabled = self.bind_effect_var('noise_enabled', ctk.BooleanVar)
         noise_cb = ctk.CTkCheckBox(noise_frame, text="Enable Noise (Random 0.01-0.05 strength)", variable=self.noise_enabled)
         noise_cb.pack(anchor="w", padx=5, pady=2)
         # Info label
@@ -358,7 +463,7 @@ class ReelsWasherApp(ctk.CTk):
         fps_change_frame = ctk.CTkFrame(effects_canvas)
         fps_change_frame.pack(fill="x", padx=5, pady=5)
         ctk.CTkLabel(fps_change_frame, text="FPS Micro Change", font=("Arial", 14, "bold")).pack(anchor="w", padx=5, pady=(0, 5))
-        self.fps_change_enabled = ctk.BooleanVar(value=False)
+        self.fps_change_enabled = self.bind_effect_var('fps_change_enabled', ctk.BooleanVar)
         fps_change_cb = ctk.CTkCheckBox(fps_change_frame, text="Enable FPS Micro Change (Random ±1.5 FPS)", variable=self.fps_change_enabled)
         fps_change_cb.pack(anchor="w", padx=5, pady=2)
         # Info label
@@ -370,7 +475,7 @@ class ReelsWasherApp(ctk.CTk):
         audio_frame = ctk.CTkFrame(effects_canvas)
         audio_frame.pack(fill="x", padx=5, pady=5)
         ctk.CTkLabel(audio_frame, text="Audio Fingerprint Evasion", font=("Arial", 14, "bold")).pack(anchor="w", padx=5, pady=(0, 5))
-        self.audio_fingerprint_enabled = ctk.BooleanVar(value=False)
+        self.audio_fingerprint_enabled = self.bind_effect_var('audio_fingerprint_enabled', ctk.BooleanVar)
         audio_cb = ctk.CTkCheckBox(audio_frame, text="Enable Audio Fingerprint Evasion", variable=self.audio_fingerprint_enabled)
         audio_cb.pack(anchor="w", padx=5, pady=2)
         # Info label
@@ -385,25 +490,25 @@ class ReelsWasherApp(ctk.CTk):
         region_frame = ctk.CTkFrame(effects_canvas)
         region_frame.pack(fill="x", padx=5, pady=5)
         ctk.CTkLabel(region_frame, text="Region", font=("Arial", 14, "bold")).pack(anchor="w", padx=5, pady=(0, 5))
-        self.region_enabled = ctk.BooleanVar(value=False)
+        self.region_enabled = self.bind_effect_var('region_enabled', ctk.BooleanVar)
         region_cb = ctk.CTkCheckBox(region_frame, text="Enable Region Effects", variable=self.region_enabled)
         region_cb.pack(anchor="w", padx=5, pady=2)
         region_options_frame = ctk.CTkFrame(region_frame)
         region_options_frame.pack(fill="x", padx=5, pady=2)
         ctk.CTkLabel(region_options_frame, text="X:").pack(side="left", padx=5)
-        self.region_x_var = ctk.IntVar(value=0)
+        self.region_x_var = self.bind_effect_var('region_x_var', ctk.IntVar)
         region_x_entry = ctk.CTkEntry(region_options_frame, textvariable=self.region_x_var, width=80)
         region_x_entry.pack(side="left", padx=5)
         ctk.CTkLabel(region_options_frame, text="Y:").pack(side="left", padx=(20, 5))
-        self.region_y_var = ctk.IntVar(value=0)
+        self.region_y_var = self.bind_effect_var('region_y_var', ctk.IntVar)
         region_y_entry = ctk.CTkEntry(region_options_frame, textvariable=self.region_y_var, width=80)
         region_y_entry.pack(side="left", padx=5)
         ctk.CTkLabel(region_options_frame, text="Width:").pack(side="left", padx=(20, 5))
-        self.region_width_var = ctk.IntVar(value=100)
+        self.region_width_var = self.bind_effect_var('region_width_var', ctk.IntVar)
         region_width_entry = ctk.CTkEntry(region_options_frame, textvariable=self.region_width_var, width=80)
         region_width_entry.pack(side="left", padx=5)
         ctk.CTkLabel(region_options_frame, text="Height:").pack(side="left", padx=(20, 5))
-        self.region_height_var = ctk.IntVar(value=100)
+        self.region_height_var = self.bind_effect_var('region_height_var', ctk.IntVar)
         region_height_entry = ctk.CTkEntry(region_options_frame, textvariable=self.region_height_var, width=80)
         region_height_entry.pack(side="left", padx=5)
 
@@ -411,20 +516,20 @@ class ReelsWasherApp(ctk.CTk):
         bitplane_frame = ctk.CTkFrame(effects_canvas)
         bitplane_frame.pack(fill="x", padx=5, pady=5)
         ctk.CTkLabel(bitplane_frame, text="Bit Plane Manipulation", font=("Arial", 14, "bold")).pack(anchor="w", padx=5, pady=(0, 5))
-        self.bitplane_enabled = ctk.BooleanVar(value=False)
+        self.bitplane_enabled = self.bind_effect_var('bitplane_enabled', ctk.BooleanVar)
         bitplane_cb = ctk.CTkCheckBox(bitplane_frame, text="Enable Bit Plane Manipulation", variable=self.bitplane_enabled)
         bitplane_cb.pack(anchor="w", padx=5, pady=2)
         intensity_frame = ctk.CTkFrame(bitplane_frame)
         intensity_frame.pack(fill="x", padx=5, pady=2)
         ctk.CTkLabel(intensity_frame, text="Intensity:").pack(side="left", padx=5)
-        self.bitplane_intensity_var = ctk.DoubleVar(value=0.5)
+        self.bitplane_intensity_var = self.bind_effect_var('bitplane_intensity_var', ctk.DoubleVar)
         intensity_scale = ctk.CTkSlider(intensity_frame, from_=0.1, to=1.0, number_of_steps=90, variable=self.bitplane_intensity_var)
         intensity_scale.pack(side="left", padx=5)
         ctk.CTkLabel(intensity_frame, textvariable=self.bitplane_intensity_var, width=5).pack(side="left", padx=5)
         planes_frame = ctk.CTkFrame(bitplane_frame)
         planes_frame.pack(fill="x", padx=5, pady=2)
         ctk.CTkLabel(planes_frame, text="Bit Planes:").pack(side="left", padx=5)
-        self.bitplane_planes_var = ctk.IntVar(value=1)
+        self.bitplane_planes_var = self.bind_effect_var('bitplane_planes_var', ctk.IntVar)
         planes_scale = ctk.CTkSlider(planes_frame, from_=1, to=3, number_of_steps=2, variable=self.bitplane_planes_var)
         planes_scale.pack(side="left", padx=5)
         ctk.CTkLabel(planes_frame, textvariable=self.bitplane_planes_var, width=5).pack(side="left", padx=5)
@@ -433,13 +538,13 @@ class ReelsWasherApp(ctk.CTk):
         overlay_frame = ctk.CTkFrame(effects_canvas)
         overlay_frame.pack(fill="x", padx=5, pady=5)
         ctk.CTkLabel(overlay_frame, text="Transparent Frame Overlay", font=("Arial", 14, "bold")).pack(anchor="w", padx=5, pady=(0, 5))
-        self.overlay_enabled = ctk.BooleanVar(value=False)
+        self.overlay_enabled = self.bind_effect_var('overlay_enabled', ctk.BooleanVar)
         overlay_cb = ctk.CTkCheckBox(overlay_frame, text="Enable Transparent Frame Overlay", variable=self.overlay_enabled)
         overlay_cb.pack(anchor="w", padx=5, pady=2)
         overlay_interval_frame = ctk.CTkFrame(overlay_frame)
         overlay_interval_frame.pack(fill="x", padx=5, pady=2)
         ctk.CTkLabel(overlay_interval_frame, text="Apply every N frames:").pack(side="left", padx=5)
-        self.frame_overlay_interval = ctk.IntVar(value=1)
+        self.frame_overlay_interval = self.bind_effect_var('frame_overlay_interval', ctk.IntVar)
         interval_scale = ctk.CTkSlider(overlay_interval_frame, from_=1, to=100, number_of_steps=99, variable=self.frame_overlay_interval)
         interval_scale.pack(side="left", padx=5)
         ctk.CTkLabel(overlay_interval_frame, textvariable=self.frame_overlay_interval, width=5).pack(side="left", padx=5)
@@ -448,14 +553,14 @@ class ReelsWasherApp(ctk.CTk):
         shadow_lines_frame = ctk.CTkFrame(effects_canvas)
         shadow_lines_frame.pack(fill="x", padx=5, pady=5)
         ctk.CTkLabel(shadow_lines_frame, text="Shadow Lines Effect", font=("Arial", 14, "bold")).pack(anchor="w", padx=5, pady=(0, 5))
-        self.shadow_enabled = ctk.BooleanVar(value=False)
+        self.shadow_enabled = self.bind_effect_var('shadow_enabled', ctk.BooleanVar)
         shadow_lines_cb = ctk.CTkCheckBox(shadow_lines_frame, text="Enable Shadow Lines Effect", variable=self.shadow_enabled)
         shadow_lines_cb.pack(anchor="w", padx=5, pady=2)
         # Horizontal lines
         h_lines_frame = ctk.CTkFrame(shadow_lines_frame)
         h_lines_frame.pack(fill="x", padx=5, pady=2)
         ctk.CTkLabel(h_lines_frame, text="Horizontal Lines:").pack(side="left", padx=5)
-        self.shadow_h_lines_var = ctk.IntVar(value=0)
+        self.shadow_h_lines_var = self.bind_effect_var('shadow_h_lines_var', ctk.IntVar)
         h_lines_scale = ctk.CTkSlider(h_lines_frame, from_=0, to=10, number_of_steps=10, variable=self.shadow_h_lines_var)
         h_lines_scale.pack(side="left", padx=5)
         ctk.CTkLabel(h_lines_frame, textvariable=self.shadow_h_lines_var, width=5).pack(side="left", padx=5)
@@ -463,7 +568,7 @@ class ReelsWasherApp(ctk.CTk):
         v_lines_frame = ctk.CTkFrame(shadow_lines_frame)
         v_lines_frame.pack(fill="x", padx=5, pady=2)
         ctk.CTkLabel(v_lines_frame, text="Vertical Lines:").pack(side="left", padx=5)
-        self.shadow_v_lines_var = ctk.IntVar(value=0)
+        self.shadow_v_lines_var = self.bind_effect_var('shadow_v_lines_var', ctk.IntVar)
         v_lines_scale = ctk.CTkSlider(v_lines_frame, from_=0, to=10, number_of_steps=10, variable=self.shadow_v_lines_var)
         v_lines_scale.pack(side="left", padx=5)
         ctk.CTkLabel(v_lines_frame, textvariable=self.shadow_v_lines_var, width=5).pack(side="left", padx=5)
@@ -471,7 +576,7 @@ class ReelsWasherApp(ctk.CTk):
         intensity_frame_shadow = ctk.CTkFrame(shadow_lines_frame)
         intensity_frame_shadow.pack(fill="x", padx=5, pady=2)
         ctk.CTkLabel(intensity_frame_shadow, text="Intensity:").pack(side="left", padx=5)
-        self.shadow_intensity_var = ctk.DoubleVar(value=0.1)
+        self.shadow_intensity_var = self.bind_effect_var('shadow_intensity_var', ctk.DoubleVar)
         intensity_scale_shadow = ctk.CTkSlider(intensity_frame_shadow, from_=0.1, to=0.5, number_of_steps=40, variable=self.shadow_intensity_var)
         intensity_scale_shadow.pack(side="left", padx=5)
         ctk.CTkLabel(intensity_frame_shadow, textvariable=self.shadow_intensity_var, width=5).pack(side="left", padx=5)
@@ -479,7 +584,7 @@ class ReelsWasherApp(ctk.CTk):
         width_frame = ctk.CTkFrame(shadow_lines_frame)
         width_frame.pack(fill="x", padx=5, pady=2)
         ctk.CTkLabel(width_frame, text="Line Width:").pack(side="left", padx=5)
-        self.shadow_line_width_var = ctk.IntVar(value=1)
+        self.shadow_line_width_var = self.bind_effect_var('shadow_line_width_var', ctk.IntVar)
         width_scale = ctk.CTkSlider(width_frame, from_=1, to=5, number_of_steps=4, variable=self.shadow_line_width_var)
         width_scale.pack(side="left", padx=5)
         ctk.CTkLabel(width_frame, textvariable=self.shadow_line_width_var, width=5).pack(side="left", padx=5)
@@ -487,7 +592,7 @@ class ReelsWasherApp(ctk.CTk):
         speed_frame = ctk.CTkFrame(shadow_lines_frame)
         speed_frame.pack(fill="x", padx=5, pady=2)
         ctk.CTkLabel(speed_frame, text="Speed:").pack(side="left", padx=5)
-        self.shadow_speed_var = ctk.DoubleVar(value=0.5)
+        self.shadow_speed_var = self.bind_effect_var('shadow_speed_var', ctk.DoubleVar)
         speed_scale = ctk.CTkSlider(speed_frame, from_=0.5, to=2.0, number_of_steps=30, variable=self.shadow_speed_var)
         speed_scale.pack(side="left", padx=5)
         ctk.CTkLabel(speed_frame, textvariable=self.shadow_speed_var, width=5).pack(side="left", padx=5)
@@ -496,7 +601,7 @@ class ReelsWasherApp(ctk.CTk):
         clipping_frame = ctk.CTkFrame(effects_canvas)
         clipping_frame.pack(fill="x", padx=5, pady=5)
         ctk.CTkLabel(clipping_frame, text="Video Clipping", font=("Arial", 14, "bold")).pack(anchor="w", padx=5, pady=(0, 5))
-        self.clipping_enabled = ctk.BooleanVar(value=False)
+        self.clipping_enabled = self.bind_effect_var('clipping_enabled', ctk.BooleanVar)
         clipping_cb = ctk.CTkCheckBox(clipping_frame, text="Enable End Clipping (Random % from last 2 seconds)", variable=self.clipping_enabled)
         clipping_cb.pack(anchor="w", padx=5, pady=2)
         # Clipping info
@@ -507,12 +612,12 @@ class ReelsWasherApp(ctk.CTk):
         clipping_range_frame = ctk.CTkFrame(clipping_frame)
         clipping_range_frame.pack(fill="x", padx=5, pady=2)
         ctk.CTkLabel(clipping_range_frame, text="Min %:").pack(side="left", padx=5)
-        self.clipping_min_var = ctk.DoubleVar(value=5.0)
+        self.clipping_min_var = self.bind_effect_var('clipping_min_var', ctk.DoubleVar)
         min_clip_scale = ctk.CTkSlider(clipping_range_frame, from_=1.0, to=15.0, number_of_steps=140, variable=self.clipping_min_var)
         min_clip_scale.pack(side="left", padx=5)
         ctk.CTkLabel(clipping_range_frame, textvariable=self.clipping_min_var, width=5).pack(side="left", padx=5)
         ctk.CTkLabel(clipping_range_frame, text="Max %:").pack(side="left", padx=(20, 5))
-        self.clipping_max_var = ctk.DoubleVar(value=10.0)
+        self.clipping_max_var = self.bind_effect_var('clipping_max_var', ctk.DoubleVar)
         max_clip_scale = ctk.CTkSlider(clipping_range_frame, from_=1.0, to=15.0, number_of_steps=140, variable=self.clipping_max_var)
         max_clip_scale.pack(side="left", padx=5)
         ctk.CTkLabel(clipping_range_frame, textvariable=self.clipping_max_var, width=5).pack(side="left", padx=5)
@@ -521,7 +626,7 @@ class ReelsWasherApp(ctk.CTk):
         flip_frame = ctk.CTkFrame(effects_canvas)
         flip_frame.pack(fill="x", padx=5, pady=5)
         ctk.CTkLabel(flip_frame, text="Horizontal Flip", font=("Arial", 14, "bold")).pack(anchor="w", padx=5, pady=(0, 5))
-        self.flip_enabled = ctk.BooleanVar(value=False)
+        self.flip_enabled = self.bind_effect_var('flip_enabled', ctk.BooleanVar)
         flip_cb = ctk.CTkCheckBox(flip_frame, text="Enable Horizontal Flip (Mirror Left/Right)", variable=self.flip_enabled)
         flip_cb.pack(anchor="w", padx=5, pady=2)
         # Flip info
@@ -536,63 +641,104 @@ class ReelsWasherApp(ctk.CTk):
                                                  corner_radius=8, height=35, font=ctk.CTkFont(size=12, weight="bold"))
         self.reset_effects_button.pack(side="left", padx=5)
 
-        # Effects status label
-        self.effects_status_label = ctk.CTkLabel(effects_canvas, text="No effects applied", font=("Arial", 10, "bold"))
+        # Effects status label (shares the Main tab's status variable)
+        self.effects_status_label = ctk.CTkLabel(effects_canvas, textvariable=self.effects_status_var, font=("Arial", 10, "bold"))
         self.effects_status_label.pack(fill="x", pady=5)
 
-        # Bindings for dynamic updates
-        self.brightness_enabled.trace_add("write", self.update_effects_status)
-        self.contrast_enabled.trace_add("write", self.update_effects_status)
-        self.saturation_enabled.trace_add("write", self.update_effects_status)
-        self.hue_enabled.trace_add("write", self.update_effects_status)
-        self.blur_enabled.trace_add("write", self.update_effects_status)
-        self.resize_enabled.trace_add("write", self.update_effects_status)
-        self.noise_enabled.trace_add("write", self.update_effects_status)
-        self.fps_change_enabled.trace_add("write", self.update_effects_status)
-        self.audio_fingerprint_enabled.trace_add("write", self.update_effects_status)
-        self.region_enabled.trace_add("write", self.update_effects_status)
-        self.bitplane_enabled.trace_add("write", self.update_effects_status)
-        self.overlay_enabled.trace_add("write", self.update_effects_status)
-        self.shadow_enabled.trace_add("write", self.update_effects_status)
-        self.clipping_enabled.trace_add("write", self.update_effects_status)
-        self.flip_enabled.trace_add("write", self.update_effects_status)
+    def setup_queue_tab(self):
+        # Queue controls
+        controls_frame = ctk.CTkFrame(self.tab_queue)
+        controls_frame.pack(fill="x", padx=10, pady=(10, 5))
+        ctk.CTkButton(controls_frame, text="➕ Add Files...", command=self.controller.enqueue_files,
+                      corner_radius=8).pack(side="left", padx=5, pady=5)
+        ctk.CTkButton(controls_frame, text="➕ Add Current Video", command=self.controller.enqueue_current,
+                      corner_radius=8).pack(side="left", padx=5, pady=5)
+        ctk.CTkButton(controls_frame, text="🧹 Clear Finished", command=self.controller.clear_finished_jobs,
+                      corner_radius=8).pack(side="left", padx=5, pady=5)
+        ctk.CTkLabel(controls_frame, text="Concurrent jobs:").pack(side="left", padx=(20, 5))
+        self.queue_concurrency_var = ctk.StringVar(value=str(DEFAULT_MAX_CONCURRENT))
+        concurrency_menu = ctk.CTkOptionMenu(controls_frame, values=["1", "2", "3", "4"], variable=self.queue_concurrency_var,
+                                             command=self.controller.set_queue_concurrency, width=70)
+        concurrency_menu.pack(side="left", padx=5)
+        
+        info_label = ctk.CTkLabel(self.tab_queue, text="💡 Jobs use the output settings and effects at the time they are added",
+                                  font=ctk.CTkFont(size=10), text_color="gray60")
+        info_label.pack(anchor="w", padx=15)
+        self.queue_summary_label = ctk.CTkLabel(self.tab_queue, text="Queue is empty", font=ctk.CTkFont(size=12, weight="bold"))
+        self.queue_summary_label.pack(anchor="w", padx=15, pady=5)
+        
+        self.queue_rows_frame = ctk.CTkScrollableFrame(self.tab_queue, width=900, height=600)
+        self.queue_rows_frame.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+
+    def create_queue_row(self, job):
+        """Create the widgets of one queue row."""
+        job_id = job['job_id']
+        row = ctk.CTkFrame(self.queue_rows_frame, corner_radius=8)
+        top = ctk.CTkFrame(row, fg_color="transparent")
+        top.pack(fill="x", padx=5, pady=(5, 0))
+        ctk.CTkLabel(top, text=f"{job['name']} ({job['output_mode']}, {job['copies']} copies)",
+                     font=ctk.CTkFont(size=12, weight="bold")).pack(side="left", padx=5)
+        ctk.CTkButton(top, text="✖", width=30, command=lambda: self.controller.cancel_queued_job(job_id)).pack(side="right", padx=2)
+        pause_button = ctk.CTkButton(top, text="⏸", width=30, command=lambda: self.controller.toggle_pause_queued_job(job_id))
+        pause_button.pack(side="right", padx=2)
+        ctk.CTkButton(top, text="▼", width=30, command=lambda: self.controller.move_queued_job(job_id, 1)).pack(side="right", padx=2)
+        ctk.CTkButton(top, text="▲", width=30, command=lambda: self.controller.move_queued_job(job_id, -1)).pack(side="right", padx=2)
+        state_label = ctk.CTkLabel(top, text="", font=ctk.CTkFont(size=11))
+        state_label.pack(side="right", padx=10)
+        progress_bar = ctk.CTkProgressBar(row, height=12)
+        progress_bar.pack(fill="x", padx=10, pady=5)
+        progress_bar.set(0)
+        details_label = ctk.CTkLabel(row, text="", font=ctk.CTkFont(size=10), text_color="gray60")
+        details_label.pack(anchor="w", padx=10, pady=(0, 5))
+        return {'frame': row, 'state': state_label, 'pause': pause_button, 'progress': progress_bar, 'details': details_label}
+
+    def update_queue_panel(self, jobs, snapshot):
+        """Refresh the queue rows from the job list and a progress bus snapshot."""
+        if not self.queue_tab_built:
+            return
+        
+        # Rows are only recreated when jobs are added, removed or reordered
+        order = [job['job_id'] for job in jobs]
+        if order != self.queue_row_order:
+            for job_id in list(self.queue_rows):
+                if job_id not in order:
+                    self.queue_rows.pop(job_id)['frame'].destroy()
+            for job in jobs:
+                if job['job_id'] not in self.queue_rows:
+                    self.queue_rows[job['job_id']] = self.create_queue_row(job)
+                self.queue_rows[job['job_id']]['frame'].pack_forget()
+            for job_id in order:
+                self.queue_rows[job_id]['frame'].pack(fill="x", padx=5, pady=3)
+            self.queue_row_order = order
+        
+        workers = snapshot.get('workers', {})
+        for job in jobs:
+            row = self.queue_rows[job['job_id']]
+            progress = workers.get(job['job_id'], {})
+            row['state'].configure(text=job['state'].title())
+            row['pause'].configure(text="▶" if job['state'] == 'paused' else "⏸")
+            row['progress'].set(progress.get('progress', 0))
+            details = progress.get('stage', '')
+            if job['state'] == 'running':
+                details = (f"{details} - {int(progress.get('progress', 0) * 100)}% - "
+                           f"{progress.get('frames_per_second', 0):.0f} frames/s - ETA {format_eta(progress.get('eta'))}")
+            row['details'].configure(text=details)
+        
+        counts = {}
+        for job in jobs:
+            counts[job['state']] = counts.get(job['state'], 0) + 1
+        if jobs:
+            summary = ", ".join(f"{count} {state}" for state, count in counts.items())
+            self.queue_summary_label.configure(text=f"{summary} - {snapshot.get('frames_per_second', 0):.0f} frames/s total")
+        else:
+            self.queue_summary_label.configure(text="Queue is empty")
 
     def update_effects_status(self, *args):
-        # Update the effects status label based on the current settings
-        status = []
-        if self.brightness_enabled.get():
-            status.append("Brightness")
-        if self.contrast_enabled.get():
-            status.append("Contrast")
-        if self.saturation_enabled.get():
-            status.append("Saturation")
-        if self.hue_enabled.get():
-            status.append("Hue")
-        if self.blur_enabled.get():
-            status.append("Blur")
-        if self.resize_enabled.get():
-            status.append("Resize")
-        if self.noise_enabled.get():
-            status.append("Noise")
-        if self.fps_change_enabled.get():
-            status.append("FPS Change")
-        if self.audio_fingerprint_enabled.get():
-            status.append("Audio Fingerprint")
-        if self.region_enabled.get():
-            status.append("Region")
-        if self.bitplane_enabled.get():
-            status.append("Bitplane")
-        if self.overlay_enabled.get():
-            status.append("Overlay")
-        if self.shadow_enabled.get():
-            status.append("Shadow Lines")
-        if self.clipping_enabled.get():
-            status.append("Clipping")
-        if self.flip_enabled.get():
-            status.append("Horizontal Flip")
+        # One status variable, shown on the Main tab and (once built) the Effects tab
+        status = [name for key, name in EFFECT_STATUS_NAMES if self.effect_plan.get(key)]
         if not status:
             status.append("No effects applied")
-        self.effects_status_label.configure(text=", ".join(status))
+        self.effects_status_var.set(", ".join(status))
 
 if __name__ == "__main__":
     ctk.set_appearance_mode("System")
@@ -0,0 +1,61 @@
+"""Tests for EffectPlan snapshots."""
+
+import json
+
+import pytest
+
+from src.core.effect_plan import EffectPlan, EFFECT_DEFAULTS, PLAN_VERSION
+
+
+class FakeVar:
+    """Stand-in for a tkinter variable."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+class BrokenVar:
+    def get(self):
+        raise RuntimeError("widget destroyed")
+
+
+def test_json_round_trip():
+    plan = EffectPlan({'blur_enabled': True, 'shadow_intensity_var': 0.25, 'effect_seed': 'abc'})
+    restored = EffectPlan.from_json(plan.to_json())
+    assert restored == plan
+    assert restored.to_effect_vars() == plan.to_effect_vars()
+
+
+def test_json_is_plain_and_versioned():
+    data = json.loads(EffectPlan({'flip_enabled': True}).to_json())
+    assert data['version'] == PLAN_VERSION
+    assert data['values']['flip_enabled'] is True
+
+
+def test_missing_settings_get_defaults():
+    plan = EffectPlan.from_json(json.dumps({'version': PLAN_VERSION, 'values': {'noise_enabled': True}}))
+    effect_vars = plan.to_effect_vars()
+    assert effect_vars['noise_enabled'] is True
+    assert set(effect_vars) == set(EFFECT_DEFAULTS)
+
+
+def test_from_effect_vars_reads_variables():
+    plan = EffectPlan.from_effect_vars({
+        'blur_enabled': FakeVar(True),
+        'region_x_var': FakeVar(12),
+        'hue_enabled': BrokenVar(),  # Unreadable variables keep the default
+        'clipping_enabled': True,
+    })
+    assert plan.get('blur_enabled') is True
+    assert plan.get('region_x_var') == 12
+    assert plan.get('hue_enabled') is EFFECT_DEFAULTS['hue_enabled']
+    assert plan.get('clipping_enabled') is True
+    assert EffectPlan.from_json(plan.to_json()) == plan
+
+
+def test_newer_plan_version_is_rejected():
+    with pytest.raises(ValueError):
+        EffectPlan.from_dict({'version': PLAN_VERSION + 1, 'values': {}})
@@ -0,0 +1,116 @@
+"""Tests for the shared-directory job queue: claiming, leases and requeueing."""
+
+import os
+import time
+
+from src.core import job_queue
+from src.core.effect_plan import EffectPlan
+from src.core.job_queue import (submit_job, claim_job, complete_job, fail_job, write_lease, owns_lease,
+                                requeue_expired_jobs, queue_status)
+
+
+def _age(path, seconds):
+    """Set a file's mtime seconds into the past."""
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+def _submit(queue_dir, **options):
+    return submit_job(str(queue_dir), '/media/source.mp4', '/media/out', EffectPlan({'blur_enabled': True}),
+                      **options)
+
+
+def test_claim_and_complete(tmp_path):
+    job_id = _submit(tmp_path, copies=2)
+
+    job = claim_job(str(tmp_path), 'worker-a')
+    assert job['job_id'] == job_id
+    assert job['attempts'] == 1
+    assert job['claimed_by'] == 'worker-a'
+    assert job['options'] == {'copies': 2}
+    assert EffectPlan.from_dict(job['effect_plan']).get('blur_enabled') is True
+    assert owns_lease(str(tmp_path), job_id, 'worker-a')
+    assert not owns_lease(str(tmp_path), job_id, 'worker-b')
+
+    # A job is claimed once
+    assert claim_job(str(tmp_path), 'worker-b') is None
+
+    complete_job(str(tmp_path), job, {'success': True})
+    status = queue_status(str(tmp_path))
+    assert (status['pending'], status['claimed'], status['done']) == (0, 0, 1)
+    assert status['leases'] == []
+
+
+def test_expired_lease_is_requeued_and_claimed_again(tmp_path):
+    job_id = _submit(tmp_path)
+    claim_job(str(tmp_path), 'worker-a', lease_seconds=60)
+
+    assert requeue_expired_jobs(str(tmp_path)) == []
+
+    # worker-a stopped renewing its lease
+    write_lease(str(tmp_path), job_id, 'worker-a', lease_seconds=-1)
+    assert requeue_expired_jobs(str(tmp_path)) == [job_id]
+    assert not owns_lease(str(tmp_path), job_id, 'worker-a')
+
+    job = claim_job(str(tmp_path), 'worker-b')
+    assert job['job_id'] == job_id
+    assert job['attempts'] == 2
+    assert owns_lease(str(tmp_path), job_id, 'worker-b')
+
+
+def test_claim_without_lease_is_requeued_after_grace(tmp_path):
+    job_id = _submit(tmp_path)
+    claim_job(str(tmp_path), 'worker-a')
+
+    # The worker died between claiming and writing its first lease
+    os.remove(job_queue._path(str(tmp_path), 'leases', job_id))
+    assert requeue_expired_jobs(str(tmp_path), grace_seconds=60) == []
+
+    _age(job_queue._path(str(tmp_path), 'claimed', job_id), 120)
+    job = job_queue._read_json(job_queue._path(str(tmp_path), 'claimed', job_id))
+    assert job['claimed_at'] > time.time() - 60
+    # claimed_at is the claim's own time and keeps a fresh claim queued
+    assert requeue_expired_jobs(str(tmp_path), grace_seconds=60) == []
+
+    job['claimed_at'] = time.time() - 120
+    job_queue._write_json_atomic(str(tmp_path), job_queue._path(str(tmp_path), 'claimed', job_id), job)
+    _age(job_queue._path(str(tmp_path), 'claimed', job_id), 120)
+    assert requeue_expired_jobs(str(tmp_path), grace_seconds=60) == [job_id]
+
+
+def test_long_pending_job_is_not_requeued_while_being_claimed(tmp_path, monkeypatch):
+    job_id = _submit(tmp_path)
+    # Waited in pending/ far longer than the grace period
+    _age(job_queue._path(str(tmp_path), 'pending', job_id), 600)
+
+    requeued = []
+    real_write_lease = job_queue.write_lease
+
+    def write_lease_after_requeue(*args, **kwargs):
+        # Another node scans for expired jobs between the rename and the first lease
+        requeued.extend(requeue_expired_jobs(str(tmp_path), grace_seconds=60))
+        return real_write_lease(*args, **kwargs)
+
+    monkeypatch.setattr(job_queue, 'write_lease', write_lease_after_requeue)
+    job = claim_job(str(tmp_path), 'worker-a')
+
+    assert requeued == []
+    assert job is not None and job['job_id'] == job_id
+    assert owns_lease(str(tmp_path), job_id, 'worker-a')
+
+
+def test_failed_attempts_retry_until_max_attempts(tmp_path):
+    job_id = _submit(tmp_path, max_attempts=2)
+
+    fail_job(str(tmp_path), claim_job(str(tmp_path), 'worker-a'), "first error")
+    assert queue_status(str(tmp_path))['pending'] == 1
+
+    job = claim_job(str(tmp_path), 'worker-b')
+    assert job['attempts'] == 2
+    assert [entry['error'] for entry in job['history']] == ["first error"]
+
+    fail_job(str(tmp_path), job, "second error")
+    status = queue_status(str(tmp_path))
+    assert (status['pending'], status['claimed'], status['failed']) == (0, 0, 1)
+    failed = job_queue._read_json(job_queue._path(str(tmp_path), 'failed', job_id))
+    assert failed['error'] == "second error"
@@ -0,0 +1,46 @@
+"""Tests for splitting a window into keyframe-aligned segments."""
+
+import pytest
+
+from src.core.process import plan_segments, MIN_SEGMENT_SECONDS
+
+
+def assert_covers(segments, start_time, duration):
+    """Segments are contiguous and cover exactly [start_time, start_time + duration]."""
+    assert segments[0][0] == pytest.approx(start_time)
+    assert segments[-1][1] == pytest.approx(start_time + duration)
+    for (_, end), (next_start, _) in zip(segments, segments[1:]):
+        assert end == next_start
+
+
+def test_single_segment_when_splitting_is_not_worth_it():
+    keyframes = [float(t) for t in range(0, 60, 2)]
+    assert plan_segments(keyframes, 0, 60, 1) == [(0, 60)]
+    # Too short for two segments of MIN_SEGMENT_SECONDS
+    assert plan_segments(keyframes, 5, 2 * MIN_SEGMENT_SECONDS - 0.1, 4) == [(5, 5 + 2 * MIN_SEGMENT_SECONDS - 0.1)]
+
+
+def test_splits_snap_to_keyframes():
+    keyframes = [float(t) for t in range(0, 60, 2)]
+    segments = plan_segments(keyframes, 0, 60, 4)
+    assert segments == [(0, 14.0), (14.0, 30.0), (30.0, 44.0), (44.0, 60)]
+
+
+def test_window_inside_the_source():
+    keyframes = [0.0, 4.2, 8.4, 12.6, 16.8, 21.0, 25.2]
+    segments = plan_segments(keyframes, 3.0, 20.0, 3)
+    assert_covers(segments, 3.0, 20.0)
+    for segment_start, _ in segments[1:]:
+        assert segment_start in keyframes
+
+
+def test_segments_are_never_shorter_than_the_minimum():
+    keyframes = [0.0, 0.5, 1.0, 1.5, 9.0, 9.5]
+    segments = plan_segments(keyframes, 0, 10, 5)
+    assert_covers(segments, 0, 10)
+    assert all(end - start >= MIN_SEGMENT_SECONDS for start, end in segments)
+
+
+def test_no_usable_keyframes_gives_one_segment():
+    assert plan_segments([], 0, 30, 4) == [(0, 30)]
+    assert plan_segments([0.0], 0, 30, 4) == [(0, 30)]
@@ -0,0 +1,55 @@
+"""Tests for the rate control helpers."""
+
+from src.core.rate_control import (size_target_bitrate, get_rate_control_options, build_rate_control_args,
+                                   CONTAINER_OVERHEAD)
+
+
+def test_size_target_bitrate_fills_the_target_size():
+    video_kbps = size_target_bitrate(10, 60, audio_kbps=128)
+    total_kbps = 10 * 1024 * 1024 * 8 / 1000 * (1 - CONTAINER_OVERHEAD) / 60
+    assert video_kbps == int(total_kbps - 128)
+
+    # Encoded at that rate, video plus audio stays within the target
+    size_bytes = (video_kbps + 128) * 1000 / 8 * 60
+    assert size_bytes <= 10 * 1024 * 1024
+
+
+def test_size_target_bitrate_scales_with_duration():
+    assert size_target_bitrate(10, 30) > size_target_bitrate(10, 60)
+
+
+def test_size_target_bitrate_rejects_unusable_input():
+    assert size_target_bitrate(None, 60) is None
+    assert size_target_bitrate(10, 0) is None
+    assert size_target_bitrate(10, None) is None
+    # Too small to leave MIN_VIDEO_KBPS for the video after the audio
+    assert size_target_bitrate(1, 600, audio_kbps=128) is None
+
+
+def test_bitrate_mode_is_a_fixed_average():
+    assert get_rate_control_options('libx264', 2000) == {'b:v': '2000k'}
+    assert get_rate_control_options('libx264', 2000.0, 'bitrate') == {'b:v': '2000k'}
+
+
+def test_quality_mode_caps_the_rate():
+    assert get_rate_control_options('libx264', 2000, 'quality', crf=20) == {
+        'crf': '20', 'maxrate': '2000k', 'bufsize': '4000k'}
+
+
+def test_quality_mode_per_encoder():
+    nvenc = get_rate_control_options('h264_nvenc', 3000, 'quality', crf=25)
+    assert nvenc == {'rc': 'vbr', 'cq': '25', 'b:v': '0', 'maxrate': '3000k', 'bufsize': '6000k'}
+
+    # libvpx uses -b:v as the constrained-quality ceiling
+    assert get_rate_control_options('libvpx-vp9', 1500, 'quality', crf=31) == {'crf': '31', 'b:v': '1500k'}
+
+
+def test_size_mode_is_an_average_with_a_vbv_cap():
+    assert get_rate_control_options('libx264', 1000, 'size') == {
+        'b:v': '1000k', 'maxrate': '1500k', 'bufsize': '2000k'}
+
+
+def test_build_rate_control_args_matches_options():
+    options = get_rate_control_options('libx264', 2000, 'quality')
+    args = build_rate_control_args('libx264', 2000, 'quality')
+    assert args == [item for name, value in options.items() for item in (f'-{name}', value)]